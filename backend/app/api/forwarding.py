@@ -0,0 +1,58 @@
+"""
+Write Forwarding
+Read-only workers pass write requests through to the single writer process
+"""
+
+from typing import Tuple
+
+import requests
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+# (method, path prefix) of the endpoints that change the catalog
+WRITE_ROUTES: Tuple[Tuple[str, str], ...] = (
+    ("POST", "/learn"),
+    # Ingest jobs live in the writer process
+    ("GET", "/learn/jobs"),
+    ("POST", "/songs/delete"),
+    ("DELETE", "/songs"),
+    ("POST", "/admin/compact"),
+    ("GET", "/admin/compact"),
+    ("POST", "/admin/ingest"),
+    ("GET", "/admin/ingest"),
+)
+
+# Seconds to wait for the writer (a /learn upload includes fingerprinting)
+WRITER_TIMEOUT_SECONDS = 300
+
+# Hop-by-hop and length headers are recomputed on each side
+_SKIPPED_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+def is_write_request(method: str, path: str) -> bool:
+    return any(method == route_method and path.startswith(prefix) for route_method, prefix in WRITE_ROUTES)
+
+
+async def forward_to_writer(request: Request, writer_url: str) -> Response:
+    """Send a request to the writer unchanged and relay its response"""
+    body = await request.body()
+    headers = {name: value for name, value in request.headers.items() if name.lower() not in _SKIPPED_HEADERS}
+    try:
+        upstream = await run_in_threadpool(
+            requests.request,
+            request.method,
+            f"{writer_url.rstrip('/')}{request.url.path}",
+            params=list(request.query_params.multi_items()),
+            data=body,
+            headers=headers,
+            timeout=WRITER_TIMEOUT_SECONDS,
+        )
+    except requests.RequestException as e:
+        return JSONResponse(status_code=503, content={"detail": f"Writer unavailable: {type(e).__name__}"})
+    return Response(
+        content=upstream.content,
+        status_code=upstream.status_code,
+        headers={name: value for name, value in upstream.headers.items()
+                 if name.lower() not in _SKIPPED_HEADERS | {"content-encoding"}},
+    )
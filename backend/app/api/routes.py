@@ -1,21 +1,156 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List, Optional
+import base64
+import io
 import os
 import tempfile
+import zipfile
 
 from app.core.dsp_engine import AudioFingerprinter
-from app.core.database import PersistentDB
+from app.core.fingerprint_codec import (
+    BUNDLE_CONTENT_TYPE, PAYLOAD_CONTENT_TYPE, PAYLOAD_VERSION, FingerprintPayloadError,
+    IncompatibleFingerprintsError, decode_fingerprints, fingerprinter_signature, split_song_bundle
+)
+from app.core.coordinator import CoordinatorError, CoordinatorIndex
+from app.core.database import INGEST_MODES, INGEST_REPLACE, PersistentDB, ReadOnlyIndexError, SongExistsError
+from app.core.directory_ingest import AUDIO_EXTENSIONS, DirectoryIngestJob, IngestPathError
+from app.core.fingerprint_pool import FingerprintPool
+from app.core.index_manager import IndexManager
+from app.core.ingest_queue import MAX_FINISHED_JOBS, IngestQueue, NoFingerprintsError, QueueFullError
+from app.core.maintenance import CompactionJob
+from app.core.sharding import ShardedIndex
+from app.core.snapshot import SnapshotIndex
 
 router = APIRouter()
 
 fingerprinter: AudioFingerprinter = None
-db: PersistentDB = None
+fingerprint_pool: FingerprintPool = None
+index_manager: IndexManager = None
+compaction_job: CompactionJob = None
+ingest_queue: IngestQueue = None
+directory_ingest_job: DirectoryIngestJob = None
 
+MAX_TOP_K = 20
+MAX_PAGE_SIZE = 1000
+MAX_SHARDS = 256
 
-def init_routes(fingerprinter_instance: AudioFingerprinter, db_instance: PersistentDB):
-    global fingerprinter, db
+# Limits of one /recognize/batch request, over all its parts (zip members count unpacked)
+MAX_BATCH_CLIPS = 100
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+# Songs per transaction of /learn/fingerprints (bounds the decoded fingerprints held in memory)
+LEARN_SONGS_PER_TRANSACTION = 10
+
+
+class DeleteSongsRequest(BaseModel):
+    names: Optional[List[str]] = None
+    pattern: Optional[str] = None
+
+
+def init_routes(fingerprinter_instance: AudioFingerprinter, index_manager_instance: IndexManager,
+                fingerprint_pool_instance: Optional[FingerprintPool] = None,
+                ingest_queue_instance: Optional[IngestQueue] = None,
+                ingest_roots: Optional[List[str]] = None):
+    global fingerprinter, fingerprint_pool, index_manager, compaction_job, ingest_queue, directory_ingest_job
     fingerprinter = fingerprinter_instance
-    db = db_instance
+    fingerprint_pool = fingerprint_pool_instance or FingerprintPool(fingerprinter_instance, workers=1)
+    index_manager = index_manager_instance
+    compaction_job = CompactionJob(index_manager_instance.acquire_writer)
+    ingest_queue = ingest_queue_instance or IngestQueue(fingerprint_pool, index_manager_instance)
+    directory_ingest_job = DirectoryIngestJob(fingerprint_pool, index_manager_instance.acquire_writer, ingest_roots)
+
+
+def get_index():
+    """Live index version, held until the response is sent"""
+    with index_manager.acquire() as index:
+        yield index
+
+
+def get_writable_index():
+    """Live index version for a write (waits for a running reload to finish)"""
+    with index_manager.acquire_writer() as index:
+        if index.read_only:
+            raise HTTPException(
+                status_code=405,
+                detail="This server serves a read-only index snapshot. Send writes to the writer node."
+            )
+        yield index
+
+
+def _format_candidate(result: dict) -> dict:
+    return {
+        "song": result["song"],
+        "score": round(result["score"], 2),
+        "matches": result["matches"],
+        "offset": round(result["offset"], 3),
+        "confidence": round(result["confidence"] * 100, 2)
+    }
+
+
+def _query_details(query_stats: dict) -> dict:
+    details = {
+        "lookups": query_stats.get("lookups", 0),
+        "hashes": query_stats.get("hashes", 0),
+    }
+    # Coordinator: which backends answered (a partial result if some did not)
+    if "backends" in query_stats:
+        details["backends"] = query_stats["backends"]
+        details["partial"] = query_stats["backends"]["answered"] < query_stats["backends"]["queried"]
+    return details
+
+
+def _decode_payload(payload: bytes) -> list:
+    """Query fingerprints of a fingerprint payload (422 if made with other settings, 400 if malformed)"""
+    try:
+        return decode_fingerprints(payload, fingerprinter)
+    except IncompatibleFingerprintsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FingerprintPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _recognition_result(results: List[dict], query_stats: dict) -> dict:
+    """Body of a /recognize response for the ranked candidates of one sample"""
+    candidates = [_format_candidate(result) for result in results]
+    if results:
+        song_name = results[0]["song"]
+        confidence = results[0]["confidence"]
+        return {
+            "success": True,
+            "song": song_name,
+            "confidence": round(confidence * 100, 2),
+            # Time-coherent matches over the whole sample, extrapolated after an early stop
+            "matches": round(results[0]["score"]),
+            **_query_details(query_stats),
+            "candidates": candidates,
+            "message": f"Recognized as '{song_name}' with {confidence*100:.2f}% confidence"
+        }
+    else:
+        return {
+            "success": False,
+            "song": None,
+            "confidence": 0.0,
+            "matches": 0,
+            **_query_details(query_stats),
+            "candidates": candidates,
+            "message": "No matching song found in database."
+        }
+
+
+async def _recognize(db: PersistentDB, query_fingerprints: list, top_k: int) -> JSONResponse:
+    """Match query fingerprints against the index and build the /recognize response"""
+    query_stats = {}
+    try:
+        results = await run_in_threadpool(
+            db.query_top_k, query_fingerprints, top_k=top_k, min_matches=5, stats=query_stats
+        )
+    except CoordinatorError as query_error:
+        raise HTTPException(status_code=503, detail=str(query_error))
+    
+    return JSONResponse(_recognition_result(results, query_stats))
 
 
 @router.get("/")
@@ -24,21 +159,66 @@ async def root():
         "message": "Music Recognition API",
         "version": "1.0.0",
         "endpoints": {
-            "POST /learn": "Add a song to the database",
+            "POST /learn": "Add a song to the database (?async=true queues it and returns a job id)",
+            "GET /learn/jobs": "Get the ingest queue length and workers",
+            "GET /learn/jobs/{job_id}": "Get the status of a queued /learn upload",
+            "GET /learn/jobs/{job_id}/result": "Get the result of a finished /learn upload",
+            "POST /learn/fingerprints": "Add songs from a bundle of precomputed fingerprints",
             "POST /recognize": "Recognize a song from audio sample",
+            "POST /recognize/batch": "Recognize many audio clips (files or a zip) in one request",
             "GET /stats": "Get database statistics",
-            "GET /songs": "List all songs in database",
+            "GET /songs": "List songs in database (paginated, optional name prefix)",
             "DELETE /songs/{song_name}": "Delete a specific song",
-            "DELETE /songs": "Clear all songs"
+            "POST /songs/delete": "Delete songs by name list and/or GLOB pattern in one transaction",
+            "DELETE /songs": "Clear all songs",
+            "POST /admin/compact": "Purge orphaned fingerprints and reclaim space in the background",
+            "GET /admin/compact": "Get compaction progress",
+            "POST /admin/ingest": "Fingerprint and load the audio files of an allow-listed server directory",
+            "GET /admin/ingest": "Get server-local ingestion progress",
+            "POST /admin/reload": "Build a new index version in the background and swap it in",
+            "GET /admin/reload": "Get the live index version and reload progress",
+            "POST /admin/shards": "Repartition a sharded index over a new number of shard processes",
+            "POST /recognize/fingerprints": "Recognize a song from a fingerprint payload computed by the client",
+            "GET /fingerprinter": "Get the fingerprinter settings that payloads must be made with",
+            "POST /shard/query": "Top-K candidates for a fingerprint payload (used by coordinators)"
         }
     }
 
 
+def _learn_result(song_name: str, mode: str, count: int, created: bool, replaced_fingerprints: int) -> dict:
+    """Response of a /learn upload (returned directly, or by the job result endpoint)"""
+    if created:
+        message = f"Song '{song_name}' added successfully with {count} fingerprints"
+    elif mode == INGEST_REPLACE:
+        message = f"Song '{song_name}' replaced with {count} fingerprints"
+    else:
+        message = f"Appended {count} fingerprints to song '{song_name}'"
+    
+    return {
+        "success": True,
+        "song_name": song_name,
+        "mode": mode,
+        "created": created,
+        "fingerprints_count": count,
+        "replaced_fingerprints": replaced_fingerprints,
+        "message": message
+    }
+
+
 @router.post("/learn")
 async def learn_song(
     file: UploadFile = File(...),
-    song_name: str = Form(...)
+    song_name: str = Form(...),
+    mode: str = Form(INGEST_REPLACE),
+    run_async: bool = Query(False, alias="async"),
+    db: PersistentDB = Depends(get_writable_index)
 ):
+    if mode not in INGEST_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode '{mode}'. Use one of: {', '.join(INGEST_MODES)}"
+        )
+    
     if not file.content_type or not any(
         file.content_type.startswith(f"audio/{ext}") 
         for ext in ["wav", "mp3", "mpeg", "x-mpeg", "mpeg3", "x-mpeg3"]
@@ -49,6 +229,21 @@ async def learn_song(
                 detail="Invalid file type. Please upload an audio file (WAV, MP3, etc.)"
             )
     
+    if run_async:
+        try:
+            job = await run_in_threadpool(ingest_queue.submit, file.file, file.filename, song_name, mode)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "job": job.to_dict(),
+            "position": ingest_queue.position(job),
+            "status_url": f"/learn/jobs/{job.id}",
+            "result_url": f"/learn/jobs/{job.id}/result",
+            "message": f"Upload of '{song_name}' queued. Poll GET /learn/jobs/{job.id} for progress."
+        })
+    
     tmp_file_path = None
     with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
         try:
@@ -56,7 +251,7 @@ async def learn_song(
             tmp_file.write(content)
             tmp_file_path = tmp_file.name
             
-            fingerprints = fingerprinter.process_file(tmp_file_path)
+            fingerprints = await run_in_threadpool(fingerprinter.process_file, tmp_file_path)
             
             if not fingerprints:
                 raise HTTPException(
@@ -64,15 +259,18 @@ async def learn_song(
                     detail="Failed to generate fingerprints. Please check the audio file."
                 )
             
-            count = db.add_song(song_name, fingerprints)
+            ingest_stats = {}
+            count = await run_in_threadpool(
+                db.add_song, song_name, fingerprints, mode=mode, stats=ingest_stats
+            )
             
-            return JSONResponse({
-                "success": True,
-                "song_name": song_name,
-                "fingerprints_count": count,
-                "message": f"Song '{song_name}' added successfully with {count} fingerprints"
-            })
+            return JSONResponse(_learn_result(song_name, mode, count, ingest_stats["created"],
+                                              ingest_stats["replaced_fingerprints"]))
             
+        except SongExistsError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -83,9 +281,97 @@ async def learn_song(
                 os.unlink(tmp_file_path)
 
 
+def _learn_bundle(db: PersistentDB, songs: list) -> dict:
+    """Decode the songs of a bundle one at a time and write them with the bulk path"""
+    with db.bulk_load(songs_per_transaction=LEARN_SONGS_PER_TRANSACTION, defer_indexes=False) as loader:
+        try:
+            for song_name, payload in songs:
+                loader.add(song_name, decode_fingerprints(payload, fingerprinter))
+        except FingerprintPayloadError as e:
+            raise FingerprintPayloadError(
+                f"Song '{song_name}': {e} ({loader.progress['songs_added']} songs were already added; "
+                f"they are skipped if the bundle is sent again)"
+            )
+    return loader.progress
+
+
+@router.post("/learn/fingerprints")
+async def learn_fingerprints(
+    request: Request,
+    db: PersistentDB = Depends(get_writable_index)
+):
+    try:
+        songs = await run_in_threadpool(split_song_bundle, await request.body(), fingerprinter)
+    except IncompatibleFingerprintsError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FingerprintPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        progress = await run_in_threadpool(_learn_bundle, db, songs)
+    except FingerprintPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONResponse({
+        "success": True,
+        "songs_added": progress["songs_added"],
+        "songs_skipped": progress["songs_skipped"],
+        "fingerprints_added": progress["fingerprints_added"],
+        "message": f"Added {progress['songs_added']} songs with {progress['fingerprints_added']} fingerprints "
+                   f"({progress['songs_skipped']} already in the catalog were skipped)"
+    })
+
+
+def _get_job(job_id: str):
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown job '{job_id}' (only the last {MAX_FINISHED_JOBS} finished jobs are kept)"
+        )
+    return job
+
+
+@router.get("/learn/jobs")
+async def get_ingest_queue():
+    return ingest_queue.stats()
+
+
+@router.get("/learn/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = _get_job(job_id)
+    return {**job.to_dict(), "position": ingest_queue.position(job)}
+
+
+@router.get("/learn/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status in ("queued", "running"):
+        return JSONResponse(status_code=202, content={
+            **job.to_dict(),
+            "position": ingest_queue.position(job),
+            "message": f"Job is {job.status}. Retry later."
+        })
+    
+    if job.status == "done":
+        return _learn_result(job.song_name, job.mode, job.result["fingerprints_count"],
+                             job.result["created"], job.result["replaced_fingerprints"])
+    
+    # Same status codes as a direct /learn
+    if isinstance(job.error, SongExistsError):
+        raise HTTPException(status_code=409, detail=str(job.error))
+    if isinstance(job.error, NoFingerprintsError):
+        raise HTTPException(status_code=400, detail=str(job.error))
+    if isinstance(job.error, ReadOnlyIndexError):
+        raise HTTPException(status_code=405, detail=str(job.error))
+    raise HTTPException(status_code=500, detail=f"Error processing audio file: {job.error}")
+
+
 @router.post("/recognize")
 async def recognize_song(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    top_k: int = Query(1, ge=1, le=MAX_TOP_K),
+    db: PersistentDB = Depends(get_index)
 ):
     if not file.content_type or not any(
         file.content_type.startswith(f"audio/{ext}") 
@@ -97,7 +383,7 @@ async def recognize_song(
                 detail="Invalid file type. Please upload an audio file (WAV, MP3, etc.)"
             )
     
-    song_count = db.get_song_count()
+    song_count = await run_in_threadpool(db.get_song_count)
     
     if song_count == 0:
         return JSONResponse({
@@ -116,7 +402,7 @@ async def recognize_song(
             tmp_file_path = tmp_file.name
             
             try:
-                query_fingerprints = fingerprinter.process_file(tmp_file_path)
+                query_fingerprints = await run_in_threadpool(fingerprinter.process_file, tmp_file_path)
             except Exception as fp_error:
                 raise
             
@@ -129,28 +415,7 @@ async def recognize_song(
                     "message": "Failed to generate fingerprints from audio sample."
                 })
             
-            try:
-                result = db.query(query_fingerprints, min_matches=5)
-            except Exception as query_error:
-                raise
-            
-            if result:
-                song_name, match_count, confidence = result
-                return JSONResponse({
-                    "success": True,
-                    "song": song_name,
-                    "confidence": round(confidence * 100, 2),
-                    "matches": match_count,
-                    "message": f"Recognized as '{song_name}' with {confidence*100:.2f}% confidence"
-                })
-            else:
-                return JSONResponse({
-                    "success": False,
-                    "song": None,
-                    "confidence": 0.0,
-                    "matches": 0,
-                    "message": "No matching song found in database."
-                })
+            return await _recognize(db, query_fingerprints, top_k)
                 
         except HTTPException:
             raise
@@ -167,26 +432,227 @@ async def recognize_song(
                     pass
 
 
-@router.get("/stats")
-async def get_stats():
+def _batch_limit_error(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{detail} (a request may hold at most {MAX_BATCH_CLIPS} clips "
+                                                 f"and {MAX_BATCH_BYTES // (1024 * 1024)} MB of audio)")
+
+
+def _zip_clips(content: bytes, max_clips: int, max_bytes: int) -> List[tuple]:
+    """
+    (name, content) of the audio members of a zip archive
+
+    The limits are checked against the sizes in the archive directory before
+    anything is unpacked.
+    """
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        members = [member for member in archive.infolist()
+                   if not member.is_dir()
+                   and os.path.splitext(member.filename)[1].lower() in AUDIO_EXTENSIONS
+                   and not os.path.basename(member.filename).startswith(".")
+                   and not member.filename.startswith("__MACOSX/")]
+        if len(members) > max_clips:
+            raise _batch_limit_error("Too many clips")
+        if sum(member.file_size for member in members) > max_bytes:
+            raise _batch_limit_error("Too much audio")
+        return [(member.filename, archive.read(member)) for member in members]
+
+
+@router.post("/recognize/batch")
+async def recognize_batch(
+    files: List[UploadFile] = File(...),
+    top_k: int = Query(1, ge=1, le=MAX_TOP_K),
+    db: PersistentDB = Depends(get_index)
+):
+    # Running totals over all parts: a request is refused as soon as it passes a limit
+    clips = []
+    total_bytes = 0
+    for upload in files:
+        filename = upload.filename or f"clip-{len(clips) + 1}"
+        if filename.lower().endswith(".zip") or upload.content_type in ("application/zip", "application/x-zip-compressed"):
+            # Audio hardly compresses, so an archive larger than the whole budget cannot fit it
+            content = await upload.read(MAX_BATCH_BYTES + 1)
+            if len(content) > MAX_BATCH_BYTES:
+                raise _batch_limit_error(f"The archive '{filename}' is too large")
+            try:
+                members = _zip_clips(content, MAX_BATCH_CLIPS - len(clips), MAX_BATCH_BYTES - total_bytes)
+            except (zipfile.BadZipFile, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid zip archive '{filename}': {e}")
+            del content
+            clips.extend(members)
+            total_bytes += sum(len(member_content) for _, member_content in members)
+        elif os.path.splitext(filename)[1].lower() in AUDIO_EXTENSIONS or (
+            upload.content_type or ""
+        ).startswith("audio/"):
+            if len(clips) >= MAX_BATCH_CLIPS:
+                raise _batch_limit_error("Too many clips")
+            content = await upload.read(MAX_BATCH_BYTES - total_bytes + 1)
+            if total_bytes + len(content) > MAX_BATCH_BYTES:
+                raise _batch_limit_error("Too much audio")
+            clips.append((filename, content))
+            total_bytes += len(content)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type for '{filename}'. Upload audio files (WAV, MP3, etc.) or a zip of them"
+            )
+    
+    if not clips:
+        raise HTTPException(status_code=400, detail="The request holds no audio clips.")
+    
+    if await run_in_threadpool(db.get_song_count) == 0:
+        return JSONResponse({
+            "success": False,
+            "clips": [],
+            "message": "Database is empty. Please add songs first using /learn endpoint."
+        })
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_paths = []
+        for number, (name, content) in enumerate(clips):
+            tmp_path = os.path.join(tmp_dir, f"{number}{os.path.splitext(name)[1]}")
+            with open(tmp_path, "wb") as tmp_file:
+                tmp_file.write(content)
+            tmp_paths.append(tmp_path)
+        fingerprinted = await run_in_threadpool(fingerprint_pool.fingerprint_files, tmp_paths)
+    
+    # One lookup pass for all clips; failed clips take part as empty queries
+    queries = [[] if isinstance(result, Exception) else result for result in fingerprinted]
+    query_stats = {}
+    try:
+        results = await run_in_threadpool(
+            db.query_top_k_batch, queries, top_k=top_k, min_matches=5, stats=query_stats
+        )
+    except CoordinatorError as query_error:
+        raise HTTPException(status_code=503, detail=str(query_error))
+    
+    clip_results = []
+    for (name, _), outcome, query, candidates, clip_stats in zip(clips, fingerprinted, queries, results,
+                                                                 query_stats["clips"]):
+        if not query:
+            reason = f": {outcome}" if isinstance(outcome, Exception) else "."
+            clip_results.append({
+                "clip": name,
+                "success": False,
+                "song": None,
+                "confidence": 0.0,
+                "matches": 0,
+                "message": f"Failed to generate fingerprints from audio sample{reason}"
+            })
+        else:
+            clip_results.append({"clip": name, **_recognition_result(candidates, clip_stats)})
+    
+    recognized = sum(1 for clip in clip_results if clip["success"])
+    return JSONResponse({
+        "success": recognized > 0,
+        "clips": clip_results,
+        "recognized": recognized,
+        "lookups": query_stats.get("lookups", 0),
+        "hashes": query_stats.get("hashes", 0),
+        "message": f"Recognized {recognized} of {len(clips)} clips"
+    })
+
+
+@router.post("/recognize/fingerprints")
+async def recognize_fingerprints(
+    request: Request,
+    top_k: int = Query(1, ge=1, le=MAX_TOP_K),
+    db: PersistentDB = Depends(get_index)
+):
+    query_fingerprints = await run_in_threadpool(_decode_payload, await request.body())
+    
+    if await run_in_threadpool(db.get_song_count) == 0:
+        return JSONResponse({
+            "success": False,
+            "song": None,
+            "confidence": 0.0,
+            "matches": 0,
+            "message": "Database is empty. Please add songs first using /learn endpoint."
+        })
+    
+    if not query_fingerprints:
+        return JSONResponse({
+            "success": False,
+            "song": None,
+            "confidence": 0.0,
+            "matches": 0,
+            "message": "The payload holds no fingerprints."
+        })
+    
+    return await _recognize(db, query_fingerprints, top_k)
+
+
+@router.get("/fingerprinter")
+async def get_fingerprinter():
     return {
-        "song_count": db.get_song_count(),
-        "fingerprint_count": db.get_fingerprint_count(),
-        "songs": db.list_songs()
+        "params": fingerprinter.params(),
+        "signature": f"{fingerprinter_signature(fingerprinter):016x}",
+        "payload_version": PAYLOAD_VERSION,
+        "content_type": PAYLOAD_CONTENT_TYPE,
+        "bundle_content_type": BUNDLE_CONTENT_TYPE
     }
 
 
+@router.get("/stats")
+async def get_stats(db: PersistentDB = Depends(get_index)):
+    stats = {
+        "song_count": await run_in_threadpool(db.get_song_count),
+        "fingerprint_count": await run_in_threadpool(db.get_fingerprint_count)
+    }
+    if db.posting_cache is not None:
+        stats["posting_cache"] = db.posting_cache.stats()
+    if db.bloom is not None:
+        stats["bloom_filter"] = db.bloom.stats()
+    if isinstance(db, SnapshotIndex):
+        stats["snapshot"] = {"path": db.path, "created_at": db.manifest["created_at"]}
+    if isinstance(db, ShardedIndex):
+        stats["shards"] = db.shard_stats()
+    if isinstance(db, CoordinatorIndex):
+        stats["backends"] = db.backend_stats()
+    return stats
+
+
+def _encode_cursor(song_name: str) -> str:
+    return base64.urlsafe_b64encode(song_name.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/songs")
-async def list_songs():
+async def list_songs(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: PersistentDB = Depends(get_index)
+):
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    after = _decode_cursor(cursor) if cursor else None
+    
+    try:
+        songs, last_name = await run_in_threadpool(
+            db.list_songs_page, limit=limit, after=after, prefix=prefix, fields=field_list
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CoordinatorError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
     return {
-        "songs": db.list_songs(),
-        "count": db.get_song_count()
+        # Plain names unless specific fields were requested
+        "songs": songs if field_list else [song["name"] for song in songs],
+        "count": await run_in_threadpool(db.get_song_count),
+        "next_cursor": _encode_cursor(last_name) if last_name is not None else None
     }
 
 
 @router.delete("/songs/{song_name}")
-async def delete_song(song_name: str):
-    success, deleted_count = db.delete_song(song_name)
+async def delete_song(song_name: str, db: PersistentDB = Depends(get_writable_index)):
+    success, deleted_count = await run_in_threadpool(db.delete_song, song_name)
     
     if success:
         return JSONResponse({
@@ -208,15 +674,157 @@ async def delete_song(song_name: str):
 
 
 @router.delete("/songs")
-async def clear_all_songs():
-    song_count = db.get_song_count()
-    fingerprint_count = db.get_fingerprint_count()
+async def clear_all_songs(db: PersistentDB = Depends(get_writable_index)):
+    song_count = await run_in_threadpool(db.get_song_count)
+    fingerprint_count = await run_in_threadpool(db.get_fingerprint_count)
     
-    db.clear_all()
+    bytes_freed = await run_in_threadpool(db.clear_all)
     
     return JSONResponse({
         "success": True,
         "deleted_songs": song_count,
         "deleted_fingerprints": fingerprint_count,
+        "bytes_freed": bytes_freed,
         "message": f"Database cleared. Deleted {song_count} songs and {fingerprint_count} fingerprints."
     })
+
+
+@router.post("/songs/delete")
+async def delete_songs(request: DeleteSongsRequest, db: PersistentDB = Depends(get_writable_index)):
+    if not request.names and request.pattern is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide 'names', 'pattern' or both."
+        )
+    
+    result = await run_in_threadpool(db.delete_songs, request.names, request.pattern)
+    
+    return JSONResponse({
+        "success": True,
+        "deleted_songs": result["songs_deleted"],
+        "deleted_fingerprints": result["fingerprints_deleted"],
+        "not_found": result["not_found"],
+        "bytes_freed": result["bytes_freed"],
+        "message": f"Deleted {result['songs_deleted']} songs and {result['fingerprints_deleted']} fingerprints."
+    })
+
+
+@router.post("/admin/compact")
+async def start_compaction(convert_auto_vacuum: bool = False,
+                           db: PersistentDB = Depends(get_writable_index)):
+    if not compaction_job.start(convert_auto_vacuum=convert_auto_vacuum):
+        return JSONResponse(status_code=409, content={
+            "success": False,
+            "progress": compaction_job.progress,
+            "message": "Compaction is already running."
+        })
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "progress": compaction_job.progress,
+        "message": "Compaction started. Poll GET /admin/compact for progress."
+    })
+
+
+@router.get("/admin/compact")
+async def get_compaction_progress():
+    return compaction_job.progress
+
+
+@router.post("/admin/ingest")
+async def start_directory_ingest(path: str = Query(..., min_length=1),
+                                 recursive: bool = True,
+                                 db: PersistentDB = Depends(get_writable_index)):
+    try:
+        started = directory_ingest_job.start(path, recursive=recursive)
+    except IngestPathError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not started:
+        return JSONResponse(status_code=409, content={
+            "success": False,
+            "progress": directory_ingest_job.progress,
+            "message": "An ingestion is already running."
+        })
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "progress": directory_ingest_job.progress,
+        "message": "Ingestion started. Poll GET /admin/ingest for progress."
+    })
+
+
+@router.get("/admin/ingest")
+async def get_directory_ingest_progress():
+    return directory_ingest_job.progress
+
+
+@router.post("/admin/reload")
+async def start_reload():
+    if compaction_job.running:
+        return JSONResponse(status_code=409, content={
+            "success": False,
+            "index": index_manager.status(),
+            "message": "Compaction is running on the live index. Retry once it has finished."
+        })
+    if not index_manager.reload(trigger="admin"):
+        return JSONResponse(status_code=409, content={
+            "success": False,
+            "index": index_manager.status(),
+            "message": "A reload is already running."
+        })
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "index": index_manager.status(),
+        "message": "Reload started. Poll GET /admin/reload for progress."
+    })
+
+
+@router.get("/admin/reload")
+async def get_reload_status():
+    return index_manager.status()
+
+
+@router.post("/admin/shards")
+async def rebalance_shards(
+    shards: int = Query(..., ge=1, le=MAX_SHARDS),
+    db: PersistentDB = Depends(get_index)
+):
+    if not isinstance(db, ShardedIndex):
+        raise HTTPException(
+            status_code=400,
+            detail="The live index is not sharded (start the server with INDEX_BACKEND=sharded)."
+        )
+    
+    await run_in_threadpool(db.rebalance, shards)
+    
+    return JSONResponse({
+        "success": True,
+        "shards": db.shard_stats(),
+        "message": f"Index repartitioned over {len(db.shard_stats())} shards."
+    })
+
+
+@router.post("/shard/query")
+async def shard_query(
+    request: Request,
+    top_k: int = Query(5, ge=1, le=MAX_TOP_K),
+    min_matches: int = Query(5, ge=1),
+    db: PersistentDB = Depends(get_index)
+):
+    query_fingerprints = await run_in_threadpool(_decode_payload, await request.body())
+    
+    query_stats = {}
+    results = await run_in_threadpool(
+        db.query_top_k, query_fingerprints, top_k=top_k, min_matches=min_matches, stats=query_stats
+    )
+    
+    return {
+        "results": [
+            {field: result[field] for field in ("song", "score", "matches", "hits", "offset", "confidence")}
+            for result in results
+        ],
+        "stats": query_stats
+    }
@@ -0,0 +1,167 @@
+"""
+Bloom Filter over Fingerprint Hashes
+Answers "is this hash in the catalog at all?" from memory, so absent hashes
+never reach the index
+"""
+
+import math
+import os
+import struct
+import threading
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+# File layout: magic, then (version, m, k, count, capacity, watermark, source_id,
+# generation, crc32), then the bit array
+BLOOM_MAGIC = b"MRBLOOM1"
+BLOOM_VERSION = 3
+_HEADER = struct.Struct("<8s9q")
+
+DEFAULT_FP_RATE = 0.01
+MIN_CAPACITY = 1 << 20
+
+_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads every input bit over the whole word"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """
+    Bloom filter over packed int64 hash keys (see app.core.hashing)
+
+    m bits and k probes per key, sized for `capacity` keys at `fp_rate`.
+    Probes use double hashing (h1 + i * h2) of two splitmix64 mixes, all
+    vectorized over the key array. Keys can be added but not removed; a
+    deleted song only leaves stale bits behind, which slightly raises the
+    false-positive rate until the filter is rebuilt.
+
+    Lookup counters (checks, rejections, false_positives) are recorded by the
+    caller with record(), since only the index knows whether a passed key
+    really existed.
+    """
+
+    def __init__(self, capacity: int = MIN_CAPACITY, fp_rate: float = DEFAULT_FP_RATE,
+                 m: Optional[int] = None, k: Optional[int] = None,
+                 bits: Optional[np.ndarray] = None, count: int = 0):
+        self.capacity = max(int(capacity), 1)
+        if m is None:
+            m = int(math.ceil(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        if k is None:
+            k = max(1, int(round(m / self.capacity * math.log(2))))
+        self.m = (m + 7) // 8 * 8
+        self.k = k
+        self.bits = bits if bits is not None else np.zeros(self.m // 8, dtype=np.uint8)
+        self.count = count
+        self._stats_lock = threading.Lock()
+        self.checks = 0
+        self.rejections = 0
+        self.false_positives = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+        h1 = _mix64(keys)
+        h2 = _mix64(keys ^ _SEED) | np.uint64(1)
+        probes = np.arange(self.k, dtype=np.uint64)
+        return (h1[:, None] + probes[None, :] * h2[:, None]) % np.uint64(self.m)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Boolean array: False means the key is certainly absent"""
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.int64)]
+        set_bits = (bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=1)
+
+    def add(self, keys: np.ndarray) -> int:
+        """
+        Add keys to the filter
+
+        Returns:
+            Number of keys that were not already (apparently) present
+        """
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        if len(keys) == 0:
+            return 0
+        new = int((~self.contains(keys)).sum())
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.int64),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += new
+        return new
+
+    def expected_fp_rate(self) -> float:
+        """Theoretical false-positive rate at the current fill"""
+        return (1.0 - math.exp(-self.k * self.count / self.m)) ** self.k
+
+    def record(self, checks: int, rejections: int, false_positives: int):
+        with self._stats_lock:
+            self.checks += checks
+            self.rejections += rejections
+            self.false_positives += false_positives
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            absent = self.rejections + self.false_positives
+            return {
+                "keys": self.count,
+                "capacity": self.capacity,
+                "bytes": self.nbytes,
+                "hashes_per_key": self.k,
+                "expected_fp_rate": round(self.expected_fp_rate(), 6),
+                "observed_fp_rate": round(self.false_positives / absent, 6) if absent else 0.0,
+                "checks": self.checks,
+                "avoided_lookups": self.rejections,
+                "avoided_fraction": round(self.rejections / self.checks, 4) if self.checks else 0.0,
+            }
+
+    def save(self, path: str, watermark: int, source_id: int = 0, generation: int = 0):
+        """
+        Write the filter to `path` atomically
+
+        Args:
+            watermark: Highest fingerprint row id covered by the filter
+            source_id: Identity of the database file the filter was built from
+            generation: Catalog generation of that database when the filter was saved
+        """
+        tmp_path = f"{path}.tmp"
+        header = _HEADER.pack(BLOOM_MAGIC, BLOOM_VERSION, self.m, self.k, self.count,
+                              self.capacity, watermark, source_id, generation, zlib.crc32(self.bits.tobytes()))
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(self.bits.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Tuple["BloomFilter", int, int, int]]:
+        """
+        Read a filter written by save()
+
+        Returns:
+            (filter, watermark, source_id, generation), or None if the file is missing,
+            from another version or corrupt
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                return None
+            magic, version, m, k, count, capacity, watermark, source_id, generation, crc = _HEADER.unpack(header)
+            if magic != BLOOM_MAGIC or version != BLOOM_VERSION:
+                return None
+            bits = np.frombuffer(f.read(), dtype=np.uint8).copy()
+        if len(bits) * 8 != m or zlib.crc32(bits.tobytes()) != crc:
+            return None
+        return cls(capacity=capacity, m=m, k=k, bits=bits, count=count), watermark, source_id, generation
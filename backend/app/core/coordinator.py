@@ -0,0 +1,240 @@
+"""
+Catalog Coordinator
+Fans recognition queries out to several backend servers, each holding part of
+the catalog, and merges their candidates into one ranking
+"""
+
+import base64
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+import requests
+
+from app.core.database import ReadOnlyIndexError
+from app.core.dsp_engine import AudioFingerprinter
+from app.core.fingerprint_codec import PAYLOAD_CONTENT_TYPE, encode_fingerprints
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# A backend that has not answered within this time is left out of the result
+DEFAULT_BACKEND_TIMEOUT_SECONDS = 2.0
+
+# Song and fingerprint counts of the backends are refreshed at most this often
+COUNTS_TTL_SECONDS = 10.0
+
+
+class CoordinatorError(RuntimeError):
+    """Raised when no backend could answer"""
+
+
+class CoordinatorIndex:
+    """
+    Read-only index whose catalog is spread over several backend servers
+
+    Each backend is a normal server (any index backend) holding its own subset
+    of songs. query_top_k sends the query fingerprints to every backend in
+    parallel (POST /shard/query, as a fingerprint payload) and merges their top-K lists by score;
+    scores and confidences only depend on the query and the song, so they
+    compare across backends. A backend that fails or misses the deadline is
+    reported in the query stats and the result is built from the others
+    (partial result); only when none answers is CoordinatorError raised.
+    Backends reject payloads from a fingerprinter with other settings, so a
+    misconfigured backend shows up as failed rather than as wrong matches.
+
+    Writes are not routed (the coordinator does not know which backend should
+    own a new song): send them to a backend directly.
+    """
+
+    read_only = True
+    posting_cache = None
+    bloom = None
+
+    def __init__(self, backend_urls: List[str], fingerprinter: AudioFingerprinter,
+                 timeout: float = DEFAULT_BACKEND_TIMEOUT_SECONDS):
+        """
+        Args:
+            backend_urls: Base URLs of the backends (e.g. http://10.0.0.5:8000)
+            fingerprinter: The fingerprinter that produces the query fingerprints
+            timeout: Seconds to wait for each backend
+        """
+        if not backend_urls:
+            raise ValueError("The coordinator needs at least one backend")
+        self.backend_urls = [url.rstrip("/") for url in backend_urls]
+        self.fingerprinter = fingerprinter
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.backend_urls),
+                                            thread_name_prefix="coordinator")
+        self._counts_lock = threading.Lock()
+        self._counts = {url: {"song_count": 0, "fingerprint_count": 0} for url in self.backend_urls}
+        self._counts_at = 0.0
+        self.backend_errors = {url: 0 for url in self.backend_urls}
+        self._refresh_counts()
+        logger.info(f"🛰️  Coordinator over {len(self.backend_urls)} backends: "
+                    f"{self.get_song_count()} songs")
+
+    def _fan_out(self, request) -> Tuple[dict, dict]:
+        """
+        Run request(url) for every backend in parallel, within the timeout
+
+        Returns:
+            Tuple of (answers, failures): url -> answer and url -> reason
+        """
+        futures = {self._executor.submit(request, url): url for url in self.backend_urls}
+        done, _ = wait(futures, timeout=self.timeout)
+        answers, failures = {}, {}
+        for future, url in futures.items():
+            if future not in done:
+                future.cancel()
+                failures[url] = "timeout"
+            elif isinstance(future.exception(), requests.HTTPError):
+                failures[url] = f"HTTP {future.exception().response.status_code}"
+            elif future.exception() is not None:
+                failures[url] = type(future.exception()).__name__
+            else:
+                answers[url] = future.result()
+        for url in failures:
+            self.backend_errors[url] += 1
+        return answers, failures
+
+    def _get(self, url: str, path: str, params: Optional[dict] = None) -> dict:
+        response = self._session.get(f"{url}{path}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _refresh_counts(self, max_age: float = COUNTS_TTL_SECONDS):
+        if time.monotonic() - self._counts_at < max_age:
+            return
+        answers, _ = self._fan_out(lambda url: self._get(url, "/stats"))
+        with self._counts_lock:
+            for url, answer in answers.items():
+                self._counts[url] = {"song_count": answer["song_count"],
+                                     "fingerprint_count": answer["fingerprint_count"]}
+            self._counts_at = time.monotonic()
+
+    def query_top_k(self, query_fingerprints: List[Tuple],
+                    top_k: int = 5,
+                    min_matches: int = 5,
+                    stats: Optional[dict] = None) -> List[dict]:
+        """
+        Query every backend and return the global top-K candidates
+
+        Same contract as PersistentDB.query_top_k, plus a `backend` field on
+        each candidate (song_id is only meaningful on that backend). `stats`
+        also receives `backends`: queried, answered and failed (url -> reason).
+        """
+        if not query_fingerprints:
+            return []
+        body = encode_fingerprints(query_fingerprints, self.fingerprinter)
+        params = {"top_k": top_k, "min_matches": min_matches}
+
+        def query_backend(url: str) -> dict:
+            response = self._session.post(f"{url}/shard/query", params=params, data=body,
+                                          headers={"Content-Type": PAYLOAD_CONTENT_TYPE},
+                                          timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        answers, failures = self._fan_out(query_backend)
+        if not answers:
+            raise CoordinatorError(f"No backend answered: {failures}")
+
+        candidates = []
+        for url, answer in answers.items():
+            candidates.extend({**candidate, "backend": url} for candidate in answer["results"])
+        candidates.sort(key=lambda candidate: (candidate["score"], candidate["confidence"]), reverse=True)
+
+        if stats is not None:
+            for key in ("lookups", "fetched"):
+                stats[key] = sum(answer["stats"].get(key, 0) for answer in answers.values())
+            stats["hashes"] = max(answer["stats"].get("hashes", 0) for answer in answers.values())
+            stats["backends"] = {
+                "queried": len(self.backend_urls),
+                "answered": len(answers),
+                "failed": failures,
+            }
+        return candidates[:top_k]
+
+    def query_top_k_batch(self, queries: List[List[Tuple]],
+                          top_k: int = 5,
+                          min_matches: int = 5,
+                          stats: Optional[dict] = None) -> List[List[dict]]:
+        """
+        Same contract as PersistentDB.query_top_k_batch
+
+        Each sample is sent to the backends on its own (they share lookups
+        within their own index), with the samples' fan-outs running in parallel.
+        """
+        clip_stats = [{} for _ in queries]
+        with ThreadPoolExecutor(max_workers=min(len(queries), 8) or 1) as executor:
+            results = list(executor.map(
+                lambda number: self.query_top_k(queries[number], top_k=top_k, min_matches=min_matches,
+                                                stats=clip_stats[number]),
+                range(len(queries))
+            ))
+        if stats is not None:
+            stats.update({
+                "clips": clip_stats,
+                "hashes": sum(clip.get("hashes", 0) for clip in clip_stats),
+                "lookups": sum(clip.get("lookups", 0) for clip in clip_stats),
+            })
+        return results
+
+    def query(self, query_fingerprints: List[Tuple], min_matches: int = 5) -> Optional[Tuple[str, int, float]]:
+        results = self.query_top_k(query_fingerprints, top_k=1, min_matches=min_matches)
+        if not results:
+            return None
+        best = results[0]
+        return best["song"], best["matches"], best["confidence"]
+
+    def get_song_count(self) -> int:
+        self._refresh_counts()
+        return sum(counts["song_count"] for counts in self._counts.values())
+
+    def get_fingerprint_count(self) -> int:
+        self._refresh_counts()
+        return sum(counts["fingerprint_count"] for counts in self._counts.values())
+
+    def list_songs_page(self, limit: int = 100,
+                        after: Optional[str] = None,
+                        prefix: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+        """Same contract as PersistentDB.list_songs_page: one page of each backend, merged by name"""
+        fields = list(fields) if fields else ["name"]
+        columns = fields if "name" in fields else fields + ["name"]
+        params = {"limit": limit, "prefix": prefix, "fields": ",".join(columns)}
+        if after is not None:
+            # Backends take the same opaque cursor the API hands out
+            params["cursor"] = base64.urlsafe_b64encode(after.encode("utf-8")).decode("ascii")
+
+        answers, failures = self._fan_out(lambda url: self._get(url, "/songs", params))
+        if failures:
+            raise CoordinatorError(f"Backends did not answer: {failures}")
+
+        merged = {}
+        for answer in answers.values():
+            for song in answer["songs"]:
+                merged.setdefault(song["name"], song)
+        rows = [merged[name] for name in sorted(merged)]
+        has_more = len(rows) > limit or any(answer["next_cursor"] for answer in answers.values())
+        rows = rows[:limit]
+        songs = [{field: row.get(field) for field in fields} for row in rows]
+        return songs, (rows[-1]["name"] if has_more and rows else None)
+
+    def backend_stats(self) -> List[dict]:
+        return [{"url": url, **self._counts[url], "errors": self.backend_errors[url]}
+                for url in self.backend_urls]
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyIndexError("The coordinator does not accept writes; send them to a backend")
+
+    add_song = add_songs_bulk = bulk_load = _read_only
+    delete_song = delete_songs = clear = clear_all = _read_only
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
@@ -1,39 +1,460 @@
 import sqlite3
 import os
-from collections import Counter, defaultdict
-from typing import List, Tuple, Optional
+import threading
+import functools
+from urllib.request import pathname2url
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
 import logging
 
+import numpy as np
+
+from app.core.bloom import DEFAULT_FP_RATE, MIN_CAPACITY, BloomFilter
+from app.core.hashing import pack_hash_strings, pack_hashes
+from app.core.matcher import DEFAULT_TOP_N, QueryPlan, normalized_confidence, plan_matches, rank_candidates
+from app.core.posting_cache import PostingCache
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Stay below SQLite's default limit on bound parameters per statement
+SQLITE_MAX_VARIABLES = 900
+
+# Connection tuning: WAL lets readers run alongside the single writer,
+# synchronous=NORMAL is safe in WAL mode, and the page cache / memory map
+# keep hot index pages out of the read() path
+SQLITE_CACHE_SIZE_KB = 65536
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Secondary indexes on fingerprints; bulk loads drop them and rebuild them once at the end
+SECONDARY_INDEXES = {
+    "idx_hash_token": "CREATE INDEX IF NOT EXISTS idx_hash_token ON fingerprints(hash_token)",
+    "idx_song_id": "CREATE INDEX IF NOT EXISTS idx_song_id ON fingerprints(song_id)",
+}
+
+# Songs written per transaction by a bulk load
+BULK_SONGS_PER_TRANSACTION = 50
+
+# Index entries counted per hash when planning a query. Lists at the cap are
+# fetched last anyway, so their exact length does not matter, and a hot hash
+# costs one index descent instead of a walk over its whole posting list.
+POSTING_COUNT_CAP = 256
+
+# Song columns that list_songs_page can return
+SONG_FIELDS = ("id", "name", "created_at", "duration", "fingerprint_count", "content_hash")
+
+# Counters kept in the catalog_stats table, with the query used to seed them once
+CATALOG_COUNTERS = {
+    "song_count": "SELECT COUNT(*) FROM songs",
+    "fingerprint_count": "SELECT COUNT(*) FROM fingerprints",
+}
+
+# catalog_stats key bumped by every delete and clear, by any process. clear()
+# restarts the fingerprint ids, so a saved Bloom filter is only reused if it
+# was saved at the current generation.
+CATALOG_GENERATION = "generation"
+
+# The Bloom filter is written next to the database every this many ingested songs
+# (and on close); rows added since the last save are replayed on the next open
+BLOOM_SAVE_EVERY_SONGS = 50
 
-class PersistentDB:
+# What add_song does when the song name already exists
+INGEST_REJECT = "reject"
+INGEST_REPLACE = "replace"
+INGEST_APPEND = "append"
+INGEST_MODES = (INGEST_REJECT, INGEST_REPLACE, INGEST_APPEND)
+
+
+class SongExistsError(ValueError):
+    """Raised by add_song in reject mode when the song name is already taken"""
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """Raised when a write is attempted on a read-only index (e.g. a mapped snapshot)"""
+
+
+def _serialized_write(method):
+    """Run a PersistentDB method on the writer connection, one writer at a time"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class IndexQueries:
+    """
+    Query side shared by every index backend
+    
+    Subclasses provide the index: _query_keys, _posting_lengths,
+    _lookup_postings and the per-song statistics in _song_meta.
+    """
+    
+    @staticmethod
+    def _tie_keys(query_fingerprints: List[Tuple], query_key_idx: np.ndarray, unique_count: int) -> np.ndarray:
+        """Packed key of each unique query hash, whatever key type the backend uses"""
+        tie_keys = np.empty(unique_count, dtype=np.int64)
+        tie_keys[query_key_idx] = pack_hashes([hash_token for hash_token, _ in query_fingerprints])
+        return tie_keys
     
-    def __init__(self, db_path: str = "music_recognition.db"):
+    def query_top_k(self, query_fingerprints: List[Tuple],
+                    top_k: int = 5,
+                    min_matches: int = 5,
+                    top_n: int = DEFAULT_TOP_N,
+                    min_hits: Optional[int] = None,
+                    early_stop: bool = True,
+                    stats: Optional[dict] = None) -> List[dict]:
+        """
+        Query the database and return the top-K candidate songs in one pass
+        
+        A query planner looks hashes up shortest posting list first and stops
+        once the ranking of the top_k songs is statistically decided. The
+        fetched matches are then scored in two stages: raw hash hits are
+        counted per song with a bincount, then offset histograms are built
+        only for the top_n songs.
+        
+        Args:
+            query_fingerprints: List of ((hash_token), sample_time) tuples
+            top_k: Maximum number of candidates to return
+            min_matches: Minimum time-coherent matches for a candidate
+            top_n: Number of candidate songs kept after stage one (at least top_k)
+            min_hits: Minimum raw hash hits for a song to reach stage two
+                      (defaults to min_matches, which never drops a valid match)
+            early_stop: Set to False to look up every query hash
+            stats: Optional dict that receives planner statistics
+                   (hashes, lookups, present, fetched, batches, early_stopped)
+            
+        Returns:
+            List of candidate dicts, best first, each with:
+            song, song_id, score (time-coherent matches extrapolated to the whole
+            sample if the planner stopped early), matches (time-coherent matches
+            seen), hits (raw hash hits seen), offset (position of the sample in
+            the song, seconds) and confidence (score relative to the most
+            time-coherent matches the sample could share with that song,
+            using the song statistics stored at ingest)
+        """
+        if not query_fingerprints:
+            return []
+        
+        # Each distinct hash is looked up at most once, however often it occurs in the sample
+        unique_keys, query_key_idx = np.unique(self._query_keys(query_fingerprints), return_inverse=True)
+        query_times = np.array([sample_time for _, sample_time in query_fingerprints], dtype=np.float64)
+        
+        def fetch_postings(key_indices: np.ndarray):
+            match_key_idx, song_ids, times = self._lookup_postings(unique_keys[key_indices])
+            return key_indices[match_key_idx], song_ids, times
+        
+        plan: dict = {}
+        # Capped as by the SQLite probe, so every backend plans the same lookups
+        lengths = np.minimum(self._posting_lengths(unique_keys), POSTING_COUNT_CAP)
+        song_ids, offsets = plan_matches(
+            lengths, query_key_idx, query_times,
+            fetch_postings, min_matches, top_k=top_k, early_stop=early_stop,
+            tie_keys=self._tie_keys(query_fingerprints, query_key_idx, len(unique_keys)), stats=plan
+        )
+        if stats is not None:
+            stats.update(plan)
+        
+        return self._rank_matches(song_ids, offsets, plan, query_times, top_k, min_matches, top_n, min_hits)
+    
+    def _rank_matches(self, song_ids: np.ndarray, offsets: np.ndarray, plan: dict,
+                      query_times: np.ndarray, top_k: int, min_matches: int,
+                      top_n: int, min_hits: Optional[int]) -> List[dict]:
+        """Score the votes gathered by the query planner into candidate dicts (see query_top_k)"""
+        if min_hits is None:
+            min_hits = min_matches
+        candidates = rank_candidates(song_ids, offsets, top_n=max(top_n, top_k), min_hits=min_hits)
+        
+        # After an early stop only part of the indexed hashes have voted,
+        # so the match rate among them is extrapolated to the rest
+        coverage = plan["present"] / plan["fetched"] if plan["fetched"] else 0.0
+                
+        query_span = float(query_times.max() - query_times.min())
+        
+        # Candidates are ranked best first; skip fingerprints left behind by deleted songs
+        results = []
+        for song_id, count, offset, hits in candidates:
+            if count < min_matches or len(results) >= top_k:
+                break
+            meta = self._song_meta.get(song_id)
+            if meta is None:
+                continue
+            score = count * coverage
+            results.append({
+                "song": meta["name"],
+                "song_id": song_id,
+                "score": score,
+                "matches": count,
+                "hits": hits,
+                "offset": offset,
+                "confidence": normalized_confidence(score, len(query_times), query_span,
+                                                    meta["fingerprint_count"], meta["duration"]),
+            })
+        
+        return results
+    
+    def query_top_k_batch(self, queries: List[List[Tuple]],
+                          top_k: int = 5,
+                          min_matches: int = 5,
+                          top_n: int = DEFAULT_TOP_N,
+                          min_hits: Optional[int] = None,
+                          early_stop: bool = True,
+                          stats: Optional[dict] = None) -> List[List[dict]]:
+        """
+        Run query_top_k for several samples at once, sharing the index lookups
+        
+        The posting lengths of all the samples' hashes are read in one call.
+        Then the query planners of all samples advance in lockstep: in each
+        round the hashes that the unfinished planners want are merged,
+        deduplicated, and the ones not fetched in an earlier round are looked
+        up together; each planner then votes with its own hashes' postings.
+        Every sample gets exactly the result query_top_k would give it, while
+        a hash shared by several samples is fetched once.
+        
+        Args:
+            queries: One list of ((hash_token), sample_time) tuples per sample
+            top_k, min_matches, top_n, min_hits, early_stop: As in query_top_k
+            stats: Optional dict that receives `clips` (the query_top_k stats of
+                   each sample), `hashes` (distinct hashes over all samples),
+                   `lookups` (distinct hashes fetched) and `rounds`
+        
+        Returns:
+            One candidate list per sample, in order (see query_top_k)
+        """
+        active = [number for number, query in enumerate(queries) if query]
+        results: List[List[dict]] = [[] for _ in queries]
+        clip_stats = [{} for _ in queries]
+        
+        clip_keys = {number: np.unique(self._query_keys(queries[number]), return_inverse=True)
+                     for number in active}
+        all_keys = np.unique(np.concatenate([clip_keys[number][0] for number in active])) \
+            if active else np.empty(0, dtype=np.int64)
+        # Position of each sample's unique hashes among all_keys
+        to_shared = {number: np.searchsorted(all_keys, clip_keys[number][0]) for number in active}
+        lengths = np.minimum(self._posting_lengths(all_keys), POSTING_COUNT_CAP)
+        
+        times = {number: np.array([sample_time for _, sample_time in queries[number]], dtype=np.float64)
+                 for number in active}
+        plans = {number: QueryPlan(lengths[to_shared[number]], clip_keys[number][1], times[number],
+                                   min_matches, top_k=top_k, early_stop=early_stop,
+                                   tie_keys=self._tie_keys(queries[number], clip_keys[number][1],
+                                                           len(clip_keys[number][0])))
+                 for number in active}
+        
+        # Postings fetched so far, sorted by position in all_keys
+        fetched = np.zeros(len(all_keys), dtype=bool)
+        store_keys = np.empty(0, dtype=np.int64)
+        store_songs = np.empty(0, dtype=np.int64)
+        store_times = np.empty(0, dtype=np.float64)
+        rounds = 0
+        
+        batches = {number: plans[number].next_batch() for number in active}
+        batches = {number: batch for number, batch in batches.items() if batch is not None}
+        while batches:
+            rounds += 1
+            wanted = np.unique(np.concatenate([to_shared[number][batch] for number, batch in batches.items()]))
+            missing = wanted[~fetched[wanted]]
+            if len(missing):
+                key_idx, song_ids, posting_times = self._lookup_postings(all_keys[missing])
+                fetched[missing] = True
+                store_keys = np.concatenate([store_keys, missing[key_idx]])
+                store_songs = np.concatenate([store_songs, song_ids])
+                store_times = np.concatenate([store_times, posting_times])
+                order = np.argsort(store_keys, kind="stable")
+                store_keys, store_songs, store_times = store_keys[order], store_songs[order], store_times[order]
+            
+            for number, batch in batches.items():
+                # Rows of the batch's hashes, with key_idx mapped back to the sample's unique hashes
+                shared = to_shared[number][batch]
+                lo = np.searchsorted(store_keys, shared, side="left")
+                counts = np.searchsorted(store_keys, shared, side="right") - lo
+                rows = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+                plans[number].add_postings(np.repeat(batch, counts), store_songs[rows], store_times[rows])
+            
+            batches = {number: plans[number].next_batch() for number in batches}
+            batches = {number: batch for number, batch in batches.items() if batch is not None}
+        
+        for number in active:
+            plan = plans[number].stats()
+            song_ids, offsets = plans[number].matches()
+            clip_stats[number] = plan
+            results[number] = self._rank_matches(song_ids, offsets, plan, times[number],
+                                                 top_k, min_matches, top_n, min_hits)
+        
+        if stats is not None:
+            stats.update({
+                "clips": clip_stats,
+                "hashes": int(len(all_keys)),
+                "lookups": int(fetched.sum()),
+                "rounds": rounds,
+            })
+        return results
+    
+    def query(self, query_fingerprints: List[Tuple], 
+              min_matches: int = 5,
+              top_n: int = DEFAULT_TOP_N,
+              min_hits: Optional[int] = None,
+              early_stop: bool = True,
+              stats: Optional[dict] = None) -> Optional[Tuple[str, int, float]]:
+        """
+        Query the database with sample fingerprints
+        
+        Args:
+            query_fingerprints: List of ((hash_token), sample_time) tuples
+            min_matches: Minimum number of matches required
+            top_n: Number of candidate songs kept after stage one
+            min_hits: Minimum raw hash hits for a song to reach stage two
+            early_stop: Set to False to look up every query hash
+            stats: Optional dict that receives planner statistics
+        
+        Returns:
+            Tuple of (song_name, match_count, confidence) or None if no match
+            (see query_top_k for how confidence is normalized)
+        """
+        results = self.query_top_k(query_fingerprints, top_k=1, min_matches=min_matches,
+                                   top_n=top_n, min_hits=min_hits,
+                                   early_stop=early_stop, stats=stats)
+        if not results:
+            return None
+        
+        best = results[0]
+        return (best["song"], best["matches"], best["confidence"])
+
+
+class PersistentDB(IndexQueries):
+    
+    # Set by backends that serve a read-only copy of the catalog
+    read_only = False
+    
+    def __init__(self, db_path: str = "music_recognition.db",
+                 cache_size_kb: int = SQLITE_CACHE_SIZE_KB,
+                 mmap_size: int = SQLITE_MMAP_SIZE,
+                 posting_cache_bytes: int = 0,
+                 bloom_filter: bool = False,
+                 bloom_fp_rate: float = DEFAULT_FP_RATE):
         self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        # Decoded posting lists of hot hashes, so popular songs skip SQLite (0 disables it)
+        self.posting_cache = PostingCache(posting_cache_bytes) if posting_cache_bytes > 0 else None
+        # Membership filter over all stored hashes: absent hashes skip the index entirely
+        self.bloom: Optional[BloomFilter] = None
+        self.bloom_fp_rate = bloom_fp_rate
+        self._bloom_unsaved_songs = 0
+        self._bloom_source_id = 0
+        # Single writer connection; every thread gets its own read-only connection
         self.conn = None
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._pool_generation = 0
+        # Per-song statistics cached in memory: {song_id: {name, duration, fingerprint_count}}
+        self._song_meta: Dict[int, dict] = {}
+        # Catalog counters mirrored from the catalog_stats table
+        self._stats: Dict[str, int] = {}
         self._init_database()
+        self._load_song_meta()
+        self._load_stats()
+        if bloom_filter:
+            self._init_bloom()
         logger.info(f"✅ Database initialized at: {os.path.abspath(self.db_path)}")
     
+    def _tune_connection(self, conn: sqlite3.Connection):
+        """Apply the per-connection pragmas"""
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+    
     def _get_connection(self):
-        """Get database connection"""
+        """Get the writer connection (WAL mode)"""
         if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
             self.conn.row_factory = sqlite3.Row
+            # auto_vacuum only takes effect on a new database (or after a full VACUUM)
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self._tune_connection(self.conn)
         return self.conn
     
+    def _read_connection(self):
+        """Get this thread's read-only connection, opening it on first use"""
+        if self.db_path == ":memory:":
+            return self._get_connection()
+        
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation == self._pool_generation:
+            return conn
+        
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        self._tune_connection(conn)
+        with self._readers_lock:
+            self._readers.append(conn)
+        self._local.conn = conn
+        self._local.generation = self._pool_generation
+        return conn
+    
+    @_serialized_write
     def _init_database(self):
         """Initialize database schema"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        self._create_catalog_tables(cursor)
+        
+        # Progress of the last bulk load, so an interrupted one can be detected and resumed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS bulk_load_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                status TEXT NOT NULL,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                songs_loaded INTEGER NOT NULL DEFAULT 0,
+                fingerprints_loaded INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("SELECT status, songs_loaded FROM bulk_load_state WHERE id = 1")
+        state = cursor.fetchone()
+        if state is not None and state[0] != "done":
+            logger.warning(f"⚠️ Previous bulk load did not finish ({state[1]} songs committed). "
+                           f"Indexes were rebuilt; run the same bulk load again to resume.")
+        
+        # Catalog counters, maintained by add_song / delete_song / clear in the
+        # same transaction as the rows they count
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        
+        self._migrate_song_stats(cursor)
+        self._migrate_content_hash(cursor)
+        self._migrate_catalog_stats(cursor)
+        
+        conn.commit()
+        logger.info("✅ Database schema initialized")
+    
+    @staticmethod
+    def _create_catalog_tables(cursor):
+        """Create the songs and fingerprints tables and their indexes"""
         # Create songs table
+        # duration / fingerprint_count are computed at ingest
+        # so that scoring never has to touch the fingerprints table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS songs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration REAL,
+                fingerprint_count INTEGER,
+                content_hash TEXT
             )
         """)
         
@@ -50,15 +471,144 @@ class PersistentDB:
         """)
         
         # Create indexes for faster queries
+        # (also rebuilds them if a bulk load was interrupted after dropping them)
+        for index_sql in SECONDARY_INDEXES.values():
+            cursor.execute(index_sql)
+    
+    def _migrate_song_stats(self, cursor):
+        """Add the per-song statistics columns to older databases and backfill them"""
+        cursor.execute("PRAGMA table_info(songs)")
+        columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in (("duration", "REAL"),
+                                    ("fingerprint_count", "INTEGER")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE songs ADD COLUMN {column} {column_type}")
+        # Distinct-hash counts were stored once but never used in scoring
+        if "unique_hashes" in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+            cursor.execute("ALTER TABLE songs DROP COLUMN unique_hashes")
+        
+        cursor.execute("SELECT COUNT(*) FROM songs WHERE fingerprint_count IS NULL")
+        if cursor.fetchone()[0] == 0:
+            return
+        
+        # One-off scan for songs added before the statistics existed
+        logger.info("🔄 Backfilling per-song fingerprint statistics...")
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_hash_token ON fingerprints(hash_token)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_song_id ON fingerprints(song_id)
+            UPDATE songs SET
+                fingerprint_count = (SELECT COUNT(*) FROM fingerprints f WHERE f.song_id = songs.id),
+                duration = (SELECT COALESCE(MAX(absolute_time) - MIN(absolute_time), 0)
+                            FROM fingerprints f WHERE f.song_id = songs.id)
+            WHERE fingerprint_count IS NULL
         """)
+    
+    @staticmethod
+    def _migrate_content_hash(cursor):
+        """Add the content hash column (SHA-256 of the source file) and its index"""
+        cursor.execute("PRAGMA table_info(songs)")
+        if "content_hash" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE songs ADD COLUMN content_hash TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_songs_content_hash ON songs(content_hash)")
+    
+    def _migrate_catalog_stats(self, cursor):
+        """Seed the catalog counters with a one-off count on databases that lack them"""
+        cursor.execute("SELECT key FROM catalog_stats")
+        existing = {row[0] for row in cursor.fetchall()}
+        for key, count_sql in CATALOG_COUNTERS.items():
+            if key not in existing:
+                logger.info(f"🔄 Counting {key} for the catalog stats table...")
+                cursor.execute(count_sql)
+                cursor.execute("INSERT INTO catalog_stats (key, value) VALUES (?, ?)",
+                               (key, cursor.fetchone()[0]))
+        if CATALOG_GENERATION not in existing:
+            cursor.execute("INSERT INTO catalog_stats (key, value) VALUES (?, 0)", (CATALOG_GENERATION,))
+    
+    def _load_stats(self):
+        """Load the catalog counters into the in-process cache"""
+        conn = self._read_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT key, value FROM catalog_stats")
+        self._stats = {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def _bump_stats(self, cursor, songs: int = 0, fingerprints: int = 0,
+                    removed: bool = False) -> Dict[str, int]:
+        """
+        Adjust the catalog counters inside the caller's transaction
         
-        conn.commit()
-        logger.info("✅ Database schema initialized")
+        Args:
+            removed: Songs were deleted (moves the catalog generation on)
+        
+        Returns:
+            The new counter values; the caller publishes them to the cache
+            after committing
+        """
+        deltas = {"song_count": songs, "fingerprint_count": fingerprints, CATALOG_GENERATION: int(removed)}
+        for key, delta in deltas.items():
+            if delta:
+                cursor.execute("UPDATE catalog_stats SET value = value + ? WHERE key = ?", (delta, key))
+        return {key: self._stats.get(key, 0) + delta for key, delta in deltas.items()}
+    
+    def _load_song_meta(self):
+        """Load per-song statistics into the in-memory cache"""
+        conn = self._read_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, duration, fingerprint_count FROM songs")
+        self._song_meta = {
+            row[0]: {
+                "name": row[1],
+                "duration": row[2] or 0.0,
+                "fingerprint_count": row[3] or 0,
+            }
+            for row in cursor.fetchall()
+        }
+    
+    @staticmethod
+    def _fingerprint_stats(times: List[float]) -> Tuple[float, int]:
+        """
+        Compute (duration, fingerprint_count) for a song
+        
+        duration is the span between the first and last anchor, measured the
+        same way as the span of a query sample
+        """
+        if not times:
+            return 0.0, 0
+        return float(max(times) - min(times)), len(times)
+    
+    # Hooks for index layers kept alongside the SQLite store (posting cache,
+    # in-memory index). They run under the write lock right after each commit.
+    
+    def _on_songs_added(self, songs: List[Tuple[int, List[Tuple]]], replaced_ids: Iterable[int] = ()):
+        """Songs were committed: (song_id, fingerprints) pairs; replaced_ids lost their old fingerprints"""
+        if self.posting_cache is not None:
+            replaced_ids = list(replaced_ids)
+            if replaced_ids:
+                self.posting_cache.invalidate_songs(replaced_ids)
+            self.posting_cache.invalidate_keys({self._hash_to_string(hash_token)
+                                                for _, fingerprints in songs
+                                                for hash_token, _ in fingerprints})
+        if self.bloom is not None:
+            self.bloom.add(pack_hashes([hash_token for _, fingerprints in songs
+                                        for hash_token, _ in fingerprints]))
+            self._bloom_unsaved_songs += len(songs)
+            if self.bloom.count > self.bloom.capacity:
+                self.rebuild_bloom()
+            elif self._bloom_unsaved_songs >= BLOOM_SAVE_EVERY_SONGS:
+                self._save_bloom()
+    
+    def _on_songs_removed(self, song_ids: List[int]):
+        """Songs and their fingerprints were deleted"""
+        if self.posting_cache is not None and song_ids:
+            self.posting_cache.invalidate_songs(song_ids)
+        # The filter still covers every remaining hash; save it at the new generation
+        if self.bloom is not None and song_ids:
+            self._save_bloom()
+    
+    def _on_cleared(self):
+        """All songs and fingerprints were deleted"""
+        if self.posting_cache is not None:
+            self.posting_cache.clear()
+        if self.bloom is not None:
+            self.bloom = BloomFilter(MIN_CAPACITY, self.bloom_fp_rate)
+            self._save_bloom()
     
     def _hash_to_string(self, hash_token: Tuple) -> str:
         """Convert hash tuple to string for storage"""
@@ -69,32 +619,47 @@ class PersistentDB:
         parts = hash_str.split("|")
         return (int(parts[0]), int(parts[1]), int(parts[2]))
     
-    def add_song(self, song_name: str, fingerprints: List[Tuple]) -> int:
+    @_serialized_write
+    def add_song(self, song_name: str, fingerprints: List[Tuple],
+                 mode: str = INGEST_REPLACE, stats: Optional[dict] = None) -> int:
         """
         Add a song and its fingerprints to the database
         
         Args:
             song_name: Name/ID of the song
             fingerprints: List of ((hash_token), absolute_time) tuples
+            mode: What to do if the song already exists:
+                  'reject' raises SongExistsError, 'replace' swaps its
+                  fingerprints for the new ones, 'append' adds to them
+            stats: Optional dict filled with song_id, created and replaced_fingerprints
             
         Returns:
             Number of fingerprints added
         """
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode '{mode}', expected one of {', '.join(INGEST_MODES)}")
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
         try:
-            # Insert or get song
-            cursor.execute("""
-                INSERT OR IGNORE INTO songs (name) VALUES (?)
-            """, (song_name,))
-            
-            # Get song_id
             cursor.execute("SELECT id FROM songs WHERE name = ?", (song_name,))
             song_row = cursor.fetchone()
-            if song_row is None:
-                raise ValueError(f"Failed to get song_id for {song_name}")
-            song_id = song_row[0]
+            created = song_row is None
+            if created:
+                cursor.execute("INSERT INTO songs (name) VALUES (?)", (song_name,))
+                song_id = cursor.lastrowid
+            elif mode == INGEST_REJECT:
+                raise SongExistsError(f"Song '{song_name}' already exists")
+            else:
+                song_id = song_row[0]
+            
+            # Replace drops the old fingerprints in the same transaction, so
+            # readers see either the old or the new version, never both
+            replaced = 0
+            if not created and mode == INGEST_REPLACE:
+                cursor.execute("DELETE FROM fingerprints WHERE song_id = ?", (song_id,))
+                replaced = cursor.rowcount
             
             # Insert fingerprints
             count = 0
@@ -110,8 +675,39 @@ class PersistentDB:
                 VALUES (?, ?, ?)
             """, fingerprint_data)
             
+            # Song statistics cover all of its fingerprints, including appended-to ones
+            if created or mode == INGEST_REPLACE:
+                rows = fingerprint_data
+            else:
+                cursor.execute("SELECT hash_token, song_id, absolute_time FROM fingerprints WHERE song_id = ?",
+                               (song_id,))
+                rows = cursor.fetchall()
+            duration, fingerprint_count = self._fingerprint_stats([row[2] for row in rows])
+            # The song no longer matches the file a directory ingest hashed, if any
+            cursor.execute("""
+                UPDATE songs SET duration = ?, fingerprint_count = ?, content_hash = NULL
+                WHERE id = ?
+            """, (duration, fingerprint_count, song_id))
+            
+            new_stats = self._bump_stats(cursor, songs=1 if created else 0, fingerprints=count - replaced)
+            
             conn.commit()
-            logger.info(f"✅ Added song '{song_name}' with {count} fingerprints")
+            self._stats.update(new_stats)
+            self._song_meta[song_id] = {
+                "name": song_name,
+                "duration": duration,
+                "fingerprint_count": fingerprint_count,
+            }
+            self._on_songs_added([(song_id, fingerprints)],
+                                 replaced_ids=[song_id] if not created and mode == INGEST_REPLACE else ())
+            if stats is not None:
+                stats.update({"song_id": song_id, "created": created, "replaced_fingerprints": replaced})
+            if created:
+                logger.info(f"✅ Added song '{song_name}' with {count} fingerprints")
+            elif mode == INGEST_REPLACE:
+                logger.info(f"✅ Replaced song '{song_name}': {replaced} -> {count} fingerprints")
+            else:
+                logger.info(f"✅ Appended {count} fingerprints to song '{song_name}'")
             return count
             
         except sqlite3.Error as e:
@@ -119,93 +715,298 @@ class PersistentDB:
             logger.error(f"❌ Database error while adding song: {e}")
             raise
     
-    def query(self, query_fingerprints: List[Tuple], 
-              min_matches: int = 5) -> Optional[Tuple[str, int, float]]:
+    def _query_keys(self, query_fingerprints: List[Tuple]) -> np.ndarray:
         """
-        Query the database with sample fingerprints
+        Index keys of the query fingerprints, in the form _posting_lengths and
+        _lookup_postings expect (hash strings here; index backends override all three)
+        """
+        return np.array([self._hash_to_string(hash_token) for hash_token, _ in query_fingerprints])
+    
+    def _lookup_postings(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fetch the posting rows for an array of unique hash keys
+        
+        Hot hashes are served from the posting cache when it is enabled; the
+        rest are read from SQLite and added to the cache.
         
         Args:
-            query_fingerprints: List of ((hash_token), sample_time) tuples
-            min_matches: Minimum number of matches required
-            
+            keys: Unique hash keys to look up (see _query_keys)
+        
         Returns:
-            Tuple of (song_name, match_count, confidence) or None if no match
-            confidence is the ratio of matches to total query fingerprints
+            Tuple of (key_idx, song_ids, absolute_times) arrays, where key_idx
+            is the position of the row's hash in keys
         """
-        conn = self._get_connection()
+        hash_strs = keys.tolist()
+        cache = self.posting_cache
+        if cache is None:
+            return self._select_postings(hash_strs)
+        
+        # Read the generation first: a write committed during the SELECT invalidates the result
+        generation = cache.generation
+        cached = cache.get_many(hash_strs)
+        missing = [hash_str for hash_str in hash_strs if hash_str not in cached]
+        key_idx, song_ids, times = self._select_postings(missing)
+        
+        # Split the fetched rows per hash (absent hashes get empty lists) and cache them
+        order = np.argsort(key_idx, kind="stable")
+        bounds = np.cumsum(np.bincount(key_idx, minlength=len(missing)))[:-1]
+        cache.put_many(dict(zip(missing, zip(np.split(song_ids[order], bounds),
+                                             np.split(times[order], bounds)))), generation)
+        
+        position = {hash_str: i for i, hash_str in enumerate(hash_strs)}
+        missing_pos = np.array([position[hash_str] for hash_str in missing], dtype=np.int64)
+        key_parts = [missing_pos[key_idx]]
+        song_parts = [song_ids]
+        time_parts = [times]
+        for hash_str, (cached_songs, cached_times) in cached.items():
+            key_parts.append(np.full(len(cached_songs), position[hash_str], dtype=np.int64))
+            song_parts.append(cached_songs.astype(np.int64))
+            time_parts.append(cached_times.astype(np.float64))
+        return np.concatenate(key_parts), np.concatenate(song_parts), np.concatenate(time_parts)
+    
+    def _select_postings(self, hash_strs: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Read the posting rows of hash strings from SQLite (see _lookup_postings)"""
+        conn = self._read_connection()
         cursor = conn.cursor()
+        key_index = {hash_str: i for i, hash_str in enumerate(hash_strs)}
         
-        # Dictionary to store matches: {song_name: [offsets]}
-        matches_by_song: dict = defaultdict(list)
+        key_idx = []
+        song_ids = []
+        times = []
+        for start in range(0, len(hash_strs), SQLITE_MAX_VARIABLES):
+            chunk = hash_strs[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                SELECT hash_token, song_id, absolute_time
+                FROM fingerprints
+                WHERE hash_token IN ({placeholders})
+            """, chunk)
+            for row in cursor.fetchall():
+                key_idx.append(key_index[row[0]])
+                song_ids.append(row[1])
+                times.append(row[2])
         
-        # For each query fingerprint
-        for hash_token, sample_time in query_fingerprints:
-            hash_str = self._hash_to_string(hash_token)
-            
-            # Look up in database
-            cursor.execute("""
-                SELECT s.name, f.absolute_time
-                FROM fingerprints f
-                JOIN songs s ON f.song_id = s.id
-                WHERE f.hash_token = ?
-            """, (hash_str,))
-            
-            # Get all matches for this hash
+        return (np.array(key_idx, dtype=np.int64),
+                np.array(song_ids, dtype=np.int64),
+                np.array(times, dtype=np.float64))
+    
+    def _posting_lengths(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Count the posting rows of each hash key (index-only scan, no row fetches)
+        
+        Every key costs one descent of idx_hash_token plus a walk over at most
+        POSTING_COUNT_CAP entries; keys rejected by the Bloom filter or whose
+        list is cached cost nothing.
+        
+        Args:
+            keys: Unique hash keys to probe (see _query_keys)
+        
+        Returns:
+            Array with the posting-list length of each hash (0 if absent),
+            capped at POSTING_COUNT_CAP
+        """
+        hash_strs = keys.tolist()
+        conn = self._read_connection()
+        cursor = conn.cursor()
+        key_index = {hash_str: i for i, hash_str in enumerate(hash_strs)}
+        lengths = np.zeros(len(hash_strs), dtype=np.int64)
+        
+        bloom = self.bloom
+        passed = None
+        if bloom is not None and hash_strs:
+            passed = bloom.contains(pack_hash_strings(hash_strs))
+            hash_strs = [hash_str for hash_str, maybe in zip(hash_strs, passed) if maybe]
+            key_index = {hash_str: key_index[hash_str] for hash_str in hash_strs}
+        
+        if self.posting_cache is not None:
+            for hash_str, length in self.posting_cache.peek_lengths(hash_strs).items():
+                lengths[key_index[hash_str]] = length
+                key_index.pop(hash_str)
+            hash_strs = list(key_index)
+        
+        for start in range(0, len(hash_strs), SQLITE_MAX_VARIABLES):
+            chunk = hash_strs[start:start + SQLITE_MAX_VARIABLES]
+            values = ",".join(["(?)"] * len(chunk))
+            # A COUNT over "hash_token IN (...)" would walk every matching entry
+            cursor.execute(f"""
+                WITH probe(hash_token) AS (VALUES {values})
+                SELECT probe.hash_token,
+                       (SELECT COUNT(*) FROM (SELECT 1 FROM fingerprints f
+                                              WHERE f.hash_token = probe.hash_token LIMIT ?))
+                FROM probe
+            """, chunk + [POSTING_COUNT_CAP])
             for row in cursor.fetchall():
-                song_name = row[0]
-                db_time = row[1]
-                # Calculate offset
-                offset = db_time - sample_time
-                matches_by_song[song_name].append(offset)
+                lengths[key_index[row[0]]] = row[1]
         
-        if not matches_by_song:
-            return None
+        if passed is not None:
+            bloom.record(checks=len(passed), rejections=int((~passed).sum()),
+                         false_positives=int((lengths[passed] == 0).sum()))
+        return lengths
+    
+    def bulk_load(self, songs_per_transaction: int = BULK_SONGS_PER_TRANSACTION,
+                  defer_indexes: bool = True,
+                  progress: Optional[Callable[[dict], None]] = None) -> "BulkLoader":
+        """
+        Open a bulk load for an initial catalog load
         
-        # Find the best match using histogram analysis
-        best_song = None
-        best_score = 0
-        best_confidence = 0.0
+        Usage:
+            with db.bulk_load(progress=print) as loader:
+                for name, fingerprints in songs:
+                    loader.add(name, fingerprints)
         
-        for song_name, offsets in matches_by_song.items():
-            # Count occurrences of each offset
-            offset_counter = Counter(offsets)
-            
-            # Find the most frequent offset (time coherency)
-            if offset_counter:
-                most_common_offset, count = offset_counter.most_common(1)[0]
-                
-                # Score is the count of matches with the same offset
-                if count >= min_matches and count > best_score:
-                    best_song = song_name
-                    best_score = count
-                    best_confidence = count / len(query_fingerprints) if query_fingerprints else 0
+        See BulkLoader for the details.
+        """
+        return BulkLoader(self, songs_per_transaction=songs_per_transaction,
+                          defer_indexes=defer_indexes, progress=progress)
+    
+    def add_songs_bulk(self, songs: Iterable[Tuple[str, List[Tuple]]],
+                       songs_per_transaction: int = BULK_SONGS_PER_TRANSACTION,
+                       defer_indexes: bool = True,
+                       progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Add many songs at once with the bulk load path
         
-        if best_song is None:
-            return None
+        Args:
+            songs: Iterable of (song_name, fingerprints) pairs
+            songs_per_transaction: Number of songs written per transaction
+            defer_indexes: Drop the secondary indexes during the load and
+                           rebuild them once at the end
+            progress: Optional callback receiving the progress dict after
+                      every committed transaction
         
-        return (best_song, best_score, best_confidence)
+        Returns:
+            Progress dict: songs_added, songs_skipped, fingerprints_added, transactions
+        """
+        with self.bulk_load(songs_per_transaction=songs_per_transaction,
+                            defer_indexes=defer_indexes, progress=progress) as loader:
+            for song_name, fingerprints in songs:
+                loader.add(song_name, fingerprints)
+        return loader.progress
+    
+    def existing_song_names(self, names: List[str]) -> set:
+        """The names of the list that are already taken"""
+        return BulkLoader._existing_names(self._read_connection().cursor(), list(names))
+    
+    def existing_content_hashes(self, content_hashes: List[str]) -> set:
+        """The content hashes of the list that some song was loaded from (see BulkLoader.add)"""
+        content_hashes = list(content_hashes)
+        cursor = self._read_connection().cursor()
+        existing = set()
+        for start in range(0, len(content_hashes), SQLITE_MAX_VARIABLES):
+            chunk = content_hashes[start:start + SQLITE_MAX_VARIABLES]
+            cursor.execute(f"SELECT content_hash FROM songs WHERE content_hash IN ({','.join('?' * len(chunk))})",
+                           chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
+    def get_song_stats(self, song_name: str) -> Optional[dict]:
+        """
+        Get the statistics stored for a song at ingest
+        
+        Returns:
+            Dict with name, duration, fingerprint_count and
+            fingerprints_per_second, or None if the song does not exist
+        """
+        for meta in list(self._song_meta.values()):
+            if meta["name"] == song_name:
+                duration = meta["duration"]
+                return {
+                    **meta,
+                    "fingerprints_per_second": meta["fingerprint_count"] / duration if duration > 0 else 0.0,
+                }
+        return None
     
     def get_song_count(self) -> int:
-        """Get the number of songs in the database"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM songs")
-        return cursor.fetchone()[0]
+        """Get the number of songs in the database (maintained counter, O(1))"""
+        return self._stats.get("song_count", 0)
     
     def get_fingerprint_count(self) -> int:
-        """Get the total number of fingerprints in the database"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM fingerprints")
-        return cursor.fetchone()[0]
+        """Get the total number of fingerprints in the database (maintained counter, O(1))"""
+        return self._stats.get("fingerprint_count", 0)
+    
+    def refresh_stats(self):
+        """Reload the catalog counters, e.g. after another process changed the database"""
+        self._load_stats()
     
     def list_songs(self) -> List[str]:
         """Get list of all song names in the database"""
-        conn = self._get_connection()
+        conn = self._read_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM songs ORDER BY name")
         return [row[0] for row in cursor.fetchall()]
     
+    @staticmethod
+    def _prefix_upper_bound(prefix: str) -> Optional[str]:
+        """Smallest string greater than every string starting with prefix (None if there is none)"""
+        # Trailing characters at U+10FFFF cannot be incremented: drop them and increment the one before
+        for end in range(len(prefix) - 1, -1, -1):
+            code = ord(prefix[end]) + 1
+            if code == 0xD800:
+                code = 0xE000  # surrogates cannot be encoded as UTF-8
+            if code <= 0x10FFFF:
+                return prefix[:end] + chr(code)
+        return None
+    
+    def list_songs_page(self, limit: int = 100,
+                        after: Optional[str] = None,
+                        prefix: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get one page of songs ordered by name
+        
+        Both the cursor and the prefix are range conditions on songs.name, so
+        each page is a short scan of the UNIQUE index on name, whatever the
+        size of the catalog.
+        
+        Args:
+            limit: Maximum number of songs on the page
+            after: Name of the last song of the previous page (None for the first page)
+            prefix: Only return songs whose name starts with this prefix
+            fields: Columns to return (see SONG_FIELDS), defaults to ["name"]
+        
+        Returns:
+            Tuple of (songs, last_name) where songs is a list of dicts and
+            last_name is the name to pass as `after` for the next page
+            (None when this is the last page)
+        """
+        fields = list(fields) if fields else ["name"]
+        unknown = [field for field in fields if field not in SONG_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown song fields: {', '.join(unknown)}")
+        columns = fields if "name" in fields else fields + ["name"]
+        
+        conditions = []
+        params: list = []
+        if after is not None:
+            conditions.append("name > ?")
+            params.append(after)
+        if prefix:
+            conditions.append("name >= ?")
+            params.append(prefix)
+            upper = self._prefix_upper_bound(prefix)
+            if upper is not None:
+                conditions.append("name < ?")
+                params.append(upper)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        conn = self._read_connection()
+        cursor = conn.cursor()
+        # Fetch one extra row to know whether another page follows
+        cursor.execute(f"""
+            SELECT {", ".join(columns)} FROM songs
+            {where}
+            ORDER BY name
+            LIMIT ?
+        """, params + [limit + 1])
+        rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        songs = [{field: row[field] for field in fields} for row in rows]
+        last_name = rows[-1]["name"] if has_more else None
+        return songs, last_name
+    
+    @_serialized_write
     def delete_song(self, song_name: str) -> Tuple[bool, int]:
         """
         Delete a specific song from the database
@@ -229,14 +1030,18 @@ class PersistentDB:
             
             song_id = song_row[0]
             
-            # Count fingerprints to be deleted
-            cursor.execute("SELECT COUNT(*) FROM fingerprints WHERE song_id = ?", (song_id,))
-            deleted_count = cursor.fetchone()[0]
+            # Delete the fingerprints explicitly (through idx_song_id) rather
+            # than relying on the CASCADE, which older connections never enforced
+            cursor.execute("DELETE FROM fingerprints WHERE song_id = ?", (song_id,))
+            deleted_count = cursor.rowcount
             
-            # Delete song (fingerprints will be deleted by CASCADE)
             cursor.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+            new_stats = self._bump_stats(cursor, songs=-1, fingerprints=-deleted_count, removed=True)
             
             conn.commit()
+            self._stats.update(new_stats)
+            self._song_meta.pop(song_id, None)
+            self._on_songs_removed([song_id])
             logger.info(f"✅ Deleted song '{song_name}' with {deleted_count} fingerprints")
             return (True, deleted_count)
             
@@ -245,31 +1050,547 @@ class PersistentDB:
             logger.error(f"❌ Database error while deleting song: {e}")
             raise
     
-    def clear(self):
-        """Clear all data from the database"""
+    @staticmethod
+    def _match_song_ids(cursor, names: Optional[List[str]], pattern: Optional[str]) -> Dict[int, str]:
+        """Map song id -> name for songs listed in `names` or matching the GLOB `pattern`"""
+        matches = {}
+        if names:
+            for start in range(0, len(names), SQLITE_MAX_VARIABLES):
+                batch = names[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(f"SELECT id, name FROM songs WHERE name IN ({placeholders})", batch)
+                matches.update((row[0], row[1]) for row in cursor.fetchall())
+        if pattern is not None:
+            cursor.execute("SELECT id, name FROM songs WHERE name GLOB ?", (pattern,))
+            matches.update((row[0], row[1]) for row in cursor.fetchall())
+        return matches
+    
+    def match_songs(self, names: Optional[Iterable[str]] = None,
+                    pattern: Optional[str] = None) -> List[str]:
+        """
+        List the songs that delete_songs() would delete, without deleting them
+        
+        Args:
+            names: Exact song names
+            pattern: Shell-style GLOB pattern on the song name (case-sensitive, e.g. 'Demo_*')
+            
+        Returns:
+            Matching song names, sorted
+        """
+        names = list(dict.fromkeys(names)) if names is not None else None
+        cursor = self._read_connection().cursor()
+        return sorted(self._match_song_ids(cursor, names, pattern).values())
+    
+    @_serialized_write
+    def delete_songs(self, names: Optional[Iterable[str]] = None,
+                     pattern: Optional[str] = None,
+                     vacuum: bool = False) -> dict:
+        """
+        Delete every song listed in `names` or matching `pattern` in one transaction,
+        then return the freed pages to the file system
+        
+        Args:
+            names: Exact song names
+            pattern: Shell-style GLOB pattern on the song name (case-sensitive, e.g. 'Demo_*')
+            vacuum: On databases without incremental vacuum, run a full VACUUM
+                    to shrink the file (otherwise the free pages are only reused)
+            
+        Returns:
+            Dict with songs_deleted, fingerprints_deleted, not_found (listed
+            names that do not exist) and bytes_freed
+        """
+        if names is None and pattern is None:
+            raise ValueError("Give song names, a pattern or both")
+        names = list(dict.fromkeys(names)) if names is not None else None
+        
         conn = self._get_connection()
         cursor = conn.cursor()
+        size_before = self.disk_usage()
         
         try:
-            cursor.execute("DELETE FROM fingerprints")
-            cursor.execute("DELETE FROM songs")
+            matches = self._match_song_ids(cursor, names, pattern)
+            song_ids = list(matches)
+            
+            fingerprints_deleted = 0
+            for start in range(0, len(song_ids), SQLITE_MAX_VARIABLES):
+                batch = song_ids[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(f"DELETE FROM fingerprints WHERE song_id IN ({placeholders})", batch)
+                fingerprints_deleted += cursor.rowcount
+                cursor.execute(f"DELETE FROM songs WHERE id IN ({placeholders})", batch)
+            
+            new_stats = self._bump_stats(cursor, songs=-len(song_ids), fingerprints=-fingerprints_deleted,
+                                         removed=bool(song_ids))
             conn.commit()
-            logger.info("✅ Database cleared")
+            self._stats.update(new_stats)
+            for song_id in song_ids:
+                self._song_meta.pop(song_id, None)
+            self._on_songs_removed(song_ids)
+            
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"❌ Database error while deleting songs: {e}")
+            raise
+        
+        found = set(matches.values())
+        bytes_freed = 0
+        if song_ids:
+            self._reclaim_space(full_vacuum=vacuum)
+            bytes_freed = max(size_before - self.disk_usage(), 0)
+        
+        logger.info(f"✅ Deleted {len(song_ids)} songs with {fingerprints_deleted} fingerprints, "
+                    f"{bytes_freed} bytes freed")
+        return {
+            "songs_deleted": len(song_ids),
+            "fingerprints_deleted": fingerprints_deleted,
+            "not_found": [name for name in names if name not in found] if names else [],
+            "bytes_freed": bytes_freed,
+        }
+    
+    def find_orphan_song_ids(self) -> List[int]:
+        """
+        Find song ids that still own fingerprints but have no song row
+        
+        Walks the distinct song_ids of idx_song_id with one index seek per
+        song, so the cost grows with the number of songs, not fingerprints.
+        """
+        conn = self._read_connection()
+        cursor = conn.cursor()
+        orphan_ids = []
+        song_id = -1
+        while True:
+            cursor.execute("SELECT MIN(song_id) FROM fingerprints WHERE song_id > ?", (song_id,))
+            song_id = cursor.fetchone()[0]
+            if song_id is None:
+                return orphan_ids
+            if song_id not in self._song_meta:
+                cursor.execute("SELECT 1 FROM songs WHERE id = ?", (song_id,))
+                if cursor.fetchone() is None:
+                    orphan_ids.append(song_id)
+    
+    @_serialized_write
+    def purge_orphan_fingerprints(self, song_id: int, limit: int) -> int:
+        """
+        Delete up to `limit` fingerprints of a song id that has no song row
+        
+        Returns:
+            Number of fingerprints deleted (0 once the song id is clean)
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM songs WHERE id = ?", (song_id,))
+            if cursor.fetchone() is not None:
+                return 0
+            cursor.execute("""
+                DELETE FROM fingerprints WHERE id IN (
+                    SELECT id FROM fingerprints WHERE song_id = ? LIMIT ?
+                )
+            """, (song_id, limit))
+            deleted = cursor.rowcount
+            conn.commit()
+            return deleted
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"❌ Database error while purging orphaned fingerprints: {e}")
+            raise
+    
+    @_serialized_write
+    def reconcile_fingerprint_count(self) -> int:
+        """
+        Reset the fingerprint counter to the sum of the per-song counts
+        
+        The counter may include orphaned fingerprints from before deletes were
+        reliable; once they are purged, the songs table is the ground truth.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(SUM(fingerprint_count), 0) FROM songs")
+        total = cursor.fetchone()[0]
+        cursor.execute("UPDATE catalog_stats SET value = ? WHERE key = 'fingerprint_count'", (total,))
+        conn.commit()
+        self._stats["fingerprint_count"] = total
+        return total
+    
+    def auto_vacuum_mode(self) -> int:
+        """Get PRAGMA auto_vacuum (0 = none, 1 = full, 2 = incremental)"""
+        return self._read_connection().execute("PRAGMA auto_vacuum").fetchone()[0]
+    
+    def free_pages(self) -> Tuple[int, int]:
+        """Get (freelist_count, page_size) of the database file"""
+        conn = self._read_connection()
+        return (conn.execute("PRAGMA freelist_count").fetchone()[0],
+                conn.execute("PRAGMA page_size").fetchone()[0])
+    
+    @_serialized_write
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Return up to `pages` free pages to the file system (needs auto_vacuum = INCREMENTAL)
+        
+        Returns:
+            Number of pages released
+        """
+        conn = self._get_connection()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript steps the pragma to completion; execute() frees a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+    
+    @_serialized_write
+    def enable_incremental_vacuum(self):
+        """
+        Switch an existing database to auto_vacuum = INCREMENTAL
+        
+        This needs one full VACUUM, which rewrites the whole file and blocks
+        writers while it runs; new databases are created incremental already.
+        Leaving WAL mode for the VACUUM needs exclusive access, so the read
+        connections are closed first: run it when traffic is low.
+        """
+        conn = self._get_connection()
+        logger.info("🔄 Converting database to incremental auto-vacuum (full VACUUM)...")
+        # auto_vacuum cannot be changed by a VACUUM in WAL mode
+        self._close_readers()
+        conn.execute("PRAGMA journal_mode = DELETE")
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.execute("PRAGMA journal_mode = WAL")
+        logger.info("✅ Database converted to incremental auto-vacuum")
+    
+    @property
+    def bloom_path(self) -> str:
+        """The Bloom filter is persisted next to the database file"""
+        return f"{self.db_path}.bloom"
+    
+    def _max_fingerprint_id(self) -> int:
+        row = self._get_connection().execute("SELECT MAX(id) FROM fingerprints").fetchone()
+        return row[0] or 0
+    
+    @_serialized_write
+    def _init_bloom(self):
+        """Load the persisted Bloom filter and replay rows added since it was saved"""
+        loaded = None
+        generation = self._stats.get(CATALOG_GENERATION, 0)
+        if self.db_path != ":memory:":
+            # The inode identifies this database file: a file restored or swapped in
+            # under the same name must not reuse the filter of the previous one
+            self._bloom_source_id = os.stat(self.db_path).st_ino
+            loaded = BloomFilter.load(self.bloom_path)
+        max_id = self._max_fingerprint_id()
+        # Another generation means songs were deleted or the catalog cleared since the
+        # save (clear restarts the row ids, so the watermark alone cannot tell)
+        if (loaded is None or loaded[2] != self._bloom_source_id or loaded[3] != generation
+                or loaded[1] > max_id):
+            self.rebuild_bloom()
+            return
+        
+        bloom, watermark, _, _ = loaded
+        if watermark < max_id:
+            cursor = self._get_connection().cursor()
+            cursor.row_factory = None
+            cursor.execute("SELECT hash_token FROM fingerprints WHERE id > ?", (watermark,))
+            added = bloom.add(pack_hash_strings([row[0] for row in cursor.fetchall()]))
+            logger.info(f"🌸 Bloom filter caught up with {max_id - watermark} new rows ({added} new hashes)")
+        self.bloom = bloom
+        if bloom.count > bloom.capacity:
+            self.rebuild_bloom()
+        elif watermark < max_id:
+            self._save_bloom()
+    
+    @_serialized_write
+    def rebuild_bloom(self):
+        """Build the Bloom filter from scratch, sized for twice the current distinct hashes"""
+        cursor = self._get_connection().cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT DISTINCT hash_token FROM fingerprints")
+        keys = pack_hash_strings([row[0] for row in cursor.fetchall()])
+        bloom = BloomFilter(max(2 * len(keys), MIN_CAPACITY), self.bloom_fp_rate)
+        bloom.add(keys)
+        self.bloom = bloom
+        self._save_bloom()
+        logger.info(f"🌸 Bloom filter built: {bloom.count} hashes, {bloom.nbytes / (1024 * 1024):.1f} MB, "
+                    f"expected false-positive rate {bloom.expected_fp_rate():.4f}")
+    
+    @_serialized_write
+    def _save_bloom(self):
+        self._bloom_unsaved_songs = 0
+        if self.db_path != ":memory:":
+            # The cached generation, not the database's: if another process deleted
+            # songs meanwhile, the next open must rebuild rather than trust this filter
+            self.bloom.save(self.bloom_path, self._max_fingerprint_id(), self._bloom_source_id,
+                            self._stats.get(CATALOG_GENERATION, 0))
+    
+    @_serialized_write
+    def checkpoint(self):
+        """Checkpoint the WAL into the database file and truncate it"""
+        self._get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    
+    def disk_usage(self) -> int:
+        """Size of the database file plus its WAL, in bytes"""
+        return sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+                   if os.path.exists(path))
+    
+    @_serialized_write
+    def _reclaim_space(self, full_vacuum: bool = False):
+        """
+        Return free pages to the file system and truncate the WAL
+        
+        Incremental vacuum is used when enabled; otherwise a full VACUUM runs
+        only if `full_vacuum` is set, since it rewrites the whole file
+        """
+        conn = self._get_connection()
+        if self.auto_vacuum_mode() == 2:
+            conn.executescript("PRAGMA incremental_vacuum;")
+        elif full_vacuum:
+            conn.execute("VACUUM")
+        self.checkpoint()
+    
+    @_serialized_write
+    def clear(self) -> int:
+        """
+        Clear all data from the database
+        
+        The songs and fingerprints tables are dropped and recreated rather than
+        emptied row by row, which keeps the WAL small, and the (now tiny) file
+        is vacuumed afterwards
+        
+        Returns:
+            Number of bytes freed on disk
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        size_before = self.disk_usage()
+        
+        try:
+            # DDL does not open a transaction implicitly; make the swap atomic
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DROP TABLE IF EXISTS fingerprints")
+            cursor.execute("DROP TABLE IF EXISTS songs")
+            self._create_catalog_tables(cursor)
+            self._migrate_content_hash(cursor)
+            cursor.execute("UPDATE catalog_stats SET value = CASE WHEN key = ? THEN value + 1 ELSE 0 END",
+                           (CATALOG_GENERATION,))
+            conn.commit()
+            self._song_meta = {}
+            self._stats = {key: value + 1 if key == CATALOG_GENERATION else 0
+                           for key, value in self._stats.items()}
+            self._on_cleared()
         except sqlite3.Error as e:
             conn.rollback()
             logger.error(f"❌ Database error while clearing: {e}")
             raise
+        
+        # Vacuuming an empty catalog is cheap, so always shrink the file
+        self._reclaim_space(full_vacuum=True)
+        bytes_freed = max(size_before - self.disk_usage(), 0)
+        logger.info(f"✅ Database cleared, {bytes_freed} bytes freed")
+        return bytes_freed
     
-    def clear_all(self):
+    def clear_all(self) -> int:
         """Alias for clear() - Clear all data from the database"""
-        self.clear()
+        return self.clear()
+    
+    def _close_readers(self):
+        """Close all read connections; each thread reopens its own on next use"""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+            self._pool_generation += 1
+        for reader in readers:
+            reader.close()
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            logger.info("✅ Database connection closed")
+        """Close the writer and all read connections"""
+        if self.bloom is not None and self._bloom_unsaved_songs:
+            self._save_bloom()
+        self._close_readers()
+        
+        with self._write_lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+                logger.info("✅ Database connection closed")
+
+
+class BulkLoader:
+    """
+    Bulk load of many songs into a PersistentDB (see PersistentDB.bulk_load)
+    
+    - The secondary indexes are dropped on entry and rebuilt once on exit,
+      instead of being rebalanced row by row
+    - Songs are buffered and written songs_per_transaction at a time, with the
+      fingerprints of each transaction inserted in hash order
+    - Every transaction is complete on its own (songs, fingerprints, counters),
+      so after a crash the committed songs are intact and the indexes are
+      rebuilt on the next open. Songs whose name already exists are skipped,
+      which makes running the same load again a resume.
+    
+    The load holds the writer for each transaction only, but lookups are slow
+    while the indexes are dropped: use it for initial or offline loads. With
+    defer_indexes=False it is safe on a live server, also next to other loads
+    and add_song calls (names are checked again inside each transaction).
+    """
+    
+    def __init__(self, db: PersistentDB,
+                 songs_per_transaction: int = BULK_SONGS_PER_TRANSACTION,
+                 defer_indexes: bool = True,
+                 progress: Optional[Callable[[dict], None]] = None):
+        self.db = db
+        self.songs_per_transaction = max(songs_per_transaction, 1)
+        self.defer_indexes = defer_indexes
+        self.progress_callback = progress
+        self.progress = {
+            "songs_added": 0,
+            "songs_skipped": 0,
+            "fingerprints_added": 0,
+            "transactions": 0,
+        }
+        self._pending: List[Tuple[str, List[Tuple], Optional[str]]] = []
+        self._pending_names = set()
+        self._known_names = set()
+    
+    def __enter__(self) -> "BulkLoader":
+        self._known_names = {meta["name"] for meta in list(self.db._song_meta.values())}
+        # The load state only matters for recovering dropped indexes after a crash
+        if self.defer_indexes:
+            with self.db._write_lock:
+                conn = self.db._get_connection()
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT OR REPLACE INTO bulk_load_state (id, status, songs_loaded, fingerprints_loaded)
+                    VALUES (1, 'running', 0, 0)
+                """)
+                for index_name in SECONDARY_INDEXES:
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+                conn.commit()
+        logger.info(f"📦 Bulk load started (indexes {'deferred' if self.defer_indexes else 'kept'})")
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        ok = exc_type is None
+        try:
+            if ok:
+                self.flush()
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            status = "done" if ok else "interrupted"
+            if self.defer_indexes:
+                with self.db._write_lock:
+                    conn = self.db._get_connection()
+                    cursor = conn.cursor()
+                    logger.info("🔄 Rebuilding fingerprint indexes...")
+                    for index_sql in SECONDARY_INDEXES.values():
+                        cursor.execute(index_sql)
+                    cursor.execute("UPDATE bulk_load_state SET status = ? WHERE id = 1", (status,))
+                    conn.commit()
+            logger.info(f"✅ Bulk load {status}: {self.progress['songs_added']} songs, "
+                        f"{self.progress['fingerprints_added']} fingerprints "
+                        f"({self.progress['songs_skipped']} skipped)")
+        return False
+    
+    def add(self, song_name: str, fingerprints: List[Tuple], content_hash: Optional[str] = None) -> bool:
+        """
+        Queue a song for the bulk load
+        
+        Args:
+            song_name: Name of the song
+            fingerprints: Its fingerprints
+            content_hash: SHA-256 (hex) of the file it was fingerprinted from,
+                          so later loads can skip that file without decoding it
+        
+        Returns:
+            False if a song with this name already exists (it is skipped)
+        """
+        if song_name in self._known_names or song_name in self._pending_names:
+            self.progress["songs_skipped"] += 1
+            return False
+        
+        self._pending.append((song_name, fingerprints, content_hash))
+        self._pending_names.add(song_name)
+        if len(self._pending) >= self.songs_per_transaction:
+            self.flush()
+        return True
+    
+    @staticmethod
+    def _existing_names(cursor, names: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(names), SQLITE_MAX_VARIABLES):
+            chunk = names[start:start + SQLITE_MAX_VARIABLES]
+            cursor.execute(f"SELECT name FROM songs WHERE name IN ({','.join('?' * len(chunk))})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
+    def flush(self):
+        """Write the queued songs in one transaction"""
+        if not self._pending:
+            return
+        
+        db = self.db
+        with db._write_lock:
+            conn = db._get_connection()
+            cursor = conn.cursor()
+            # Another writer may have added some of these names since they were queued
+            taken = self._existing_names(cursor, list(self._pending_names))
+            pending = [song for song in self._pending if song[0] not in taken]
+            try:
+                rows = []
+                metas = {}
+                added = []
+                for song_name, fingerprints, content_hash in pending:
+                    hash_strs = [db._hash_to_string(hash_token) for hash_token, _ in fingerprints]
+                    times = [absolute_time for _, absolute_time in fingerprints]
+                    duration, fingerprint_count = db._fingerprint_stats(times)
+                    cursor.execute("""
+                        INSERT INTO songs (name, duration, fingerprint_count, content_hash)
+                        VALUES (?, ?, ?, ?)
+                    """, (song_name, duration, fingerprint_count, content_hash))
+                    song_id = cursor.lastrowid
+                    added.append((song_id, fingerprints))
+                    rows.extend(zip(hash_strs, [song_id] * len(times), times))
+                    metas[song_id] = {
+                        "name": song_name,
+                        "duration": duration,
+                        "fingerprint_count": fingerprint_count,
+                    }
+                
+                # Hash order keeps index pages local if the indexes are kept
+                rows.sort(key=lambda row: row[0])
+                cursor.executemany("""
+                    INSERT INTO fingerprints (hash_token, song_id, absolute_time)
+                    VALUES (?, ?, ?)
+                """, rows)
+                
+                new_stats = db._bump_stats(cursor, songs=len(metas), fingerprints=len(rows))
+                if self.defer_indexes:
+                    cursor.execute("""
+                        UPDATE bulk_load_state
+                        SET songs_loaded = songs_loaded + ?, fingerprints_loaded = fingerprints_loaded + ?
+                        WHERE id = 1
+                    """, (len(metas), len(rows)))
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.error(f"❌ Database error during bulk load: {e}")
+                raise
+            
+            db._stats.update(new_stats)
+            db._song_meta.update(metas)
+            db._on_songs_added(added)
+        
+        self._known_names.update(self._pending_names)
+        self._pending = []
+        self._pending_names = set()
+        self.progress["songs_skipped"] += len(taken)
+        self.progress["songs_added"] += len(metas)
+        self.progress["fingerprints_added"] += len(rows)
+        self.progress["transactions"] += 1
+        logger.info(f"📦 Bulk load: {self.progress['songs_added']} songs, "
+                    f"{self.progress['fingerprints_added']} fingerprints committed")
+        if self.progress_callback is not None:
+            self.progress_callback(dict(self.progress))
 
 
 # Alias for backward compatibility
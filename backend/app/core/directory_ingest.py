@@ -0,0 +1,265 @@
+"""
+Server-Local Ingestion
+Loads audio files that already sit on the server (e.g. data/songs) straight
+into the index: no upload, no temp-file copies
+"""
+
+import hashlib
+import os
+import re
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from app.core.fingerprint_pool import FingerprintPool
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac")
+
+# Per-file errors kept in the progress (the count covers all of them)
+MAX_REPORTED_ERRORS = 100
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class IngestPathError(ValueError):
+    """Raised when a path is not inside an allowed ingestion root"""
+
+
+def resolve_ingest_path(path: str, roots: List[str]) -> str:
+    """
+    Resolve a path and check that it lies inside one of the allowed roots
+
+    Symlinks are resolved first, so a link cannot point out of a root.
+
+    Raises:
+        IngestPathError: No roots are configured, or the path is outside them
+        FileNotFoundError: The path does not exist
+    """
+    if not roots:
+        raise IngestPathError("Server-local ingestion is disabled (no INGEST_ROOTS configured)")
+    resolved = os.path.realpath(path)
+    if not any(_inside(resolved, root) for root in roots):
+        raise IngestPathError(f"'{path}' is not inside an allowed ingestion directory")
+    if not os.path.exists(resolved):
+        raise FileNotFoundError(f"'{path}' does not exist")
+    return resolved
+
+
+def _inside(path: str, root: str) -> bool:
+    root = os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def find_audio_files(path: str, recursive: bool = True) -> List[str]:
+    """Audio files of a directory (sorted), or the file itself"""
+    if os.path.isfile(path):
+        return [path]
+    if recursive:
+        candidates = [os.path.join(directory, name)
+                      for directory, _, names in os.walk(path) for name in names]
+    else:
+        candidates = [os.path.join(path, name) for name in os.listdir(path)]
+    return sorted(candidate for candidate in candidates
+                  if candidate.lower().endswith(AUDIO_EXTENSIONS)
+                  and not os.path.basename(candidate).startswith(".")
+                  and os.path.isfile(candidate)
+                  and _inside(os.path.realpath(candidate), path))
+
+
+def song_name_from_file(file_path: str) -> str:
+    """Song name for a file, the same as scripts/batch_upload_songs.py gives it"""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    name = re.sub(r'[^\w\s-]', '_', name)
+    name = re.sub(r'[\s_-]+', '_', name)
+    return name[:100].strip('_')
+
+
+def content_hash(file_path: str) -> str:
+    """SHA-256 (hex) of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DirectoryIngestJob:
+    """
+    Fingerprints the audio files of a server directory and bulk-loads them,
+    on a background thread
+
+    Every file is hashed first. Files whose content some song was already
+    loaded from, duplicates within the directory and files whose song name
+    is taken are skipped without being decoded. The rest are fingerprinted
+    by the FingerprintPool processes, one file per process at a time, and
+    written with the bulk path (indexes kept, so the server keeps answering).
+    The next batch is fingerprinted while the current one is written.
+
+    Progress is available at any time through `progress`:
+        status: idle | running | done | failed
+        phase: scan | fingerprint | None
+        path, files_found, files_skipped, files_done, songs_added, songs_skipped,
+        fingerprints_added, files_failed, errors (file, error), error,
+        started_at, finished_at
+    """
+
+    def __init__(self, fingerprint_pool: FingerprintPool,
+                 acquire_writer: Callable[[], AbstractContextManager],
+                 roots: Optional[List[str]] = None,
+                 batch_files: Optional[int] = None):
+        """
+        Args:
+            fingerprint_pool: Fingerprints the files
+            acquire_writer: Returns a context manager yielding the index to write to
+                            (IndexManager.acquire_writer on a server)
+            roots: Directories files may be ingested from
+            batch_files: Files fingerprinted and written together (default: one per worker)
+        """
+        self.fingerprint_pool = fingerprint_pool
+        self.acquire_writer = acquire_writer
+        self.roots = list(roots or [])
+        self.batch_files = batch_files or max(fingerprint_pool.workers, 2)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.progress = self._initial_progress(None)
+
+    @staticmethod
+    def _initial_progress(path: Optional[str]) -> dict:
+        return {
+            "status": "idle",
+            "phase": None,
+            "path": path,
+            "files_found": 0,
+            "files_skipped": 0,
+            "files_done": 0,
+            "songs_added": 0,
+            "songs_skipped": 0,
+            "fingerprints_added": 0,
+            "files_failed": 0,
+            "errors": [],
+            "error": None,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, path: str, recursive: bool = True) -> bool:
+        """
+        Start ingesting a directory (or a single file) on a background thread
+
+        Raises:
+            IngestPathError: The path is not inside an allowed root
+            FileNotFoundError: The path does not exist
+
+        Returns:
+            False if a job is already running
+        """
+        resolved = resolve_ingest_path(path, self.roots)
+        with self._lock:
+            if self.running:
+                return False
+            self._reset(resolved)
+            self._thread = threading.Thread(target=self._run, args=(resolved, recursive),
+                                            name="directory-ingest", daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self, path: str, recursive: bool = True) -> dict:
+        """Ingest on the calling thread and return the final progress"""
+        resolved = resolve_ingest_path(path, self.roots)
+        self._reset(resolved)
+        self._run(resolved, recursive)
+        return dict(self.progress)
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _reset(self, path: str):
+        self.progress = self._initial_progress(path)
+        self.progress.update({"status": "running", "phase": "scan",
+                              "started_at": datetime.now(timezone.utc).isoformat()})
+
+    def _record_error(self, file_path: str, error: str):
+        self.progress["files_failed"] += 1
+        if len(self.progress["errors"]) < MAX_REPORTED_ERRORS:
+            self.progress["errors"].append({"file": file_path, "error": error})
+
+    def _run(self, path: str, recursive: bool):
+        try:
+            logger.info(f"📂 Ingesting {path}")
+            files = self._new_files(find_audio_files(path, recursive))
+
+            self.progress["phase"] = "fingerprint"
+            batches = [files[start:start + self.batch_files] for start in range(0, len(files), self.batch_files)]
+            paths = [[file_path for file_path, _, _ in batch] for batch in batches]
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-prefetch") as prefetch:
+                upcoming = prefetch.submit(self.fingerprint_pool.fingerprint_files, paths[0]) if batches else None
+                for number, batch in enumerate(batches):
+                    results = upcoming.result()
+                    if number + 1 < len(batches):
+                        upcoming = prefetch.submit(self.fingerprint_pool.fingerprint_files, paths[number + 1])
+                    self._write(batch, results)
+
+            self.progress["status"] = "done"
+            logger.info(f"✅ Ingested {path}: {self.progress['songs_added']} songs, "
+                        f"{self.progress['fingerprints_added']} fingerprints "
+                        f"({self.progress['files_skipped']} files already indexed, "
+                        f"{self.progress['files_failed']} failed)")
+        except Exception as e:
+            self.progress["status"] = "failed"
+            self.progress["error"] = str(e)
+            logger.error(f"❌ Ingestion of {path} failed: {e}", exc_info=True)
+        finally:
+            self.progress["phase"] = None
+            self.progress["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    def _new_files(self, file_paths: List[str]) -> List[Tuple[str, str, str]]:
+        """(file, song name, content hash) of the files that are not indexed yet"""
+        self.progress["files_found"] = len(file_paths)
+        hashed = []
+        for file_path in file_paths:
+            try:
+                hashed.append((file_path, song_name_from_file(file_path), content_hash(file_path)))
+            except OSError as e:
+                self._record_error(file_path, str(e))
+
+        with self.acquire_writer() as db:
+            known_hashes = db.existing_content_hashes([digest for _, _, digest in hashed])
+            taken_names = db.existing_song_names([song_name for _, song_name, _ in hashed])
+
+        files, seen_hashes, seen_names = [], set(known_hashes), set(taken_names)
+        for file_path, song_name, digest in hashed:
+            if not song_name:
+                self._record_error(file_path, "No usable song name in the file name")
+                continue
+            if digest in seen_hashes or song_name in seen_names:
+                self.progress["files_skipped"] += 1
+                continue
+            seen_hashes.add(digest)
+            seen_names.add(song_name)
+            files.append((file_path, song_name, digest))
+        return files
+
+    def _write(self, batch: List[Tuple[str, str, str]], results: list):
+        with self.acquire_writer() as db:
+            with db.bulk_load(songs_per_transaction=len(batch), defer_indexes=False) as loader:
+                for (file_path, song_name, digest), fingerprints in zip(batch, results):
+                    if isinstance(fingerprints, Exception):
+                        self._record_error(file_path, str(fingerprints) or type(fingerprints).__name__)
+                    elif not fingerprints:
+                        self._record_error(file_path, "No fingerprints")
+                    else:
+                        loader.add(song_name, fingerprints, content_hash=digest)
+        self.progress["files_done"] += len(batch)
+        for key in ("songs_added", "songs_skipped", "fingerprints_added"):
+            self.progress[key] += loader.progress[key]
@@ -3,15 +3,42 @@ DSP Engine for Audio Fingerprinting
 Implements Avery Wang's Algorithm for Shazam-like music recognition
 """
 
+from typing import List, NamedTuple
+
 import numpy as np
 import soundfile as sf
 from scipy.ndimage import maximum_filter
-from scipy.signal import resample
+from scipy.signal import resample, stft
 import logging
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Bump when peak picking or hashing changes: fingerprints from another version do not match
+FINGERPRINT_ALGORITHM_VERSION = 1
+
+# generate_fingerprints_batch stacks clips into STFTs of at most this many
+# (padded) samples, ~6 s of audio: short clips share one STFT, while larger
+# stacks fall out of the CPU caches and get slower than one clip at a time
+BATCH_MAX_SAMPLES = 2 ** 17
+
+
+class FingerprintColumns(NamedTuple):
+    """
+    Fingerprints of one clip as parallel arrays
+
+    Row i is the fingerprint ((f1[i], f2[i], dt[i]), times[i]).
+    """
+    f1: np.ndarray
+    f2: np.ndarray
+    dt: np.ndarray
+    times: np.ndarray
+
+    def to_list(self) -> list:
+        """The fingerprints as ((f1, f2, dt), t_absolute) tuples, like generate_fingerprints"""
+        hash_tokens = zip(self.f1.tolist(), self.f2.tolist(), self.dt.tolist())
+        return list(zip(hash_tokens, self.times.tolist()))
+
 
 class AudioFingerprinter:
     """
@@ -47,6 +74,28 @@ class AudioFingerprinter:
         self.target_zone_bin_min = int(self.target_zone_t_min * self.sample_rate / self.hop_length)
         self.target_zone_bin_max = int(self.target_zone_t_max * self.sample_rate / self.hop_length)
     
+    def params(self) -> dict:
+        """Settings that determine the fingerprints (two fingerprinters match only if these are equal)"""
+        return {
+            "algorithm": FINGERPRINT_ALGORITHM_VERSION,
+            "sample_rate": self.sample_rate,
+            "n_fft": self.n_fft,
+            "hop_length": self.hop_length,
+            "peak_neighborhood_size": self.peak_neighborhood_size,
+            "target_zone_t_min": self.target_zone_t_min,
+            "target_zone_t_max": self.target_zone_t_max,
+        }
+    
+    def frame_times(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Times (seconds) of STFT frames, bit-identical to the anchor times of generate_fingerprints
+        
+        Mirrors scipy.signal.stft's time axis (segments centred on the zero-padded boundary)
+        """
+        half_window = self.n_fft // 2
+        return (half_window + np.asarray(frames, dtype=np.float64) * self.hop_length) / float(self.sample_rate) \
+            - half_window / float(self.sample_rate)
+    
     def load_audio(self, file_path: str) -> np.ndarray:
         """
         Load audio file and preprocess
@@ -139,18 +188,16 @@ class AudioFingerprinter:
         Compute Short-Time Fourier Transform (STFT) spectrogram
         
         Args:
-            audio: Mono audio signal
+            audio: Mono audio signal, or a 2D array of equal-length signals (one per row)
             
         Returns:
-            Tuple of (magnitude spectrogram, time bins, frequency bins)
+            Tuple of (magnitude spectrogram, time bins, frequency bins);
+            the spectrogram is (frequencies, times), or (signals, frequencies, times)
         """
-        # Compute STFT using scipy.signal.stft
-        from scipy.signal import stft
-        
         # Create Hanning window
         window = np.hanning(self.n_fft)
         
-        # Compute STFT
+        # Compute STFT (along the last axis, so a stack of signals is one call)
         frequencies, times, stft_result = stft(
             audio,
             fs=self.sample_rate,
@@ -175,23 +222,38 @@ class AudioFingerprinter:
         
         return magnitude, times, frequencies
     
-    def _find_peaks(self, spectrogram: np.ndarray, threshold: float = None) -> list:
+    def _frame_count(self, n_samples: int) -> int:
+        """Number of STFT frames of a signal (scipy pads n_fft // 2 zeros at both ends, then to whole hops)"""
+        padded = n_samples + 2 * (self.n_fft // 2) - self.n_fft
+        return -(-padded // self.hop_length) + 1
+    
+    def _peak_mask(self, spectrogram: np.ndarray) -> np.ndarray:
+        """
+        Local maxima of a spectrogram (or of each spectrogram of a stack) using a 2D maximum filter
+        """
+        # Apply maximum filter (never across the spectrograms of a stack)
+        neighborhood = np.ones((1,) * (spectrogram.ndim - 2) + (self.peak_neighborhood_size,) * 2)
+        local_max = maximum_filter(spectrogram, footprint=neighborhood, mode='constant')
+        
+        # Find points where original equals local max (peaks)
+        return (spectrogram == local_max) & (spectrogram > 0)
+    
+    def _find_peaks(self, spectrogram: np.ndarray, threshold: float = None,
+                    peaks_mask: np.ndarray = None) -> tuple:
         """
         Find local peaks in spectrogram using 2D maximum filter
         
         Args:
             spectrogram: Magnitude spectrogram (2D array)
             threshold: Minimum magnitude threshold (auto if None)
+            peaks_mask: Precomputed local maxima of the spectrogram (computed if None)
             
         Returns:
-            List of (time_idx, freq_idx) tuples for peaks
+            Tuple of (time indices, frequency indices) of the peaks,
+            ordered by frequency, then time
         """
-        # Apply maximum filter
-        neighborhood = np.ones((self.peak_neighborhood_size, self.peak_neighborhood_size))
-        local_max = maximum_filter(spectrogram, footprint=neighborhood, mode='constant')
-        
-        # Find points where original equals local max (peaks)
-        peaks_mask = (spectrogram == local_max) & (spectrogram > 0)
+        if peaks_mask is None:
+            peaks_mask = self._peak_mask(spectrogram)
         
         # Apply threshold (use percentile to filter noise more effectively)
         if threshold is None:
@@ -204,15 +266,40 @@ class AudioFingerprinter:
         peaks_mask = peaks_mask & (spectrogram >= threshold)
         
         # Get peak coordinates
-        # np.where returns (row_indices, col_indices)
         # For spectrogram from scipy.stft: shape is (freq, time)
         # So row = freq_idx, col = time_idx
-        # But we want (time_idx, freq_idx) to match our usage
-        freq_indices, time_indices = np.where(peaks_mask)
+        freq_indices, time_indices = np.nonzero(peaks_mask)
         
-        peaks = list(zip(time_indices, freq_indices))
+        return time_indices, freq_indices
+    
+    def _hash_peaks(self, time_indices: np.ndarray, freq_indices: np.ndarray,
+                    times: np.ndarray, frequencies: np.ndarray) -> FingerprintColumns:
+        """
+        Combinatorial hashing: pair every anchor peak with the peaks of its target zone
+        
+        Anchors come in peak order and each anchor's targets too, so the
+        fingerprints are in the order of the anchor/target double loop.
+        """
+        # Peaks by time, to find each anchor's target zone [t + bin_min, t + bin_max)
+        by_time = np.argsort(time_indices, kind='stable')
+        sorted_times = time_indices[by_time]
+        zone_start = np.searchsorted(sorted_times, time_indices + self.target_zone_bin_min, side='left')
+        zone_end = np.searchsorted(sorted_times, time_indices + self.target_zone_bin_max, side='left')
+        zone_sizes = np.maximum(zone_end - zone_start, 0)
         
-        return peaks
+        anchors = np.repeat(np.arange(len(time_indices)), zone_sizes)
+        first_pair = np.cumsum(zone_sizes) - zone_sizes
+        targets = by_time[np.arange(len(anchors)) - np.repeat(first_pair - zone_start, zone_sizes)]
+        order = np.lexsort((targets, anchors))
+        anchors, targets = anchors[order], targets[order]
+        
+        # Create hash: (f1, f2, dt) where dt is time delta in bins
+        return FingerprintColumns(
+            f1=frequencies[freq_indices[anchors]].astype(np.int64),
+            f2=frequencies[freq_indices[targets]].astype(np.int64),
+            dt=(time_indices[targets] - time_indices[anchors]).astype(np.int64),
+            times=times[time_indices[anchors]],
+        )
     
     def generate_fingerprints(self, audio: np.ndarray) -> list:
         """
@@ -228,50 +315,60 @@ class AudioFingerprinter:
         # Compute spectrogram
         spectrogram, times, frequencies = self._compute_spectrogram(audio)
         
-        peaks = self._find_peaks(spectrogram)
+        time_indices, freq_indices = self._find_peaks(spectrogram)
         
-        fingerprints = []
+        return self._hash_peaks(time_indices, freq_indices, times, frequencies).to_list()
+    
+    def generate_fingerprints_batch(self, audios: List[np.ndarray],
+                                    max_batch_samples: int = BATCH_MAX_SAMPLES) -> List[FingerprintColumns]:
+        """
+        Generate the fingerprints of many clips at once
+        
+        Clips of similar length are zero-padded to a common length and
+        stacked, so their STFTs and peak maps are computed as single 3D
+        array operations. Padding does not change a clip's frames (scipy
+        pads with zeros too) and the frames past a clip's end are cleared
+        before peak picking, so each clip gets exactly the fingerprints of
+        generate_fingerprints.
         
-        # For each anchor point
-        # peaks are (time_idx, freq_idx) from np.where on spectrogram
-        # spectrogram shape from scipy.stft is (freq_bins, time_bins)
-        for anchor_time_idx, anchor_freq_idx in peaks:
-            # Check bounds
-            if anchor_time_idx >= len(times) or anchor_freq_idx >= len(frequencies):
-                continue
-                
-            anchor_time = times[anchor_time_idx]
-            anchor_freq = frequencies[anchor_freq_idx]
+        Args:
+            audios: Mono audio signals (each at least n_fft samples)
+            max_batch_samples: Padded samples per stacked STFT (longer clips go one at a time)
             
-
-            time_min = anchor_time_idx + self.target_zone_bin_min
-            time_max = min(anchor_time_idx + self.target_zone_bin_max, len(times))
+        Returns:
+            One FingerprintColumns per clip, in order
+        """
+        lengths = [len(audio) for audio in audios]
+        if any(length < self.n_fft for length in lengths):
+            raise ValueError(f"Every clip needs at least {self.n_fft} samples (one FFT window)")
+        
+        # Group clips by length so little of each stack is padding
+        results = [None] * len(audios)
+        order = sorted(range(len(audios)), key=lambda number: lengths[number])
+        while order:
+            group = [order.pop()]
+            while order and (len(group) + 1) * lengths[group[0]] <= max_batch_samples:
+                group.append(order.pop())
             
-            # Filter peaks that are in the target zone (more efficient)
-            target_peaks = [
-                (t_idx, f_idx) for t_idx, f_idx in peaks
-                if time_min <= t_idx < time_max 
-                and t_idx < len(times) 
-                and f_idx < len(frequencies)
-            ]
+            stacked = np.zeros((len(group), lengths[group[0]]))
+            for row, number in enumerate(group):
+                stacked[row, :lengths[number]] = audios[number]
+            spectrograms, times, frequencies = self._compute_spectrogram(stacked)
             
-            # For each target peak in the zone
-            for target_time_idx, target_freq_idx in target_peaks:
-                if target_time_idx >= len(times) or target_freq_idx >= len(frequencies):
-                    continue
-                    
-                target_freq = frequencies[target_freq_idx]
-                
-                # Calculate time delta (in bins)
-                dt = target_time_idx - anchor_time_idx
-                
-                # Create hash: (f1, f2, dt) where dt is time delta in bins
-                hash_token = (int(anchor_freq), int(target_freq), int(dt))
-                
-                # Store: (hash, absolute_time_of_anchor)
-                fingerprints.append((hash_token, anchor_time))
-        
-        return fingerprints
+            # Frames past a clip's end must read as the filter's zero border
+            frame_counts = [self._frame_count(lengths[number]) for number in group]
+            for row, frame_count in enumerate(frame_counts):
+                spectrograms[row, :, frame_count:] = 0
+            peak_masks = self._peak_mask(spectrograms)
+            
+            for row, (number, frame_count) in enumerate(zip(group, frame_counts)):
+                time_indices, freq_indices = self._find_peaks(spectrograms[row, :, :frame_count],
+                                                              peaks_mask=peak_masks[row, :, :frame_count])
+                results[number] = self._hash_peaks(time_indices, freq_indices, times, frequencies)
+        
+        logger.info(f"[DSP] Generated fingerprints of {len(audios)} clips "
+                    f"({sum(len(columns.times) for columns in results)} fingerprints)")
+        return results
     
     def process_file(self, file_path: str) -> list:
         """
@@ -0,0 +1,219 @@
+"""
+Fingerprint Payloads
+Compact, versioned binary encoding of fingerprints, so clients, coordinators
+and offline fingerprinting machines can send hashes instead of audio
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from app.core.dsp_engine import AudioFingerprinter
+
+PAYLOAD_MAGIC = b"MRFP"
+PAYLOAD_VERSION = 1
+PAYLOAD_CONTENT_TYPE = "application/x-fingerprints"
+
+# A bundle holds the payloads of several named songs, for ingestion
+BUNDLE_MAGIC = b"MRFB"
+BUNDLE_VERSION = 1
+BUNDLE_CONTENT_TYPE = "application/x-fingerprint-bundle"
+
+# magic, version, flags, fingerprinter signature, fingerprint count
+_HEADER = struct.Struct("<4sHHQI")
+FLAG_ZLIB = 1
+
+# magic, version, song count; then per song: name length, name (UTF-8), payload length, payload
+_BUNDLE_HEADER = struct.Struct("<4sHI")
+_NAME_LENGTH = struct.Struct("<H")
+_PAYLOAD_LENGTH = struct.Struct("<I")
+
+# Hard limit on decoded fingerprints (a 10 s clip has ~15k, a whole song ~500k)
+MAX_PAYLOAD_FINGERPRINTS = 5_000_000
+
+# Body columns, in order: frame deltas, anchor frequency (Hz), target frequency (Hz), dt (frames)
+_COLUMNS = (("frame_delta", "<u4"), ("f1", "<u2"), ("f2", "<u2"), ("dt", "<u2"))
+
+
+class FingerprintPayloadError(ValueError):
+    """Raised when a payload is malformed"""
+
+
+class IncompatibleFingerprintsError(FingerprintPayloadError):
+    """Raised when a payload was produced with different fingerprinter settings"""
+
+
+def fingerprinter_signature(fingerprinter: AudioFingerprinter) -> int:
+    """64-bit digest of the fingerprinter settings, carried by every payload"""
+    canonical = json.dumps(fingerprinter.params(), sort_keys=True).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(canonical).digest()[:8], "little")
+
+
+def encode_fingerprints(fingerprints: List[Tuple], fingerprinter: AudioFingerprinter,
+                        compress: bool = True) -> bytes:
+    """
+    Encode fingerprints as a payload for /recognize/fingerprints
+
+    The fingerprints are sorted by anchor frame and stored column by column:
+    frame deltas (mostly 0), then f1, f2 and dt. Anchor times are sent as STFT
+    frame numbers, which the receiver turns back into the exact same times.
+    With zlib on top this is well under a byte per fingerprint.
+
+    Args:
+        fingerprints: ((f1, f2, dt), anchor_time) tuples from `fingerprinter`
+        fingerprinter: The fingerprinter that produced them
+        compress: Deflate the body
+
+    Returns:
+        Payload bytes
+    """
+    count = len(fingerprints)
+    hashes = np.asarray([hash_token for hash_token, _ in fingerprints], dtype=np.int64).reshape(-1, 3)
+    times = np.asarray([anchor_time for _, anchor_time in fingerprints], dtype=np.float64)
+    frames = np.rint(times * fingerprinter.sample_rate / fingerprinter.hop_length).astype(np.int64)
+    if count and (frames.min() < 0 or not np.array_equal(fingerprinter.frame_times(frames), times)):
+        raise FingerprintPayloadError("Anchor times are not STFT frames of this fingerprinter")
+    if count and (hashes.min() < 0 or hashes.max() > np.iinfo(np.uint16).max):
+        raise FingerprintPayloadError("Hash fields do not fit in 16 bits")
+
+    order = np.lexsort((hashes[:, 2], hashes[:, 1], hashes[:, 0], frames))
+    hashes, frames = hashes[order], frames[order]
+    columns = (np.diff(frames, prepend=0), hashes[:, 0], hashes[:, 1], hashes[:, 2])
+    body = b"".join(column.astype(dtype).tobytes() for column, (_, dtype) in zip(columns, _COLUMNS))
+
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(PAYLOAD_MAGIC, PAYLOAD_VERSION, flags,
+                        fingerprinter_signature(fingerprinter), count) + body
+
+
+def _check_header(payload: bytes, fingerprinter: AudioFingerprinter) -> Tuple[int, int]:
+    """Validate a payload header against the fingerprinter and return (flags, count)"""
+    if len(payload) < _HEADER.size:
+        raise FingerprintPayloadError("Payload is shorter than its header")
+    magic, version, flags, signature, count = _HEADER.unpack_from(payload)
+    if magic != PAYLOAD_MAGIC:
+        raise FingerprintPayloadError("Not a fingerprint payload")
+    if version != PAYLOAD_VERSION:
+        raise FingerprintPayloadError(f"Unsupported payload version {version} (expected {PAYLOAD_VERSION})")
+    if signature != fingerprinter_signature(fingerprinter):
+        raise IncompatibleFingerprintsError(
+            f"Fingerprints were made with other fingerprinter settings "
+            f"(signature {signature:016x}, server {fingerprinter_signature(fingerprinter):016x})"
+        )
+    if count > MAX_PAYLOAD_FINGERPRINTS:
+        raise FingerprintPayloadError(f"Payload holds more than {MAX_PAYLOAD_FINGERPRINTS} fingerprints")
+    return flags, count
+
+
+def decode_fingerprints(payload: bytes, fingerprinter: AudioFingerprinter) -> List[Tuple]:
+    """
+    Decode a payload produced by encode_fingerprints
+
+    Raises:
+        IncompatibleFingerprintsError: The payload was made with other fingerprinter settings
+        FingerprintPayloadError: The payload is malformed or from an unknown version
+    """
+    flags, count = _check_header(payload, fingerprinter)
+    row_size = sum(np.dtype(dtype).itemsize for _, dtype in _COLUMNS)
+    body = memoryview(payload)[_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        try:
+            # Cap the output so a small payload cannot inflate into a huge one
+            # (a max_length of 0 would mean no limit, hence at least 1)
+            inflater = zlib.decompressobj()
+            body = inflater.decompress(body, max(count * row_size, 1))
+        except zlib.error as e:
+            raise FingerprintPayloadError(f"Corrupt payload body: {e}")
+        if not inflater.eof or inflater.unconsumed_tail or inflater.unused_data:
+            raise FingerprintPayloadError("Payload body is truncated or has trailing data")
+    if len(body) != count * row_size:
+        raise FingerprintPayloadError(f"Payload body holds {len(body)} bytes, expected {count * row_size}")
+
+    columns, offset = [], 0
+    for _, dtype in _COLUMNS:
+        columns.append(np.frombuffer(body, dtype=dtype, count=count, offset=offset).astype(np.int64))
+        offset += count * np.dtype(dtype).itemsize
+    frame_deltas, f1, f2, dt = columns
+    times = fingerprinter.frame_times(np.cumsum(frame_deltas))
+    hash_tokens = zip(f1.tolist(), f2.tolist(), dt.tolist())
+    return list(zip(hash_tokens, times.tolist()))
+
+
+def encode_song_bundle(songs: Iterable[Tuple[str, List[Tuple]]], fingerprinter: AudioFingerprinter,
+                       compress: bool = True) -> bytes:
+    """
+    Encode the fingerprints of several songs for /learn/fingerprints
+
+    Args:
+        songs: (song_name, fingerprints) pairs
+        fingerprinter: The fingerprinter that produced the fingerprints
+        compress: Deflate each song's payload
+    """
+    return pack_song_bundle((song_name, encode_fingerprints(fingerprints, fingerprinter, compress))
+                            for song_name, fingerprints in songs)
+
+
+def pack_song_bundle(payloads: Iterable[Tuple[str, bytes]]) -> bytes:
+    """Build a bundle from (song_name, payload) pairs already encoded with encode_fingerprints"""
+    records = []
+    for song_name, payload in payloads:
+        name = song_name.encode("utf-8")
+        if not name or len(name) > np.iinfo(np.uint16).max:
+            raise FingerprintPayloadError(f"Invalid song name {song_name!r}")
+        records.append(_NAME_LENGTH.pack(len(name)) + name + _PAYLOAD_LENGTH.pack(len(payload)) + payload)
+    return _BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(records)) + b"".join(records)
+
+
+def split_song_bundle(bundle: bytes, fingerprinter: AudioFingerprinter) -> List[Tuple[str, memoryview]]:
+    """
+    Check a bundle and split it into (song_name, payload) pairs
+
+    Every payload header is validated here, so an incompatible or malformed
+    bundle is rejected before any song is written; the payloads themselves
+    are decoded later, one song at a time, with decode_fingerprints.
+
+    Raises:
+        IncompatibleFingerprintsError: A payload was made with other fingerprinter settings
+        FingerprintPayloadError: The bundle is malformed or from an unknown version
+    """
+    data = memoryview(bundle)
+    if len(data) < _BUNDLE_HEADER.size:
+        raise FingerprintPayloadError("Bundle is shorter than its header")
+    magic, version, song_count = _BUNDLE_HEADER.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise FingerprintPayloadError("Not a fingerprint bundle")
+    if version != BUNDLE_VERSION:
+        raise FingerprintPayloadError(f"Unsupported bundle version {version} (expected {BUNDLE_VERSION})")
+
+    songs, offset = [], _BUNDLE_HEADER.size
+    for number in range(song_count):
+        try:
+            (name_length,) = _NAME_LENGTH.unpack_from(data, offset)
+            offset += _NAME_LENGTH.size
+            song_name = bytes(data[offset:offset + name_length]).decode("utf-8")
+            offset += name_length
+            (payload_length,) = _PAYLOAD_LENGTH.unpack_from(data, offset)
+            offset += _PAYLOAD_LENGTH.size
+        except (struct.error, UnicodeDecodeError) as e:
+            raise FingerprintPayloadError(f"Bundle record {number} is malformed: {e}")
+        payload = data[offset:offset + payload_length]
+        offset += payload_length
+        if not song_name or len(payload) != payload_length:
+            raise FingerprintPayloadError(f"Bundle record {number} is malformed")
+        try:
+            _, count = _check_header(payload, fingerprinter)
+        except FingerprintPayloadError as e:
+            raise type(e)(f"Song '{song_name}': {e}")
+        if count == 0:
+            raise FingerprintPayloadError(f"Song '{song_name}' has no fingerprints")
+        songs.append((song_name, payload))
+    if offset != len(data):
+        raise FingerprintPayloadError("Bundle has trailing data")
+    return songs
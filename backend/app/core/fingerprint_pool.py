@@ -0,0 +1,171 @@
+"""
+Parallel Fingerprinting
+Fingerprints many audio files at once on a pool of worker processes
+"""
+
+import multiprocessing
+import os
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+
+from app.core.dsp_engine import AudioFingerprinter, FingerprintColumns
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_FINGERPRINT_WORKERS = os.cpu_count() or 1
+
+# Workers are spawned, not forked: the server process runs threads
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+_worker_fingerprinter: Optional[AudioFingerprinter] = None
+
+
+def _init_worker(params: dict):
+    global _worker_fingerprinter
+    _worker_fingerprinter = AudioFingerprinter(**params)
+
+
+def _fingerprint_batch(fingerprinter: AudioFingerprinter,
+                       file_paths: List[str]) -> List[Union[FingerprintColumns, Exception]]:
+    """Load the files, then fingerprint all those that loaded in one generate_fingerprints_batch call"""
+    results, audios, loaded = [], [], []
+    for number, file_path in enumerate(file_paths):
+        try:
+            audio = fingerprinter.load_audio(file_path)
+            if len(audio) < fingerprinter.n_fft:
+                raise ValueError("Audio is too short to fingerprint")
+            audios.append(audio)
+            loaded.append(number)
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    try:
+        batch = fingerprinter.generate_fingerprints_batch(audios)
+    except Exception as e:
+        # One bad clip must not fail the others: fingerprint each on its own
+        logger.warning(f"⚠️ Batch fingerprinting failed ({e}); retrying the files one by one")
+        batch = []
+        for audio in audios:
+            try:
+                batch.append(fingerprinter.generate_fingerprints_batch([audio])[0])
+            except Exception as clip_error:
+                batch.append(clip_error)
+    for number, columns in zip(loaded, batch):
+        results[number] = columns
+    return results
+
+
+def _fingerprint_files(file_paths: List[str]) -> List[Union[FingerprintColumns, str]]:
+    """Worker: fingerprints of each file (as columns, which pickle compactly), or the error message"""
+    return [(str(result) or type(result).__name__) if isinstance(result, Exception) else result
+            for result in _fingerprint_batch(_worker_fingerprinter, file_paths)]
+
+
+class FingerprintPool:
+    """
+    Fingerprints batches of audio files in parallel
+
+    Decoding, resampling and peak hashing are CPU-bound Python and NumPy work
+    that threads cannot spread over cores, so the files of a batch are
+    handed to worker processes, each with its own AudioFingerprinter built
+    from the same settings as the server's. The processes are started on
+    the first batch and kept for the next ones.
+
+    Each worker takes a share of the files and fingerprints them with
+    generate_fingerprints_batch. With a single worker (or a single file)
+    the files are fingerprinted in the calling thread instead.
+
+    If a worker process dies (e.g. killed for memory), the broken pool is
+    discarded and the batch is retried once on a new one.
+    """
+
+    def __init__(self, fingerprinter: AudioFingerprinter, workers: int = DEFAULT_FINGERPRINT_WORKERS):
+        """
+        Args:
+            fingerprinter: The server's fingerprinter (workers copy its settings)
+            workers: Number of worker processes
+        """
+        self.fingerprinter = fingerprinter
+        self.workers = max(workers, 1)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                params = self.fingerprinter.params()
+                params.pop("algorithm")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_MP_CONTEXT,
+                                                     initializer=_init_worker, initargs=(params,))
+                logger.info(f"🧵 Fingerprint pool started with {self.workers} processes")
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next call starts a new one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("⚠️ A fingerprint worker process died; the pool will be restarted")
+
+    def _run_chunks(self, chunks: List[List[str]]) -> List[List[Union[FingerprintColumns, str]]]:
+        """Fingerprint each chunk on a worker process, restarting a broken pool once"""
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                if len(chunks) == 1:
+                    return [executor.submit(_fingerprint_files, chunks[0]).result()]
+                return list(executor.map(_fingerprint_files, chunks))
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                if attempt:
+                    raise
+
+    def fingerprint_files(self, file_paths: List[str]) -> List[Union[list, Exception]]:
+        """
+        Fingerprint several audio files
+
+        Returns:
+            One entry per file, in order: its fingerprints, or the exception
+            that prevented fingerprinting it
+        """
+        if self.workers == 1 or len(file_paths) <= 1:
+            results = _fingerprint_batch(self.fingerprinter, file_paths)
+        else:
+            # One chunk per worker, each fingerprinted as a batch
+            chunk_size = -(-len(file_paths) // self.workers)
+            chunks = [file_paths[start:start + chunk_size] for start in range(0, len(file_paths), chunk_size)]
+            results = [RuntimeError(result) if isinstance(result, str) else result
+                       for chunk in self._run_chunks(chunks)
+                       for result in chunk]
+        return [result.to_list() if isinstance(result, FingerprintColumns) else result for result in results]
+
+    def fingerprint_file(self, file_path: str) -> list:
+        """
+        Fingerprint one audio file on a worker process (in the calling thread with a single worker)
+
+        Several threads can call this at once to keep every worker busy.
+
+        Raises:
+            Exception: The file could not be fingerprinted
+        """
+        if self.workers == 1:
+            result = _fingerprint_batch(self.fingerprinter, [file_path])[0]
+        else:
+            result = self._run_chunks([[file_path]])[0][0]
+            if isinstance(result, str):
+                result = RuntimeError(result)
+        if isinstance(result, Exception):
+            raise result
+        return result.to_list()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,246 @@
+"""
+Hot-Swappable Index
+Serves requests from reference-counted index versions, so a rebuilt or restored
+index can replace the live one without restarting the server
+"""
+
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# How often the watched file is checked for replacement
+WATCH_INTERVAL_SECONDS = 5.0
+
+
+def _file_identity(path: str) -> Optional[tuple]:
+    """(device, inode) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+class IndexVersion:
+    """One loaded index and the number of requests currently using it"""
+
+    def __init__(self, version: int, index, load_seconds: float):
+        self.version = version
+        self.index = index
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        self.refs = 0
+        self.retired = False
+
+
+class IndexManager:
+    """
+    Owns the live index and swaps in new versions in the background
+
+    Requests take a handle with acquire() (or acquire_writer() for writes) and
+    keep using that version until they finish, even if a reload swaps in a
+    new one meanwhile. A replaced version is retired: it is closed as soon as
+    its last in-flight request releases it.
+
+    reload() builds the next version with `factory` on a background thread;
+    the live version keeps serving during the build and stays in place if
+    the build fails. For writable indexes, writes are held back while the new
+    version is built, so none lands in the version being replaced. Reads
+    never wait.
+
+    With `watch_path`, the file is polled and a reload starts whenever it is
+    replaced (a new inode, as left by an atomic rename such as export_snapshot
+    or a restored database moved into place). In-place writes to the file do
+    not trigger it.
+
+    Reload progress is available at any time through `reload_progress`:
+        status: idle | running | done | failed
+        trigger, version, started_at, finished_at, seconds, error
+    """
+
+    def __init__(self, factory: Callable[[], object],
+                 watch_path: Optional[str] = None,
+                 watch_interval: float = WATCH_INTERVAL_SECONDS):
+        """
+        Args:
+            factory: Builds a new index (PersistentDB, MemoryIndexDB, SnapshotIndex, ...)
+            watch_path: File whose replacement triggers a reload (None disables the watch)
+            watch_interval: Seconds between checks of watch_path
+        """
+        self.factory = factory
+        self.watch_path = watch_path
+        self.watch_interval = watch_interval
+        self._lock = threading.Lock()
+        self._writes = threading.Condition()
+        self._writers = 0
+        self._reloading = False
+        self._retiring: List[IndexVersion] = []
+        self._reload_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
+        self.reload_progress = {
+            "status": "idle",
+            "trigger": None,
+            "version": None,
+            "started_at": None,
+            "finished_at": None,
+            "seconds": None,
+            "error": None,
+        }
+
+        self._watched_identity = _file_identity(watch_path) if watch_path else None
+        self._current = self._load(1)
+        if watch_path:
+            self._watch_thread = threading.Thread(target=self._watch, name="index-watch", daemon=True)
+            self._watch_thread.start()
+
+    def _load(self, version: int) -> IndexVersion:
+        started = time.perf_counter()
+        index = self.factory()
+        return IndexVersion(version, index, time.perf_counter() - started)
+
+    @property
+    def current(self):
+        """The live index (without taking a reference; for logging and startup checks)"""
+        return self._current.index
+
+    @contextmanager
+    def acquire(self):
+        """Use the live index version until the block exits"""
+        with self.acquire_version() as handle:
+            yield handle.index
+
+    @contextmanager
+    def acquire_version(self):
+        """Like acquire(), but yields the IndexVersion (index and version number)"""
+        with self._lock:
+            handle = self._current
+            handle.refs += 1
+        try:
+            yield handle
+        finally:
+            self._release(handle)
+
+    @contextmanager
+    def acquire_writer(self):
+        """Like acquire(), but waits for a running reload so writes reach the new version"""
+        with self._writes:
+            while self._reloading:
+                self._writes.wait()
+            self._writers += 1
+        try:
+            with self.acquire() as index:
+                yield index
+        finally:
+            with self._writes:
+                self._writers -= 1
+                self._writes.notify_all()
+
+    def _release(self, handle: IndexVersion):
+        with self._lock:
+            handle.refs -= 1
+            drained = handle.retired and handle.refs == 0
+            if drained:
+                self._retiring.remove(handle)
+        if drained:
+            self._close(handle)
+
+    def _close(self, handle: IndexVersion):
+        try:
+            handle.index.close()
+            logger.info(f"♻️  Index version {handle.version} retired")
+        except Exception as e:
+            logger.error(f"❌ Error closing index version {handle.version}: {e}")
+
+    def reload(self, trigger: str = "manual") -> bool:
+        """
+        Start building a new index version in the background
+
+        Returns:
+            False if a reload is already running
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self.reload_progress.update({
+                "status": "running",
+                "trigger": trigger,
+                "version": self._current.version + 1,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "finished_at": None,
+                "seconds": None,
+                "error": None,
+            })
+            self._reload_thread = threading.Thread(target=self._run_reload, name="index-reload", daemon=True)
+            self._reload_thread.start()
+        return True
+
+    def _run_reload(self):
+        started = time.perf_counter()
+        writable = not self._current.index.read_only
+        if writable:
+            with self._writes:
+                self._reloading = True
+                while self._writers:
+                    self._writes.wait()
+        try:
+            logger.info(f"🔄 Building index version {self.reload_progress['version']} "
+                        f"(trigger: {self.reload_progress['trigger']})")
+            new = self._load(self.reload_progress["version"])
+            with self._lock:
+                old, self._current = self._current, new
+                old.retired = True
+                drained = old.refs == 0
+                if not drained:
+                    self._retiring.append(old)
+            if drained:
+                self._close(old)
+            self.reload_progress["status"] = "done"
+            logger.info(f"✅ Index version {new.version} is live ({new.load_seconds:.2f}s to build)")
+        except Exception as e:
+            self.reload_progress["status"] = "failed"
+            self.reload_progress["error"] = str(e)
+            logger.error(f"❌ Index reload failed, version {self._current.version} keeps serving: {e}")
+        finally:
+            if writable:
+                with self._writes:
+                    self._reloading = False
+                    self._writes.notify_all()
+            self.reload_progress["finished_at"] = datetime.now(timezone.utc).isoformat()
+            self.reload_progress["seconds"] = round(time.perf_counter() - started, 3)
+
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            identity = _file_identity(self.watch_path)
+            if identity is None or identity == self._watched_identity:
+                continue
+            if self.reload(trigger="watch"):
+                self._watched_identity = identity
+
+    def status(self) -> dict:
+        with self._lock:
+            current = self._current
+            return {
+                "version": current.version,
+                "loaded_at": current.loaded_at,
+                "load_seconds": round(current.load_seconds, 3),
+                "in_flight": current.refs,
+                "retiring": [{"version": handle.version, "in_flight": handle.refs}
+                             for handle in self._retiring],
+                "watch_path": self.watch_path,
+                "reload": dict(self.reload_progress),
+            }
+
+    def close(self):
+        """Stop the watch and close the live version"""
+        self._stop.set()
+        if self._reload_thread is not None:
+            self._reload_thread.join()
+        self._close(self._current)
@@ -0,0 +1,240 @@
+"""
+Asynchronous Ingestion
+Queue of /learn uploads processed by background workers, so a client gets a
+job id right away instead of holding the connection during fingerprinting
+and the insert
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import BinaryIO, List, Optional
+
+from app.core.fingerprint_pool import FingerprintPool
+from app.core.index_manager import IndexManager
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Jobs waiting for a worker; further uploads are refused until the queue drains
+MAX_QUEUED_JOBS = 1000
+
+# Finished jobs whose status and result stay available (oldest are forgotten first)
+MAX_FINISHED_JOBS = 10000
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit when MAX_QUEUED_JOBS jobs are already waiting"""
+
+
+class NoFingerprintsError(ValueError):
+    """Raised when an uploaded file yields no fingerprints"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestJob:
+    """
+    One queued /learn upload
+
+    status: queued | running | done | failed. A done job has `result`
+    (fingerprints_count, created, replaced_fingerprints), a failed one `error`.
+    """
+
+    def __init__(self, song_name: str, mode: str, filename: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.song_name = song_name
+        self.mode = mode
+        self.filename = filename
+        self.path = path
+        self.status = "queued"
+        self.result: Optional[dict] = None
+        self.error: Optional[Exception] = None
+        self.submitted_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "song_name": self.song_name,
+            "mode": self.mode,
+            "filename": self.filename,
+            "error": str(self.error) if self.error is not None else None,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestQueue:
+    """
+    Runs /learn uploads in the background
+
+    submit() copies the upload into a spool directory and queues a job.
+    Worker threads take the jobs in order, fingerprint the audio on the
+    FingerprintPool's processes and write the song to the live index
+    (waiting for a running reload, like any other write). With as many
+    workers as fingerprinting processes, the insert of one job overlaps the
+    fingerprinting of the next ones. The threads and the spool directory are
+    created on the first submit.
+
+    Jobs live in memory: queued jobs are lost on restart, and a finished
+    job is forgotten once MAX_FINISHED_JOBS newer jobs have finished.
+    """
+
+    def __init__(self, fingerprint_pool: FingerprintPool, index_manager: IndexManager,
+                 workers: int = 1, max_queued: int = MAX_QUEUED_JOBS):
+        """
+        Args:
+            fingerprint_pool: Fingerprints the uploads
+            index_manager: Provides the live index the songs are written to
+            workers: Jobs processed at the same time
+            max_queued: Jobs allowed to wait for a worker
+        """
+        self.fingerprint_pool = fingerprint_pool
+        self.index_manager = index_manager
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: deque = deque()
+        # Slots taken by uploads still being spooled (counted against max_queued)
+        self._reserved = 0
+        self._finished: deque = deque()
+        self._running = 0
+        self._threads: List[threading.Thread] = []
+        self._spool_dir: Optional[str] = None
+        self._closed = False
+
+    def _start(self):
+        """Create the spool directory and the worker threads (called with the lock held)"""
+        if self._threads:
+            return
+        self._spool_dir = tempfile.mkdtemp(prefix="ingest-")
+        self._threads = [threading.Thread(target=self._work, name=f"ingest-{number}", daemon=True)
+                         for number in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"📥 Ingest queue started with {self.workers} workers")
+
+    def submit(self, upload: BinaryIO, filename: str, song_name: str, mode: str) -> IngestJob:
+        """
+        Spool an upload and queue it
+
+        Raises:
+            QueueFullError: Too many jobs are waiting
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The ingest queue is closed")
+            if len(self._queue) + self._reserved >= self.max_queued:
+                raise QueueFullError(f"{len(self._queue) + self._reserved} uploads are already queued; "
+                                     f"retry later")
+            self._start()
+            self._reserved += 1
+
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename or "")[1], dir=self._spool_dir)
+            with os.fdopen(fd, "wb") as spooled:
+                shutil.copyfileobj(upload, spooled)
+            job = IngestJob(song_name, mode, filename, path)
+        except BaseException:
+            with self._cond:
+                self._reserved -= 1
+            if path is not None and os.path.exists(path):
+                os.unlink(path)
+            raise
+
+        with self._cond:
+            self._reserved -= 1
+            if self._closed:
+                os.unlink(path)
+                raise RuntimeError("The ingest queue is closed")
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: IngestJob) -> Optional[int]:
+        """Number of jobs ahead of a queued job (None once it has started)"""
+        with self._cond:
+            try:
+                return self._queue.index(job)
+            except ValueError:
+                return None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": len(self._queue) + self._reserved,
+                "running": self._running,
+                "finished": len(self._finished),
+            }
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._queue.popleft()
+                job.status = "running"
+                job.started_at = _now()
+                self._running += 1
+
+            self._run(job)
+
+            with self._cond:
+                self._running -= 1
+                self._finished.append(job.id)
+                while len(self._finished) > MAX_FINISHED_JOBS:
+                    self._jobs.pop(self._finished.popleft(), None)
+
+    def _run(self, job: IngestJob):
+        try:
+            fingerprints = self.fingerprint_pool.fingerprint_file(job.path)
+            if not fingerprints:
+                raise NoFingerprintsError("Failed to generate fingerprints. Please check the audio file.")
+            ingest_stats = {}
+            with self.index_manager.acquire_writer() as db:
+                count = db.add_song(job.song_name, fingerprints, mode=job.mode, stats=ingest_stats)
+            job.result = {"fingerprints_count": count, "created": ingest_stats["created"],
+                          "replaced_fingerprints": ingest_stats["replaced_fingerprints"]}
+            job.status = "done"
+            logger.info(f"✅ Ingest job {job.id}: '{job.song_name}' with {count} fingerprints")
+        except Exception as e:
+            job.error = e
+            job.status = "failed"
+            logger.warning(f"⚠️ Ingest job {job.id} ('{job.song_name}') failed: {e}")
+        finally:
+            job.finished_at = _now()
+            if os.path.exists(job.path):
+                os.unlink(job.path)
+
+    def close(self):
+        """Stop the workers once their current jobs are done; queued jobs are dropped"""
+        with self._cond:
+            self._closed = True
+            dropped = len(self._queue)
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+        if dropped:
+            logger.warning(f"⚠️ Ingest queue closed with {dropped} jobs still queued")
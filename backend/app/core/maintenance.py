@@ -0,0 +1,174 @@
+"""
+Background Maintenance Jobs for PersistentDB
+Compaction: purge orphaned fingerprints and reclaim space with incremental VACUUM
+"""
+
+import threading
+import time
+import logging
+from contextlib import AbstractContextManager
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from app.core.database import PersistentDB
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Rows deleted / pages vacuumed per step, and the pause between steps.
+# Every step holds the writer only briefly, so live queries and /learn keep running.
+COMPACTION_BATCH_ROWS = 20000
+COMPACTION_VACUUM_PAGES = 2000
+COMPACTION_PAUSE_SECONDS = 0.05
+
+
+class CompactionJob:
+    """
+    Purges fingerprints whose song no longer exists, then returns free pages
+    to the file system, in small throttled steps on a background thread.
+
+    The index is taken from `acquire_writer` for the whole run, so a reload
+    (admin or file watch) waits for the job instead of closing the database
+    under it.
+
+    Progress is available at any time through `progress`:
+        status: idle | running | done | failed
+        phase: scan | purge | vacuum | None
+        orphan_songs, orphans_deleted, pages_freed, bytes_freed, error,
+        started_at, finished_at
+    """
+
+    def __init__(self, acquire_writer: Callable[[], AbstractContextManager],
+                 batch_rows: int = COMPACTION_BATCH_ROWS,
+                 vacuum_pages: int = COMPACTION_VACUUM_PAGES,
+                 pause: float = COMPACTION_PAUSE_SECONDS,
+                 convert_auto_vacuum: bool = False):
+        """
+        Args:
+            acquire_writer: Returns a context manager yielding the database to compact
+                            (IndexManager.acquire_writer on a server)
+            batch_rows: Maximum fingerprints deleted per transaction
+            vacuum_pages: Maximum pages released per incremental VACUUM step
+            pause: Seconds to sleep between steps (bounds the I/O rate)
+            convert_auto_vacuum: Run the one-off full VACUUM that enables
+                                 incremental vacuum on older databases
+        """
+        self.acquire_writer = acquire_writer
+        self.batch_rows = batch_rows
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.convert_auto_vacuum = convert_auto_vacuum
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.progress = {
+            "status": "idle",
+            "phase": None,
+            "orphan_songs": 0,
+            "orphans_deleted": 0,
+            "pages_freed": 0,
+            "bytes_freed": 0,
+            "error": None,
+            "started_at": None,
+            "finished_at": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, convert_auto_vacuum: Optional[bool] = None) -> bool:
+        """
+        Start the job on a background thread
+
+        Args:
+            convert_auto_vacuum: Overrides the constructor setting for this run
+                                 (ignored if a run is already in progress)
+
+        Returns:
+            False if it is already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            if convert_auto_vacuum is not None:
+                self.convert_auto_vacuum = convert_auto_vacuum
+            self.progress.update({
+                "status": "running",
+                "phase": "scan",
+                "orphan_songs": 0,
+                "orphans_deleted": 0,
+                "pages_freed": 0,
+                "bytes_freed": 0,
+                "error": None,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "finished_at": None,
+            })
+            self._thread = threading.Thread(target=self._run, name="compaction", daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self) -> dict:
+        """Run the job on the calling thread and return the final progress"""
+        self.progress.update({"status": "running", "phase": "scan",
+                              "started_at": datetime.now(timezone.utc).isoformat()})
+        self._run()
+        return dict(self.progress)
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            logger.info("🧹 Compaction started")
+            with self.acquire_writer() as db:
+                orphan_ids = db.find_orphan_song_ids()
+                self.progress["orphan_songs"] = len(orphan_ids)
+
+                self.progress["phase"] = "purge"
+                for song_id in orphan_ids:
+                    while True:
+                        deleted = db.purge_orphan_fingerprints(song_id, self.batch_rows)
+                        self.progress["orphans_deleted"] += deleted
+                        if deleted < self.batch_rows:
+                            break
+                        time.sleep(self.pause)
+                if orphan_ids:
+                    db.reconcile_fingerprint_count()
+
+                self.progress["phase"] = "vacuum"
+                self._vacuum(db)
+
+            self.progress["status"] = "done"
+            logger.info(f"✅ Compaction done: {self.progress['orphans_deleted']} orphaned fingerprints, "
+                        f"{self.progress['bytes_freed']} bytes freed")
+        except Exception as e:
+            self.progress["status"] = "failed"
+            self.progress["error"] = str(e)
+            logger.error(f"❌ Compaction failed: {e}", exc_info=True)
+        finally:
+            self.progress["phase"] = None
+            self.progress["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    def _vacuum(self, db: PersistentDB):
+        free_pages, page_size = db.free_pages()
+        if db.auto_vacuum_mode() != 2:
+            if not self.convert_auto_vacuum:
+                logger.warning("⚠️ Incremental vacuum is not enabled on this database; "
+                               "run compaction with convert_auto_vacuum to enable it")
+                return
+            db.enable_incremental_vacuum()
+            # The full VACUUM has already released every free page
+            self.progress["pages_freed"] += free_pages
+            self.progress["bytes_freed"] += free_pages * page_size
+            return
+
+        while True:
+            freed = db.incremental_vacuum(self.vacuum_pages)
+            self.progress["pages_freed"] += freed
+            self.progress["bytes_freed"] += freed * page_size
+            if freed < self.vacuum_pages:
+                break
+            time.sleep(self.pause)
+        # In WAL mode the file only shrinks once the WAL is checkpointed
+        db.checkpoint()
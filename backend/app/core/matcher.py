@@ -0,0 +1,369 @@
+"""
+Candidate Scoring for Fingerprint Matching
+Two-stage voting: cheap hash-hit counts per song, then offset histograms for the top-N songs,
+plus a query planner that stops looking up hashes once the winner is decided
+"""
+
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+
+# Offsets are rounded to milliseconds before voting so that float noise in
+# (db_time - sample_time) does not split one time-coherent peak into several bins
+OFFSET_DECIMALS = 3
+
+# Offset bins are biased into the low 32 bits of a packed (song_id, offset) key
+_OFFSET_BIAS = 1 << 31
+
+# Default number of songs that survive stage one and get an offset histogram
+DEFAULT_TOP_N = 20
+
+# Query planner: size of the first lookup batch (batches then double) and the
+# z-score the leader's margin must reach before the remaining lookups are skipped
+DEFAULT_FIRST_BATCH = 32
+DEFAULT_EARLY_STOP_Z = 4.0
+
+
+def expand_matches(query_key_idx: np.ndarray,
+                   query_times: np.ndarray,
+                   match_key_idx: np.ndarray,
+                   match_song_ids: np.ndarray,
+                   match_times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pair every posting row with every query occurrence of the same hash
+
+    Args:
+        query_key_idx: Index of the unique hash for each query fingerprint
+        query_times: Sample time of each query fingerprint (seconds)
+        match_key_idx: Index of the unique hash for each posting row
+        match_song_ids: Song id of each posting row
+        match_times: Absolute time of each posting row (seconds)
+
+    Returns:
+        Tuple of (song_ids, offsets) with one entry per (posting, query) pair
+    """
+    query_key_idx = np.asarray(query_key_idx, dtype=np.int64)
+    match_key_idx = np.asarray(match_key_idx, dtype=np.int64)
+    if len(query_key_idx) == 0 or len(match_key_idx) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    # Group query occurrences by hash so each hash owns a contiguous slice
+    order = np.argsort(query_key_idx, kind="stable")
+    sorted_times = np.asarray(query_times, dtype=np.float64)[order]
+    n_keys = int(max(query_key_idx.max(), match_key_idx.max())) + 1
+    key_counts = np.bincount(query_key_idx, minlength=n_keys)
+    key_starts = np.cumsum(key_counts) - key_counts
+
+    # Repeat each posting once per query occurrence of its hash
+    reps = key_counts[match_key_idx]
+    row_idx = np.repeat(np.arange(len(match_key_idx)), reps)
+    within = np.arange(len(row_idx)) - np.repeat(np.cumsum(reps) - reps, reps)
+    query_pos = key_starts[match_key_idx][row_idx] + within
+
+    song_ids = np.asarray(match_song_ids, dtype=np.int64)[row_idx]
+    offsets = np.asarray(match_times, dtype=np.float64)[row_idx] - sorted_times[query_pos]
+    return song_ids, offsets
+
+
+def count_hits(song_ids: np.ndarray, top_n: int, min_hits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stage one: count raw hash hits per song and keep the strongest candidates
+
+    Args:
+        song_ids: Song id of each (posting, query) pair
+        top_n: Maximum number of candidates to keep
+        min_hits: Minimum raw hits a song needs to be considered
+
+    Returns:
+        Tuple of (candidate song ids, their raw hits), strongest first
+    """
+    if len(song_ids) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    hits = np.bincount(song_ids)
+    candidates = np.flatnonzero(hits >= max(min_hits, 1))
+    if len(candidates) > top_n:
+        keep = np.argpartition(-hits[candidates], top_n - 1)[:top_n]
+        candidates = candidates[keep]
+
+    candidates = candidates[np.argsort(-hits[candidates], kind="stable")]
+    return candidates, hits[candidates]
+
+
+def offset_histogram(song_ids: np.ndarray,
+                     offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stage two: find the most frequent offset (time coherency) for each song
+
+    Args:
+        song_ids: Song id of each (posting, query) pair
+        offsets: db_time - sample_time of each pair (seconds)
+
+    Returns:
+        Tuple of (song_ids, counts, offsets) with one entry per song,
+        sorted by count in descending order
+    """
+    if len(song_ids) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64)
+
+    # Pack (song_id, offset_bin) into one int64 so a 1-D unique does the counting
+    scale = 10 ** OFFSET_DECIMALS
+    offset_bins = np.rint(offsets * scale).astype(np.int64) + _OFFSET_BIAS
+    keys, counts = np.unique((song_ids.astype(np.int64) << 32) | offset_bins, return_counts=True)
+    key_songs = keys >> 32
+
+    # Sort by song, then by count descending: the first row of each song is its peak
+    order = np.lexsort((-counts, key_songs))
+    keys, counts, key_songs = keys[order], counts[order], key_songs[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = key_songs[1:] != key_songs[:-1]
+
+    best_songs = key_songs[first]
+    best_counts = counts[first]
+    best_offsets = ((keys[first] & 0xFFFFFFFF) - _OFFSET_BIAS) / scale
+
+    ranking = np.argsort(-best_counts, kind="stable")
+    return best_songs[ranking], best_counts[ranking], best_offsets[ranking]
+
+
+def rank_candidates(song_ids: np.ndarray,
+                    offsets: np.ndarray,
+                    top_n: int = DEFAULT_TOP_N,
+                    min_hits: int = 1) -> List[Tuple[int, int, float, int]]:
+    """
+    Two-stage scoring: offset voting runs only for the top-N songs by raw hits,
+    so the cost grows with N rather than with the number of songs hit
+
+    Args:
+        song_ids: Song id of each (posting, query) pair
+        offsets: db_time - sample_time of each pair (seconds)
+        top_n: Number of candidates kept after stage one
+        min_hits: Stage-one threshold on raw hash hits
+
+    Returns:
+        List of (song_id, match_count, offset, hits) tuples, best first,
+        where match_count is the time-coherent vote count and hits the raw hash hits
+    """
+    candidates, hits = count_hits(song_ids, top_n, min_hits)
+    if len(candidates) == 0:
+        return []
+
+    hits_by_song = dict(zip(candidates.tolist(), hits.tolist()))
+    mask = np.isin(song_ids, candidates)
+    best_songs, best_counts, best_offsets = offset_histogram(song_ids[mask], offsets[mask])
+    return [
+        (int(song_id), int(count), float(offset), hits_by_song[int(song_id)])
+        for song_id, count, offset in zip(best_songs, best_counts, best_offsets)
+    ]
+
+
+def normalized_confidence(score: float,
+                          n_query: int,
+                          query_span: float,
+                          song_fingerprints: int,
+                          song_duration: float) -> float:
+    """
+    Confidence of a match relative to the votes it could have collected
+
+    A sample of span D seconds can share at most min(n_query, rho * D)
+    time-coherent fingerprints with a song of fingerprint density rho
+    (fingerprints per second), so the score is divided by that ceiling instead
+    of by the raw query size. Sparse and dense songs are then judged on the
+    same 0-1 scale.
+
+    Args:
+        score: Time-coherent match count (extrapolated if the planner stopped early)
+        n_query: Number of query fingerprints
+        query_span: Time between the first and last query anchor (seconds)
+        song_fingerprints: Number of fingerprints stored for the song
+        song_duration: Fingerprinted duration of the song (seconds)
+
+    Returns:
+        Confidence in [0, 1]
+    """
+    expected = float(n_query)
+    if song_duration > 0 and query_span > 0:
+        density = song_fingerprints / song_duration
+        expected = min(expected, density * query_span)
+    if expected <= 0:
+        return 0.0
+    return min(score / expected, 1.0)
+
+
+def is_decided(song_ids: np.ndarray,
+               offsets: np.ndarray,
+               min_matches: int,
+               top_k: int = 1,
+               z: float = DEFAULT_EARLY_STOP_Z) -> bool:
+    """
+    Check whether the running offset votes already settle the ranking
+
+    The k-th best song (by time-coherent votes) must have at least min_matches
+    votes and lead the next song by z standard deviations, treating the two
+    counts as Poisson: (c_k - c_k+1) >= z * sqrt(c_k + c_k+1)
+
+    Args:
+        song_ids: Song id of each (posting, query) pair seen so far
+        offsets: Offset of each pair seen so far (seconds)
+        min_matches: Minimum votes the k-th song needs
+        top_k: Number of leading songs whose ranking must be settled
+        z: Required margin in standard deviations
+
+    Returns:
+        True if the remaining lookups cannot reasonably change the result
+    """
+    _, counts, _ = offset_histogram(song_ids, offsets)
+    if len(counts) < top_k:
+        return False
+
+    leader = int(counts[top_k - 1])
+    runner_up = int(counts[top_k]) if len(counts) > top_k else 0
+    if leader < min_matches:
+        return False
+    return (leader - runner_up) >= z * np.sqrt(leader + runner_up)
+
+
+class QueryPlan:
+    """
+    Query planner state: look up hashes cheapest first and stop once the outcome is decided
+
+    Hashes are ordered by posting-list length (shortest, i.e. most selective,
+    first; hashes absent from the index are never fetched), then by how often
+    they occur in the query and finally by packed hash key, so that every
+    backend looks them up in the same order. Lookups run in
+    batches that double in size, and after each batch the running offset
+    votes are checked with is_decided().
+
+    The caller drives the lookups: next_batch() names the unique hashes to
+    fetch, add_postings() takes their posting rows, until next_batch()
+    returns None. plan_matches() runs this loop for one query; batched
+    queries run several plans in lockstep and share the lookups.
+    """
+
+    def __init__(self, posting_lengths: np.ndarray,
+                 query_key_idx: np.ndarray,
+                 query_times: np.ndarray,
+                 min_matches: int,
+                 top_k: int = 1,
+                 early_stop: bool = True,
+                 z: float = DEFAULT_EARLY_STOP_Z,
+                 first_batch: int = DEFAULT_FIRST_BATCH,
+                 tie_keys: Optional[np.ndarray] = None):
+        """
+        Args:
+            posting_lengths: Posting-list length of each unique query hash
+            query_key_idx: Index of the unique hash for each query fingerprint
+            query_times: Sample time of each query fingerprint (seconds)
+            min_matches: Minimum votes for a match
+            top_k: Number of leading songs that must be settled before stopping
+            early_stop: Disable to always look up every hash
+            z: Required margin in standard deviations (see is_decided)
+            first_batch: Number of hashes in the first lookup batch
+            tie_keys: Packed key of each unique query hash (see hashing.pack_hashes),
+                      breaking the remaining ties; defaults to the unique-hash order
+        """
+        self.posting_lengths = np.asarray(posting_lengths, dtype=np.int64)
+        self.query_key_idx = np.asarray(query_key_idx, dtype=np.int64)
+        self.query_times = query_times
+        self.min_matches = min_matches
+        self.top_k = top_k
+        self.early_stop = early_stop
+        self.z = z
+        self.occurrences = np.bincount(self.query_key_idx, minlength=len(self.posting_lengths))
+
+        # Shortest posting lists first; among equals, hashes repeated in the query first
+        present = np.flatnonzero(self.posting_lengths > 0)
+        ties = present if tie_keys is None else np.asarray(tie_keys, dtype=np.int64)[present]
+        self.order = present[np.lexsort((ties, -self.occurrences[present], self.posting_lengths[present]))]
+
+        self.song_parts = []
+        self.offset_parts = []
+        self.batches = 0
+        self.done = 0
+        self.early_stopped = False
+        self.batch_size = max(first_batch, 1)
+
+    def next_batch(self) -> Optional[np.ndarray]:
+        """Unique-hash indices to look up next, or None once the plan is finished"""
+        if self.early_stopped or self.done >= len(self.order):
+            return None
+        batch = self.order[self.done:self.done + self.batch_size]
+        self.done += len(batch)
+        self.batches += 1
+        self.batch_size *= 2
+        return batch
+
+    def add_postings(self, match_key_idx: np.ndarray, match_song_ids: np.ndarray, match_times: np.ndarray):
+        """Vote with the posting rows of the last batch: (key_idx, song_ids, absolute_times) arrays"""
+        song_ids, offsets = expand_matches(self.query_key_idx, self.query_times,
+                                           match_key_idx, match_song_ids, match_times)
+        self.song_parts.append(song_ids)
+        self.offset_parts.append(offsets)
+
+        if self.early_stop and self.done < len(self.order):
+            all_songs, all_offsets = self.matches()
+            self.song_parts, self.offset_parts = [all_songs], [all_offsets]
+            if is_decided(all_songs, all_offsets, self.min_matches, top_k=self.top_k, z=self.z):
+                self.early_stopped = True
+
+    def stats(self) -> dict:
+        """hashes, lookups, present (query fingerprints whose hash is indexed), fetched
+        (query fingerprints whose hash was looked up), batches and early_stopped"""
+        return {
+            "hashes": int(len(self.posting_lengths)),
+            "lookups": int(self.done),
+            "present": int(self.occurrences[self.order].sum()),
+            "fetched": int(self.occurrences[self.order[:self.done]].sum()),
+            "batches": self.batches,
+            "early_stopped": self.early_stopped,
+        }
+
+    def matches(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(song_ids, offsets) for all (posting, query) pairs fetched so far"""
+        if not self.song_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(self.song_parts), np.concatenate(self.offset_parts)
+
+
+def plan_matches(posting_lengths: np.ndarray,
+                 query_key_idx: np.ndarray,
+                 query_times: np.ndarray,
+                 fetch_postings: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 min_matches: int,
+                 top_k: int = 1,
+                 early_stop: bool = True,
+                 z: float = DEFAULT_EARLY_STOP_Z,
+                 first_batch: int = DEFAULT_FIRST_BATCH,
+                 tie_keys: Optional[np.ndarray] = None,
+                 stats: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run the query planner (see QueryPlan) for one query
+
+    Args:
+        posting_lengths: Posting-list length of each unique query hash
+        query_key_idx: Index of the unique hash for each query fingerprint
+        query_times: Sample time of each query fingerprint (seconds)
+        fetch_postings: Callable taking unique-hash indices and returning
+                        (key_idx, song_ids, absolute_times) posting arrays
+        min_matches: Minimum votes for a match
+        top_k: Number of leading songs that must be settled before stopping
+        early_stop: Disable to always look up every hash
+        z: Required margin in standard deviations (see is_decided)
+        first_batch: Number of hashes in the first lookup batch
+        tie_keys: Packed key of each unique query hash, for the lookup order
+        stats: Optional dict filled with QueryPlan.stats()
+
+    Returns:
+        Tuple of (song_ids, offsets) for all (posting, query) pairs fetched
+    """
+    plan = QueryPlan(posting_lengths, query_key_idx, query_times, min_matches,
+                     top_k=top_k, early_stop=early_stop, z=z, first_batch=first_batch, tie_keys=tie_keys)
+    batch = plan.next_batch()
+    while batch is not None:
+        plan.add_postings(*fetch_postings(batch))
+        batch = plan.next_batch()
+
+    if stats is not None:
+        stats.update(plan.stats())
+    return plan.matches()
@@ -0,0 +1,240 @@
+"""
+In-Memory Posting Index
+Keeps every fingerprint in hash-sorted NumPy arrays and answers batched lookups
+with np.searchsorted; SQLite stays the durable store behind it
+"""
+
+import time
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.database import PersistentDB, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+from app.core.hashing import pack_hash_strings, pack_hashes
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# New songs go to a small delta segment; once it holds this many postings
+# it is merged into the main segment (and deleted songs are compacted out)
+DELTA_MERGE_ROWS = 1_000_000
+
+# Rows fetched per round trip when loading the index from SQLite
+LOAD_CHUNK_ROWS = 200_000
+
+
+class PostingIndex:
+    """
+    Immutable posting arrays sorted by packed hash key
+
+    keys: int64 packed (f1, f2, dt) hashes (see app.core.hashing)
+    song_ids: int32 song id of each posting
+    times: float32 anchor time of each posting (seconds)
+
+    The postings of one hash form a contiguous run, found with two binary searches.
+    """
+
+    def __init__(self, keys: np.ndarray, song_ids: np.ndarray, times: np.ndarray,
+                 presorted: bool = False):
+        keys = np.asarray(keys, dtype=np.int64)
+        song_ids = np.asarray(song_ids, dtype=np.int32)
+        times = np.asarray(times, dtype=np.float32)
+        if not presorted and len(keys) > 1:
+            order = np.argsort(keys, kind="stable")
+            keys, song_ids, times = keys[order], song_ids[order], times[order]
+        self.keys = keys
+        self.song_ids = song_ids
+        self.times = times
+
+    @classmethod
+    def empty(cls) -> "PostingIndex":
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32),
+                   np.empty(0, dtype=np.float32), presorted=True)
+
+    @classmethod
+    def merge(cls, *indexes: "PostingIndex") -> "PostingIndex":
+        """Merge several indexes into one"""
+        indexes = [index for index in indexes if len(index)]
+        if not indexes:
+            return cls.empty()
+        if len(indexes) == 1:
+            return indexes[0]
+        return cls(np.concatenate([index.keys for index in indexes]),
+                   np.concatenate([index.song_ids for index in indexes]),
+                   np.concatenate([index.times for index in indexes]))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.song_ids.nbytes + self.times.nbytes
+
+    def lengths(self, query_keys: np.ndarray) -> np.ndarray:
+        """Posting-list length of each query key (0 if absent)"""
+        left = np.searchsorted(self.keys, query_keys, side="left")
+        right = np.searchsorted(self.keys, query_keys, side="right")
+        return (right - left).astype(np.int64)
+
+    def lookup(self, query_keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fetch the postings of many keys at once
+
+        Returns:
+            Tuple of (key_idx, song_ids, times), where key_idx is the position
+            of each posting's hash in query_keys
+        """
+        left = np.searchsorted(self.keys, query_keys, side="left")
+        counts = np.searchsorted(self.keys, query_keys, side="right") - left
+        key_idx = np.repeat(np.arange(len(query_keys)), counts)
+        # Row of each output posting: its run start plus its position within the run
+        rows = np.arange(len(key_idx)) + np.repeat(left - (np.cumsum(counts) - counts), counts)
+        return (key_idx,
+                self.song_ids[rows].astype(np.int64),
+                self.times[rows].astype(np.float64))
+
+    def without(self, song_ids: np.ndarray) -> "PostingIndex":
+        """Copy of the index without the postings of the given songs"""
+        if len(song_ids) == 0 or len(self) == 0:
+            return self
+        keep = ~np.isin(self.song_ids, song_ids)
+        if keep.all():
+            return self
+        return PostingIndex(self.keys[keep], self.song_ids[keep], self.times[keep], presorted=True)
+
+
+def load_postings(db: PersistentDB, song_ids: Optional[Iterable[int]] = None) -> PostingIndex:
+    """
+    Read every live posting of a database into a PostingIndex
+
+    Fingerprints whose song no longer exists (waiting for compaction) are left out.
+
+    Args:
+        db: Database to read
+        song_ids: Songs whose postings are kept (defaults to the songs in
+                  db._song_meta); pass the ids read in the same transaction
+                  to get a consistent view
+    """
+    cursor = db._read_connection().cursor()
+    cursor.row_factory = None  # plain tuples: much cheaper than sqlite3.Row for millions of rows
+    cursor.execute("SELECT hash_token, song_id, absolute_time FROM fingerprints")
+    key_parts, song_parts, time_parts = [], [], []
+    while True:
+        rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+        if not rows:
+            break
+        key_parts.append(pack_hash_strings([row[0] for row in rows]))
+        song_parts.append(np.array([row[1] for row in rows], dtype=np.int32))
+        time_parts.append(np.array([row[2] for row in rows], dtype=np.float32))
+
+    if not key_parts:
+        return PostingIndex.empty()
+    live_ids = list(db._song_meta) if song_ids is None else list(song_ids)
+    posting_songs = np.concatenate(song_parts)
+    live = np.isin(posting_songs, np.fromiter(live_ids, dtype=np.int64, count=len(live_ids)))
+    return PostingIndex(np.concatenate(key_parts)[live], posting_songs[live],
+                        np.concatenate(time_parts)[live])
+
+
+class MemoryIndexDB(PersistentDB):
+    """
+    PersistentDB whose read path never touches SQLite
+
+    All fingerprints are loaded into a PostingIndex at startup. Writes go to
+    SQLite first (same add_song / delete_song / bulk load API) and are
+    applied to the in-memory index once committed:
+    - new songs go to a delta segment that is merged into the main segment
+      once it reaches delta_merge_rows postings
+    - deleted and replaced songs are masked out of main-segment lookups
+      until the next merge (their delta postings are dropped right away),
+      so a re-learn costs O(song), not O(catalog)
+    Readers grab the current (main, delta, deleted) segments with a single
+    attribute read, so lookups never wait on the writer.
+    """
+
+    def __init__(self, db_path: str = "music_recognition.db",
+                 cache_size_kb: int = SQLITE_CACHE_SIZE_KB,
+                 mmap_size: int = SQLITE_MMAP_SIZE,
+                 delta_merge_rows: int = DELTA_MERGE_ROWS):
+        self.delta_merge_rows = delta_merge_rows
+        self._segments = (PostingIndex.empty(), PostingIndex.empty(), np.empty(0, dtype=np.int64))
+        super().__init__(db_path, cache_size_kb=cache_size_kb, mmap_size=mmap_size)
+        self._load_index()
+
+    def _load_index(self):
+        """Build the in-memory index from the fingerprints table"""
+        started = time.perf_counter()
+        main = load_postings(self)
+        self._segments = (main, PostingIndex.empty(), np.empty(0, dtype=np.int64))
+        logger.info(f"🧠 In-memory index loaded: {len(main)} postings, "
+                    f"{main.nbytes / (1024 * 1024):.1f} MB in {time.perf_counter() - started:.2f}s")
+
+    def index_stats(self) -> dict:
+        """Size of the in-memory index"""
+        main, delta, deleted = self._segments
+        return {
+            "postings": len(main) + len(delta),
+            "delta_postings": len(delta),
+            "deleted_songs": len(deleted),
+            "bytes": main.nbytes + delta.nbytes,
+        }
+
+    def _query_keys(self, query_fingerprints: List[Tuple]) -> np.ndarray:
+        return pack_hashes([hash_token for hash_token, _ in query_fingerprints])
+
+    def _posting_lengths(self, keys: np.ndarray) -> np.ndarray:
+        main, delta, _ = self._segments
+        return main.lengths(keys) + delta.lengths(keys)
+
+    def _lookup_postings(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        main, delta, deleted = self._segments
+        key_idx, song_ids, times = main.lookup(keys)
+        # The mask only covers the main segment: a replaced song's new postings are in the delta
+        if len(deleted):
+            live = ~np.isin(song_ids, deleted)
+            key_idx, song_ids, times = key_idx[live], song_ids[live], times[live]
+        parts = [(key_idx, song_ids, times), delta.lookup(keys)]
+        return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+    def _on_songs_added(self, songs: List[Tuple[int, List[Tuple]]], replaced_ids: Iterable[int] = ()):
+        replaced_ids = list(replaced_ids)
+        super()._on_songs_added(songs, replaced_ids)
+        main, delta, deleted = self._segments
+        replaced = np.asarray(replaced_ids, dtype=np.int64)
+        if len(replaced):
+            # Mask the old postings in the main segment instead of copying it
+            delta, deleted = delta.without(replaced), np.union1d(deleted, replaced)
+
+        tokens = [hash_token for _, fingerprints in songs for hash_token, _ in fingerprints]
+        added = PostingIndex(
+            pack_hashes(tokens),
+            np.concatenate([np.full(len(fingerprints), song_id, dtype=np.int32)
+                            for song_id, fingerprints in songs]) if songs else [],
+            [absolute_time for _, fingerprints in songs for _, absolute_time in fingerprints],
+        )
+        delta = PostingIndex.merge(delta, added)
+
+        if len(delta) >= self.delta_merge_rows:
+            main = PostingIndex.merge(main.without(deleted), delta)
+            delta, deleted = PostingIndex.empty(), np.empty(0, dtype=np.int64)
+            logger.info(f"🧠 Merged delta segment: {len(main)} postings in the main segment")
+        self._segments = (main, delta, deleted)
+
+    def _on_songs_removed(self, song_ids: List[int]):
+        super()._on_songs_removed(song_ids)
+        main, delta, deleted = self._segments
+        removed = np.asarray(song_ids, dtype=np.int64)
+        # The delta is small enough to compact right away
+        self._segments = (main, delta.without(removed), np.union1d(deleted, removed))
+
+    def _on_cleared(self):
+        super()._on_cleared()
+        self._segments = (PostingIndex.empty(), PostingIndex.empty(), np.empty(0, dtype=np.int64))
+
+    def compact(self):
+        """Merge the delta segment and drop deleted songs from the main segment now"""
+        with self._write_lock:
+            main, delta, deleted = self._segments
+            self._segments = (PostingIndex.merge(main.without(deleted), delta),
+                              PostingIndex.empty(), np.empty(0, dtype=np.int64))
@@ -0,0 +1,160 @@
+"""
+Posting-List Cache
+Bounded LRU cache of decoded posting lists, keyed by hash, in front of SQLite lookups
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+# Default memory budget of the cache
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Approximate per-entry cost of the dict slot, key string and array headers
+ENTRY_OVERHEAD_BYTES = 300
+
+
+class PostingCache:
+    """
+    Thread-safe LRU cache of posting lists under a byte budget
+
+    Each entry maps a hash key to its (song_ids, times) arrays; an empty entry
+    records that the hash is not in the catalog. The least recently used
+    entries are evicted once the budget is exceeded.
+
+    Writers must invalidate what they change (invalidate_keys for added
+    postings, invalidate_songs for removed songs). A song -> keys index of
+    the cached entries lets invalidate_songs drop a song's entries without
+    scanning the whole cache. Both bump a generation
+    counter: a lookup that started before an invalidation must not store its
+    possibly stale result, so put() takes the generation read before the
+    lookup and drops the entry if it has changed since.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._song_keys: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @staticmethod
+    def _entry_bytes(key: str, entry: Tuple[np.ndarray, np.ndarray]) -> int:
+        return entry[0].nbytes + entry[1].nbytes + len(key) + ENTRY_OVERHEAD_BYTES
+
+    def _store(self, key: str, entry: Tuple[np.ndarray, np.ndarray]):
+        """Add an entry (the caller holds the lock and has dropped any previous one)"""
+        self._entries[key] = entry
+        self._bytes += self._entry_bytes(key, entry)
+        for song_id in np.unique(entry[0]).tolist():
+            self._song_keys.setdefault(song_id, set()).add(key)
+
+    def _drop(self, key: str, entry: Tuple[np.ndarray, np.ndarray]):
+        """Forget an entry already popped from _entries (the caller holds the lock)"""
+        self._bytes -= self._entry_bytes(key, entry)
+        for song_id in np.unique(entry[0]).tolist():
+            keys = self._song_keys.get(song_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._song_keys[song_id]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Look up many keys, refreshing the ones found
+
+        Returns:
+            Dict of the cached keys -> (song_ids, times)
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry
+                self.hits += 1
+        return found
+
+    def peek_lengths(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Posting-list lengths of the cached keys, without touching LRU order or counters"""
+        with self._lock:
+            return {key: len(self._entries[key][0]) for key in keys if key in self._entries}
+
+    def put_many(self, entries: Dict[str, Tuple[np.ndarray, np.ndarray]], generation: int):
+        """
+        Store posting lists fetched from the database
+
+        Args:
+            entries: key -> (song_ids, times)
+            generation: Value of `generation` read before the lookup started
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            for key, (song_ids, times) in entries.items():
+                entry = (np.asarray(song_ids, dtype=np.int32), np.asarray(times, dtype=np.float32))
+                if self._entry_bytes(key, entry) > self.max_bytes:
+                    continue
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._drop(key, previous)
+                self._store(key, entry)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(*self._entries.popitem(last=False))
+                self.evictions += 1
+
+    def invalidate_keys(self, keys: Iterable[str]):
+        """Drop the entries of hashes that gained postings"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._drop(key, entry)
+                    self.invalidations += 1
+
+    def invalidate_songs(self, song_ids: List[int]):
+        """Drop every entry that holds postings of the given songs"""
+        with self._lock:
+            self._generation += 1
+            stale = set()
+            for song_id in song_ids:
+                stale.update(self._song_keys.get(int(song_id), ()))
+            for key in stale:
+                self._drop(key, self._entries.pop(key))
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._song_keys.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,208 @@
+"""
+Hash-Partitioned Sharded Index
+Splits the postings of a snapshot by hash range across K shard processes and
+answers lookups by scatter-gather
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.memory_index import PostingIndex
+from app.core.snapshot import SnapshotIndex, map_snapshot, postings_of
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = os.cpu_count() or 1
+
+# Shard processes are spawned, not forked: the server process runs threads
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _shard_main(conn, path: str, lo: Optional[int], hi: Optional[int]):
+    """
+    Shard process: own the postings whose key is in [lo, hi) and answer
+    ("lengths", keys) / ("lookup", keys) requests until ("stop", None)
+    """
+    manifest, raw = map_snapshot(path, verify=False)
+    postings = postings_of(manifest, raw)
+    start = 0 if lo is None else int(np.searchsorted(postings.keys, lo, side="left"))
+    end = len(postings) if hi is None else int(np.searchsorted(postings.keys, hi, side="left"))
+    own = PostingIndex(postings.keys[start:end], postings.song_ids[start:end],
+                       postings.times[start:end], presorted=True)
+    conn.send(len(own))
+
+    while True:
+        op, keys = conn.recv()
+        if op == "stop":
+            break
+        try:
+            conn.send(own.lengths(keys) if op == "lengths" else own.lookup(keys))
+        except Exception as e:
+            conn.send(e)
+    conn.close()
+
+
+class Shard:
+    """Handle on one shard process"""
+
+    def __init__(self, number: int, path: str, lo: Optional[int], hi: Optional[int]):
+        self.number = number
+        self.lo = lo
+        self.hi = hi
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.conn, child_conn = _MP_CONTEXT.Pipe()
+        self.process = _MP_CONTEXT.Process(target=_shard_main, args=(child_conn, path, lo, hi),
+                                           name=f"index-shard-{number}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.postings = None
+        self.stopped = False
+
+    def wait_ready(self):
+        self.postings = self.conn.recv()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            try:
+                self.conn.send(("stop", None))
+            except (OSError, EOFError):
+                pass
+            self.process.join(timeout=10)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.conn.close()
+
+
+class ShardedIndex(SnapshotIndex):
+    """
+    Read-only snapshot index whose postings are spread over K processes
+
+    Shard i owns the hash keys in [bounds[i-1], bounds[i]); the bounds are
+    quantiles of the snapshot's sorted keys, so every shard holds about the
+    same number of postings and the postings of one hash stay on one shard.
+    Each shard maps only its slice of the snapshot file.
+
+    Song metadata, planning and scoring stay in the calling process (the
+    query path of IndexQueries is unchanged); only the posting-length and
+    posting lookups are scattered to the owning shards, which work on them
+    in parallel, and gathered back in query order.
+
+    rebalance(k) starts a new set of shards with recomputed bounds, switches
+    to it and stops the old set once its in-flight requests are done.
+    """
+
+    def __init__(self, path: str, shards: int = DEFAULT_SHARDS, verify: bool = True):
+        """
+        Args:
+            path: Snapshot file
+            shards: Number of shard processes (K)
+            verify: Check the snapshot checksums before starting the shards
+        """
+        super().__init__(path, verify)
+        self._rebalance_lock = threading.Lock()
+        # (shards, bounds), replaced as one tuple so a query never sees the
+        # shards of one layout with the bounds of another
+        self._layout: Tuple[List[Shard], np.ndarray] = ([], np.empty(0, dtype=np.int64))
+        self.rebalance(shards)
+
+    def _split_bounds(self, k: int) -> np.ndarray:
+        """Keys at the posting quantiles, deduplicated so no shard is empty by construction"""
+        keys = self.postings.keys
+        if len(keys) == 0 or k <= 1:
+            return np.empty(0, dtype=np.int64)
+        bounds = np.unique(np.asarray([keys[len(keys) * i // k] for i in range(1, k)], dtype=np.int64))
+        return bounds[bounds > keys[0]]
+
+    def rebalance(self, k: int):
+        """Repartition the postings over k shard processes"""
+        if k < 1:
+            raise ValueError("The number of shards must be at least 1")
+        with self._rebalance_lock:
+            started = time.perf_counter()
+            bounds = self._split_bounds(k)
+            edges = [None] + [int(bound) for bound in bounds] + [None]
+            shards = [Shard(number, self.path, edges[number], edges[number + 1])
+                      for number in range(len(edges) - 1)]
+            for shard in shards:
+                shard.wait_ready()
+            old, _ = self._layout
+            self._layout = (shards, bounds)
+            for shard in old:
+                shard.stop()
+            logger.info(f"🧩 {len(shards)} index shards ready in {time.perf_counter() - started:.2f}s "
+                        f"(postings per shard: {[shard.postings for shard in shards]})")
+
+    def _scatter(self, op: str, keys: np.ndarray) -> List[Tuple[np.ndarray, object]]:
+        """
+        Send each key to the shard owning it and gather the answers
+
+        Returns:
+            List of (positions, answer): positions of the shard's keys in `keys`
+            and the shard's answer for keys[positions]
+        """
+        while True:
+            shards, bounds = self._layout
+            owners = np.searchsorted(bounds, keys, side="right")
+            groups = [(shard, np.flatnonzero(owners == shard.number)) for shard in shards]
+            groups = [(shard, positions) for shard, positions in groups if len(positions)]
+
+            # Locks are taken in shard order, so concurrent queries cannot deadlock
+            for shard, _ in groups:
+                shard.lock.acquire()
+            try:
+                # A rebalance stopped these shards after we picked them: start over
+                if any(shard.stopped for shard, _ in groups):
+                    continue
+                for shard, positions in groups:
+                    shard.conn.send((op, keys[positions]))
+                    shard.requests += 1
+                answers = [(positions, shard.conn.recv()) for shard, positions in groups]
+                break
+            finally:
+                for shard, _ in groups:
+                    shard.lock.release()
+
+        for _, answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+        return answers
+
+    def _posting_lengths(self, keys: np.ndarray) -> np.ndarray:
+        lengths = np.zeros(len(keys), dtype=np.int64)
+        for positions, shard_lengths in self._scatter("lengths", keys):
+            lengths[positions] = shard_lengths
+        return lengths
+
+    def _lookup_postings(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        parts = [(positions[key_idx], song_ids, times)
+                 for positions, (key_idx, song_ids, times) in self._scatter("lookup", keys)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        key_idx, song_ids, times = (np.concatenate(columns) for columns in zip(*parts))
+        return key_idx, song_ids, times
+
+    def shard_stats(self) -> List[dict]:
+        return [{
+            "shard": shard.number,
+            "key_range": [shard.lo, shard.hi],
+            "postings": shard.postings,
+            "requests": shard.requests,
+            "alive": shard.process.is_alive(),
+        } for shard in self._layout[0]]
+
+    def close(self):
+        """Stop the shard processes and release the mapping"""
+        with self._rebalance_lock:
+            for shard in self._layout[0]:
+                shard.stop()
+            self._layout = ([], np.empty(0, dtype=np.int64))
+        super().close()
@@ -0,0 +1,397 @@
+"""
+Catalog Snapshots
+Compact, versioned binary export of the catalog (songs, packed postings, statistics)
+that a new node can memory-map as a read-only index or bulk-load into SQLite
+"""
+
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+import logging
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.database import (BULK_SONGS_PER_TRANSACTION, SONG_FIELDS, IndexQueries,
+                               PersistentDB, ReadOnlyIndexError)
+from app.core.hashing import pack_hashes, unpack_hashes
+from app.core.memory_index import MemoryIndexDB, PostingIndex, load_postings
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   header   magic, format version, manifest offset, manifest length, manifest crc32
+#   sections songs (JSON), keys (int64), song_ids (int32), times (float32),
+#            each aligned so the arrays can be mapped in place
+#   manifest JSON: counts, creation time, song row fields and offset / length /
+#            crc32 of every section
+SNAPSHOT_MAGIC = b"MRSNAP01"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<8sIQQI")
+SECTION_ALIGN = 64
+
+# Song row fields of snapshots written before the manifest listed them
+_LEGACY_SONG_FIELDS = ("id", "name", "created_at", "duration", "fingerprint_count", "unique_hashes")
+
+# Checksums are computed this many bytes at a time
+_CRC_CHUNK = 16 * 1024 * 1024
+
+# How often SnapshotPublisher checks the catalog for new commits
+PUBLISH_INTERVAL_SECONDS = 30.0
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is not a valid catalog snapshot"""
+
+
+def _crc32(data) -> int:
+    view = memoryview(data).cast("B")
+    crc = 0
+    for start in range(0, len(view), _CRC_CHUNK):
+        crc = zlib.crc32(view[start:start + _CRC_CHUNK], crc)
+    return crc
+
+
+def export_snapshot(db: PersistentDB, path: str) -> dict:
+    """
+    Write the catalog of `db` to a snapshot file (atomically)
+
+    Args:
+        db: Database to export (any PersistentDB backend)
+        path: Output file
+
+    Returns:
+        The snapshot manifest
+    """
+    started = time.perf_counter()
+    conn = db._read_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    if isinstance(db, MemoryIndexDB):
+        # Writers update the segments under the write lock, right after their commit
+        with db._write_lock:
+            db.compact()
+            postings = db._segments[0]
+            cursor.execute(f"SELECT {', '.join(SONG_FIELDS)} FROM songs ORDER BY id")
+            songs = [list(row) for row in cursor.fetchall()]
+            # Songs deleted by another process since the index was loaded
+            gone = set(db._song_meta).difference(song[0] for song in songs)
+        postings = postings.without(np.fromiter(gone, dtype=np.int64, count=len(gone)))
+    else:
+        # One read transaction, so the postings only refer to exported songs
+        # (an in-memory database reads on the write connection: hold off writers instead)
+        with db._write_lock if db.db_path == ":memory:" else nullcontext():
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(f"SELECT {', '.join(SONG_FIELDS)} FROM songs ORDER BY id")
+                songs = [list(row) for row in cursor.fetchall()]
+                postings = load_postings(db, song_ids=[song[0] for song in songs])
+            finally:
+                conn.rollback()
+
+    sections = [
+        ("songs", json.dumps(songs, ensure_ascii=False).encode("utf-8")),
+        ("keys", np.ascontiguousarray(postings.keys)),
+        ("song_ids", np.ascontiguousarray(postings.song_ids)),
+        ("times", np.ascontiguousarray(postings.times)),
+    ]
+
+    tmp_path = f"{path}.tmp"
+    manifest = {
+        "format_version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "song_count": len(songs),
+        "fingerprint_count": len(postings),
+        "song_fields": list(SONG_FIELDS),
+        "sections": {},
+    }
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        for name, payload in sections:
+            f.write(b"\0" * (-f.tell() % SECTION_ALIGN))
+            entry = {"offset": f.tell(), "length": payload.nbytes if isinstance(payload, np.ndarray) else len(payload),
+                     "crc32": _crc32(payload)}
+            if isinstance(payload, np.ndarray):
+                entry.update({"dtype": payload.dtype.str, "count": len(payload)})
+            f.write(memoryview(payload).cast("B"))
+            manifest["sections"][name] = entry
+
+        manifest_bytes = json.dumps(manifest).encode("utf-8")
+        manifest_offset = f.tell()
+        f.write(manifest_bytes)
+        f.seek(0)
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, manifest_offset,
+                             len(manifest_bytes), zlib.crc32(manifest_bytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    logger.info(f"📸 Snapshot written to {path}: {len(songs)} songs, {len(postings)} fingerprints, "
+                f"{os.path.getsize(path) / (1024 * 1024):.1f} MB in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    """Read and check the header and manifest of a snapshot file"""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise SnapshotError(f"{path} is too short to be a snapshot")
+        magic, version, manifest_offset, manifest_length, manifest_crc = _HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a catalog snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION})")
+        f.seek(manifest_offset)
+        manifest_bytes = f.read(manifest_length)
+    if len(manifest_bytes) != manifest_length or zlib.crc32(manifest_bytes) != manifest_crc:
+        raise SnapshotError(f"{path}: manifest checksum mismatch")
+    return json.loads(manifest_bytes)
+
+
+def map_snapshot(path: str, verify: bool = True) -> Tuple[dict, dict]:
+    """
+    Memory-map a snapshot file
+
+    Args:
+        path: Snapshot file
+        verify: Check the crc32 of every section
+
+    Returns:
+        Tuple of (manifest, sections) where sections maps each section name to
+        a uint8 view of the mapped file
+    """
+    manifest = read_manifest(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    sections = manifest["sections"]
+    raw = {name: mapped[entry["offset"]:entry["offset"] + entry["length"]]
+           for name, entry in sections.items()}
+    if verify:
+        for name, data in raw.items():
+            if _crc32(data) != sections[name]["crc32"]:
+                raise SnapshotError(f"{path}: checksum mismatch in section '{name}'")
+    return manifest, raw
+
+
+def postings_of(manifest: dict, raw: dict) -> PostingIndex:
+    """PostingIndex over the mapped posting sections (no copy)"""
+    arrays = {name: raw[name].view(np.dtype(manifest["sections"][name]["dtype"]))
+              for name in ("keys", "song_ids", "times")}
+    return PostingIndex(arrays["keys"], arrays["song_ids"], arrays["times"], presorted=True)
+
+
+class SnapshotIndex(IndexQueries):
+    """
+    Read-only index served straight from a memory-mapped snapshot
+
+    The posting arrays are views of the mapped file, so opening costs little
+    more than reading the song list, pages are shared with every other
+    process mapping the same file, and the OS page cache does the warming.
+    Queries use the same planner and scoring as PersistentDB; writes raise
+    ReadOnlyIndexError.
+    """
+
+    read_only = True
+    posting_cache = None
+    bloom = None
+
+    def __init__(self, path: str, verify: bool = True):
+        """
+        Args:
+            path: Snapshot file
+            verify: Check the crc32 of every section (reads the whole file once,
+                    which also warms the page cache)
+        """
+        started = time.perf_counter()
+        self.path = path
+        self.manifest, raw = map_snapshot(path, verify)
+        self.postings = postings_of(self.manifest, raw)
+
+        song_fields = self.manifest.get("song_fields", _LEGACY_SONG_FIELDS)
+        songs = [{field: song.get(field) for field in SONG_FIELDS}
+                 for song in (dict(zip(song_fields, row))
+                              for row in json.loads(bytes(raw["songs"]).decode("utf-8")))]
+        self._songs = sorted(songs, key=lambda song: song["name"])
+        self._names = [song["name"] for song in self._songs]
+        self._song_meta = {
+            song["id"]: {
+                "name": song["name"],
+                "duration": song["duration"] or 0.0,
+                "fingerprint_count": song["fingerprint_count"] or 0,
+            }
+            for song in songs
+        }
+        logger.info(f"📸 Snapshot mapped from {path}: {len(songs)} songs, {len(self.postings)} fingerprints "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    def _query_keys(self, query_fingerprints: List[Tuple]) -> np.ndarray:
+        return pack_hashes([hash_token for hash_token, _ in query_fingerprints])
+
+    def _posting_lengths(self, keys: np.ndarray) -> np.ndarray:
+        return self.postings.lengths(keys)
+
+    def _lookup_postings(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.postings.lookup(keys)
+
+    def get_song_stats(self, song_name: str) -> Optional[dict]:
+        i = bisect.bisect_left(self._names, song_name)
+        if i == len(self._names) or self._names[i] != song_name:
+            return None
+        meta = self._song_meta[self._songs[i]["id"]]
+        duration = meta["duration"]
+        return {
+            **meta,
+            "fingerprints_per_second": meta["fingerprint_count"] / duration if duration > 0 else 0.0,
+        }
+
+    def get_song_count(self) -> int:
+        return len(self._songs)
+
+    def get_fingerprint_count(self) -> int:
+        return len(self.postings)
+
+    def list_songs(self) -> List[str]:
+        return list(self._names)
+
+    def list_songs_page(self, limit: int = 100,
+                        after: Optional[str] = None,
+                        prefix: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> Tuple[List[dict], Optional[str]]:
+        """Same contract as PersistentDB.list_songs_page, served from the sorted song list"""
+        fields = list(fields) if fields else ["name"]
+        unknown = [field for field in fields if field not in SONG_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown song fields: {', '.join(unknown)}")
+
+        start = bisect.bisect_right(self._names, after) if after is not None else 0
+        if prefix:
+            start = max(start, bisect.bisect_left(self._names, prefix))
+        rows = []
+        for song in self._songs[start:start + limit + 1]:
+            if prefix and not song["name"].startswith(prefix):
+                break
+            rows.append(song)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        songs = [{field: row[field] for field in fields} for row in rows]
+        last_name = rows[-1]["name"] if has_more else None
+        return songs, last_name
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyIndexError(f"The index is a read-only snapshot ({self.path})")
+
+    add_song = add_songs_bulk = bulk_load = _read_only
+    delete_song = delete_songs = clear = clear_all = _read_only
+
+    def close(self):
+        """Release the mapping (arrays handed out earlier keep it alive until dropped)"""
+        self.postings = PostingIndex.empty()
+
+
+def import_snapshot(path: str, db: PersistentDB,
+                    songs_per_transaction: int = BULK_SONGS_PER_TRANSACTION,
+                    progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Bulk-load a snapshot into a SQLite database
+
+    Songs that already exist in `db` are skipped, so an interrupted import can
+    simply be run again.
+
+    Returns:
+        Bulk load summary (songs_added, songs_skipped, fingerprints_added, transactions)
+    """
+    snapshot = SnapshotIndex(path)
+    postings = snapshot.postings
+    order = np.argsort(postings.song_ids, kind="stable")
+    song_ids = postings.song_ids[order]
+    tokens = unpack_hashes(postings.keys[order])
+    times = postings.times[order].astype(np.float64)
+
+    with db.bulk_load(songs_per_transaction, progress=progress) as loader:
+        for song in sorted(snapshot._songs, key=lambda song: song["id"]):
+            lo = np.searchsorted(song_ids, song["id"], side="left")
+            hi = np.searchsorted(song_ids, song["id"], side="right")
+            fingerprints = [(tuple(token), absolute_time)
+                            for token, absolute_time in zip(tokens[lo:hi].tolist(), times[lo:hi].tolist())]
+            loader.add(song["name"], fingerprints, content_hash=song["content_hash"])
+    snapshot.close()
+    return dict(loader.progress)
+
+
+class SnapshotPublisher:
+    """
+    Re-exports the catalog to a snapshot file whenever it has changed
+
+    Runs next to the single writer: read-only workers serve the snapshot
+    (INDEX_BACKEND=snapshot with INDEX_WATCH=1) and swap in each new export
+    with a hot reload. Changes are detected with PRAGMA data_version, which
+    moves on every commit made by another connection, so writes from other
+    processes (CLI scripts, bulk loads) are published too.
+    """
+
+    def __init__(self, index_manager, path: str, interval: float = PUBLISH_INTERVAL_SECONDS):
+        """
+        Args:
+            index_manager: IndexManager of the writable index
+            path: Snapshot file to publish
+            interval: Seconds between checks for new commits
+        """
+        self.index_manager = index_manager
+        self.path = path
+        self.interval = interval
+        self._published = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.progress = {
+            "exports": 0,
+            "last_published_at": None,
+            "last_seconds": None,
+            "error": None,
+        }
+
+    def publish_if_changed(self) -> bool:
+        """Export a new snapshot if anything was committed since the last one"""
+        with self.index_manager.acquire_version() as handle:
+            index = handle.index
+            data_version = index._read_connection().execute("PRAGMA data_version").fetchone()[0]
+            # A swapped-in index has a new connection whose data_version restarts
+            state = (handle.version, data_version)
+            if state == self._published and os.path.exists(self.path):
+                return False
+            started = time.perf_counter()
+            export_snapshot(index, self.path)
+        self._published = state
+        self.progress.update({
+            "exports": self.progress["exports"] + 1,
+            "last_published_at": datetime.now(timezone.utc).isoformat(),
+            "last_seconds": round(time.perf_counter() - started, 3),
+            "error": None,
+        })
+        return True
+
+    def start(self):
+        """Publish the current catalog, then keep publishing on a background thread"""
+        self.publish_if_changed()
+        self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish_if_changed()
+            except Exception as e:
+                self.progress["error"] = str(e)
+                logger.error(f"❌ Snapshot publish failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
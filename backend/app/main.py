@@ -3,13 +3,23 @@ FastAPI Server for Music Recognition System
 Main application entry point
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
+import os
 
 from app.core.dsp_engine import AudioFingerprinter
+from app.core.coordinator import DEFAULT_BACKEND_TIMEOUT_SECONDS, CoordinatorIndex
 from app.core.database import PersistentDB
+from app.core.fingerprint_pool import DEFAULT_FINGERPRINT_WORKERS, FingerprintPool
+from app.core.index_manager import WATCH_INTERVAL_SECONDS, IndexManager
+from app.core.ingest_queue import IngestQueue
+from app.core.memory_index import MemoryIndexDB
+from app.core.sharding import DEFAULT_SHARDS, ShardedIndex
+from app.core.snapshot import SnapshotIndex, SnapshotPublisher
+from app.api.forwarding import forward_to_writer, is_write_request
 from app.api.routes import router, init_routes
 
 # Setup logging
@@ -19,11 +29,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The index is built at startup rather than at import, so processes that
+    # merely import this module (uvicorn's reloader, spawned shard processes) stay light
+    start_services()
+    yield
+    stop_services()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Music Recognition API",
     description="Shazam-like music recognition using audio fingerprinting",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for Flutter mobile app
@@ -35,18 +56,125 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
+# Index backends, selected with the INDEX_BACKEND environment variable:
+# - sqlite: lookups go straight to SQLite (default)
+# - memory: all fingerprints are loaded into NumPy arrays at startup; SQLite is
+#   only written to, so the catalog must fit in RAM (~16 bytes per fingerprint)
+# - snapshot: read-only index memory-mapped from SNAPSHOT_PATH (see scripts/snapshot.py);
+#   starts in seconds and rejects writes with 405
+# - sharded: like snapshot, with the postings split by hash range over INDEX_SHARDS
+#   processes that answer each query's lookups in parallel
+# - coordinator: no local index; queries go to the servers in COORDINATOR_BACKENDS
+#   (comma-separated URLs), each holding part of the catalog, and their top-K
+#   candidates are merged. Backends that miss COORDINATOR_TIMEOUT_SECONDS are
+#   left out and the response is flagged as partial
+INDEX_BACKENDS = {
+    "sqlite": PersistentDB,
+    "memory": MemoryIndexDB,
+    "snapshot": SnapshotIndex,
+    "sharded": ShardedIndex,
+    "coordinator": CoordinatorIndex,
+}
+INDEX_BACKEND = os.environ.get("INDEX_BACKEND", "sqlite").lower()
+if INDEX_BACKEND not in INDEX_BACKENDS:
+    raise ValueError(f"Unknown INDEX_BACKEND '{INDEX_BACKEND}', expected one of {', '.join(INDEX_BACKENDS)}")
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "music_recognition.snapshot")
+INDEX_SHARDS = int(os.environ.get("INDEX_SHARDS", str(DEFAULT_SHARDS)))
+COORDINATOR_BACKENDS = [url.strip() for url in os.environ.get("COORDINATOR_BACKENDS", "").split(",") if url.strip()]
+COORDINATOR_TIMEOUT_SECONDS = float(os.environ.get("COORDINATOR_TIMEOUT_SECONDS",
+                                                   str(DEFAULT_BACKEND_TIMEOUT_SECONDS)))
+
+# Memory budget of the posting-list cache in front of SQLite lookups (0 disables it);
+# the memory backend holds every posting already and does not use it
+POSTING_CACHE_MB = int(os.environ.get("POSTING_CACHE_MB", "64"))
+# Bloom filter over stored hashes (persisted as music_recognition.db.bloom):
+# query hashes that are not in the catalog skip the SQLite lookup
+BLOOM_FILTER = os.environ.get("BLOOM_FILTER", "1") == "1"
+backend_options = {}
+if INDEX_BACKEND == "sqlite":
+    backend_options["posting_cache_bytes"] = POSTING_CACHE_MB * 1024 * 1024
+    backend_options["bloom_filter"] = BLOOM_FILTER
+
+DB_PATH = "music_recognition.db"
+
+# Hot reload: POST /admin/reload builds a new index version in the background and swaps
+# it in without a restart. With INDEX_WATCH=1 a reload also starts whenever the index
+# file (SNAPSHOT_PATH or the database) is replaced, e.g. by a new snapshot export
+INDEX_WATCH = os.environ.get("INDEX_WATCH", "0") == "1"
+INDEX_WATCH_SECONDS = float(os.environ.get("INDEX_WATCH_SECONDS", str(WATCH_INTERVAL_SECONDS)))
+
+# Multi-worker serving (see app/serve.py): the writer re-exports SNAPSHOT_PATH every
+# SNAPSHOT_PUBLISH_SECONDS if the catalog changed (0 disables it), and read-only
+# snapshot workers forward write requests to WRITER_URL
+SNAPSHOT_PUBLISH_SECONDS = float(os.environ.get("SNAPSHOT_PUBLISH_SECONDS", "0"))
+WRITER_URL = os.environ.get("WRITER_URL")
+
+# Processes that fingerprint the clips of a /recognize/batch request (and queued /learn uploads) in parallel
+FINGERPRINT_WORKERS = int(os.environ.get("FINGERPRINT_WORKERS", str(DEFAULT_FINGERPRINT_WORKERS)))
+# Uploads processed at the same time by POST /learn?async=true (one per fingerprinting process by default)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", str(FINGERPRINT_WORKERS)))
+# Server directories POST /admin/ingest may load audio from (comma-separated; unset disables it)
+INGEST_ROOTS = [root.strip() for root in os.environ.get("INGEST_ROOTS", "").split(",") if root.strip()]
+
+
+def build_index():
+    if INDEX_BACKEND == "snapshot":
+        return SnapshotIndex(SNAPSHOT_PATH)
+    if INDEX_BACKEND == "sharded":
+        return ShardedIndex(SNAPSHOT_PATH, shards=INDEX_SHARDS)
+    if INDEX_BACKEND == "coordinator":
+        return CoordinatorIndex(COORDINATOR_BACKENDS, fingerprinter, timeout=COORDINATOR_TIMEOUT_SECONDS)
+    # Use persistent database (SQLite) - data will be saved to music_recognition.db
+    return INDEX_BACKENDS[INDEX_BACKEND](db_path=DB_PATH, **backend_options)
+
+
 fingerprinter = AudioFingerprinter()
-# Use persistent database (SQLite) - data will be saved to music_recognition.db
-db = PersistentDB(db_path="music_recognition.db")
+index_manager: IndexManager = None
+snapshot_publisher: SnapshotPublisher = None
+fingerprint_pool: FingerprintPool = None
+ingest_queue: IngestQueue = None
+
+
+def start_services():
+    global index_manager, snapshot_publisher, fingerprint_pool, ingest_queue
+    snapshot_backend = INDEX_BACKEND in ("snapshot", "sharded")
+    index_manager = IndexManager(
+        build_index,
+        watch_path=(SNAPSHOT_PATH if snapshot_backend else DB_PATH) if INDEX_WATCH else None,
+        watch_interval=INDEX_WATCH_SECONDS,
+    )
+    db = index_manager.current
+    
+    # Log database status on startup
+    song_count = db.get_song_count()
+    fingerprint_count = db.get_fingerprint_count()
+    logger.info(f"📊 Database loaded ({INDEX_BACKEND} index): {song_count} songs, {fingerprint_count} fingerprints")
+    
+    if SNAPSHOT_PUBLISH_SECONDS > 0 and not db.read_only:
+        snapshot_publisher = SnapshotPublisher(index_manager, SNAPSHOT_PATH, SNAPSHOT_PUBLISH_SECONDS)
+        snapshot_publisher.start()
+    
+    fingerprint_pool = FingerprintPool(fingerprinter, workers=FINGERPRINT_WORKERS)
+    ingest_queue = IngestQueue(fingerprint_pool, index_manager, workers=INGEST_WORKERS)
+    
+    # Initialize routes with dependencies
+    init_routes(fingerprinter, index_manager, fingerprint_pool, ingest_queue, INGEST_ROOTS)
+
+
+def stop_services():
+    if snapshot_publisher is not None:
+        snapshot_publisher.stop()
+    ingest_queue.close()
+    fingerprint_pool.close()
+    index_manager.close()
 
-# Log database status on startup
-song_count = db.get_song_count()
-fingerprint_count = db.get_fingerprint_count()
-logger.info(f"📊 Database loaded: {song_count} songs, {fingerprint_count} fingerprints")
 
-# Initialize routes with dependencies
-init_routes(fingerprinter, db)
+if WRITER_URL:
+    @app.middleware("http")
+    async def forward_writes(request: Request, call_next):
+        if is_write_request(request.method, request.url.path):
+            return await forward_to_writer(request, WRITER_URL)
+        return await call_next(request)
 
 # Include router
 app.include_router(router)
@@ -0,0 +1,129 @@
+"""
+Production Server
+One writer process owns the SQLite database and publishes catalog snapshots;
+N read-only uvicorn workers memory-map the latest snapshot and forward writes
+to the writer
+
+    python -m app.serve --workers 4
+
+Every worker maps the same snapshot file, so the index pages live once in the
+OS page cache whatever the number of workers, and each worker answers
+queries on its own core. Writes become visible to the workers once the writer
+has published them (SNAPSHOT_PUBLISH_SECONDS) and the workers' file watch
+has swapped the new snapshot in (INDEX_WATCH_SECONDS).
+"""
+
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+from app.core.index_manager import WATCH_INTERVAL_SECONDS
+from app.core.snapshot import PUBLISH_INTERVAL_SECONDS
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# How long to wait for the writer to publish its first snapshot
+WRITER_STARTUP_TIMEOUT_SECONDS = 600
+
+
+def _uvicorn(host: str, port: int, workers: int = 1) -> list:
+    return [sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", host, "--port", str(port), "--workers", str(workers)]
+
+
+def _positive_seconds(value: str) -> float:
+    seconds = float(value)
+    if not seconds > 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number of seconds, got {value}")
+    return seconds
+
+
+def _wait_for_writer(writer: subprocess.Popen, writer_url: str, snapshot_path: str) -> bool:
+    deadline = time.monotonic() + WRITER_STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if writer.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{writer_url}/stats", timeout=2).ok and os.path.exists(snapshot_path):
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with N read-only workers and one writer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Read-only worker processes (default: number of CPUs)")
+    parser.add_argument("--host", default="0.0.0.0", help="Public address of the workers")
+    parser.add_argument("--port", type=int, default=8000, help="Public port of the workers")
+    parser.add_argument("--writer-port", type=int, default=8001,
+                        help="Port of the writer (bound to 127.0.0.1 only)")
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite",
+                        help="Index backend of the writer")
+    parser.add_argument("--snapshot-path", default="music_recognition.snapshot",
+                        help="Snapshot file shared by the writer and the workers")
+    parser.add_argument("--publish-seconds", type=_positive_seconds, default=PUBLISH_INTERVAL_SECONDS,
+                        help="How often the writer publishes changes to the workers")
+    parser.add_argument("--watch-seconds", type=_positive_seconds, default=WATCH_INTERVAL_SECONDS,
+                        help="How often the workers check for a new snapshot")
+    args = parser.parse_args()
+
+    snapshot_path = os.path.abspath(args.snapshot_path)
+    writer_url = f"http://127.0.0.1:{args.writer_port}"
+
+    writer_env = dict(os.environ,
+                      INDEX_BACKEND=args.backend,
+                      SNAPSHOT_PATH=snapshot_path,
+                      SNAPSHOT_PUBLISH_SECONDS=str(args.publish_seconds))
+    writer_env.pop("WRITER_URL", None)
+    worker_env = dict(os.environ,
+                      INDEX_BACKEND="snapshot",
+                      SNAPSHOT_PATH=snapshot_path,
+                      INDEX_WATCH="1",
+                      INDEX_WATCH_SECONDS=str(args.watch_seconds),
+                      WRITER_URL=writer_url)
+    worker_env.pop("SNAPSHOT_PUBLISH_SECONDS", None)
+
+    logger.info(f"✍️  Starting writer on {writer_url} ({args.backend} index)")
+    writer = subprocess.Popen(_uvicorn("127.0.0.1", args.writer_port), env=writer_env)
+    if not _wait_for_writer(writer, writer_url, snapshot_path):
+        logger.error("❌ Writer did not come up")
+        writer.terminate()
+        writer.wait()
+        sys.exit(1)
+
+    logger.info(f"🚀 Starting {args.workers} read-only workers on {args.host}:{args.port}")
+    workers = subprocess.Popen(_uvicorn(args.host, args.port, args.workers), env=worker_env)
+
+    def shutdown(signum, frame):
+        for process in (workers, writer):
+            if process.poll() is None:
+                process.terminate()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # Either process exiting brings the whole server down
+    while writer.poll() is None and workers.poll() is None:
+        time.sleep(0.5)
+    shutdown(None, None)
+    workers.wait()
+    writer.wait()
+    sys.exit(writer.returncode or workers.returncode or 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ import time
 # API Configuration
 BASE_URL = "http://localhost:8000"
 TIMEOUT = 60  # seconds per file
+POLL_INTERVAL = 1.0  # seconds between polls of the queued jobs
+QUEUE_FULL_RETRIES = 60  # retries of an upload refused because the server's queue is full
 
 
 def get_audio_files(directory: str, extensions: List[str] = None) -> List[Path]:
@@ -68,13 +70,14 @@ def extract_song_name(file_path: Path) -> str:
     return name.strip('_')
 
 
-def upload_song(file_path: Path, song_name: str = None) -> Dict:
+def upload_song(file_path: Path, song_name: str = None, mode: str = 'replace') -> Dict:
     """
     Upload một bài hát lên server
     
     Args:
         file_path: Đường dẫn file audio
         song_name: Tên bài hát (nếu None sẽ tự động lấy từ tên file)
+        mode: Cách xử lý khi bài hát đã tồn tại (replace / reject / append)
         
     Returns:
         Dict chứa kết quả upload
@@ -89,7 +92,7 @@ def upload_song(file_path: Path, song_name: str = None) -> Dict:
     try:
         with open(file_path, 'rb') as f:
             files = {'file': (file_path.name, f, 'audio/wav')}
-            data = {'song_name': song_name}
+            data = {'song_name': song_name, 'mode': mode}
             
             response = requests.post(
                 f"{BASE_URL}/learn",
@@ -128,13 +131,110 @@ def upload_song(file_path: Path, song_name: str = None) -> Dict:
         }
 
 
-def batch_upload(directory: str, song_names: Dict[str, str] = None) -> Dict:
+def submit_song(file_path: Path, song_name: str = None, mode: str = 'replace') -> Dict:
+    """
+    Gửi một bài hát vào hàng đợi của server (POST /learn?async=true)
+    
+    Server trả về job id ngay, không chờ fingerprint và ghi database
+    
+    Returns:
+        Dict chứa job_id, hoặc error nếu server từ chối
+    """
+    if song_name is None:
+        song_name = extract_song_name(file_path)
+    
+    try:
+        for attempt in range(QUEUE_FULL_RETRIES + 1):
+            with open(file_path, 'rb') as f:
+                response = requests.post(
+                    f"{BASE_URL}/learn",
+                    params={'async': 'true'},
+                    files={'file': (file_path.name, f, 'audio/wav')},
+                    data={'song_name': song_name, 'mode': mode},
+                    timeout=TIMEOUT
+                )
+            # 503: the server's queue is full, wait for it to drain
+            if response.status_code != 503 or attempt == QUEUE_FULL_RETRIES:
+                break
+            time.sleep(POLL_INTERVAL * 5)
+        if response.status_code == 202:
+            job_id = response.json()['job']['job_id']
+            print(f"📤 Queued: {file_path.name} -> {song_name} (job {job_id})")
+            return {'file': str(file_path), 'song_name': song_name, 'job_id': job_id}
+        error_msg = response.text
+        print(f"❌ {file_path.name}: Error {response.status_code}: {error_msg}")
+    except Exception as e:
+        error_msg = str(e)
+        print(f"❌ {file_path.name}: Exception: {e}")
+    return {'success': False, 'file': str(file_path), 'song_name': song_name, 'error': error_msg}
+
+
+def wait_for_jobs(submitted: List[Dict]) -> List[Dict]:
+    """
+    Chờ các job trong hàng đợi chạy xong và lấy kết quả
+    
+    Args:
+        submitted: Kết quả của submit_song
+        
+    Returns:
+        List kết quả (cùng format với upload_song), theo thứ tự của submitted
+    """
+    results = [entry if 'job_id' not in entry else None for entry in submitted]
+    pending = [number for number, entry in enumerate(submitted) if 'job_id' in entry]
+    
+    while pending:
+        time.sleep(POLL_INTERVAL)
+        still_pending = []
+        for number in pending:
+            entry = submitted[number]
+            try:
+                response = requests.get(f"{BASE_URL}/learn/jobs/{entry['job_id']}/result", timeout=TIMEOUT)
+            except Exception as e:
+                print(f"⚠️  {entry['song_name']}: {e} (retrying)")
+                still_pending.append(number)
+                continue
+            
+            if response.status_code == 202:
+                still_pending.append(number)
+            elif response.status_code == 200:
+                result = response.json()
+                print(f"✅ {entry['song_name']}: {result.get('fingerprints_count')} fingerprints")
+                results[number] = {
+                    'success': True,
+                    'file': entry['file'],
+                    'song_name': entry['song_name'],
+                    'fingerprints': result.get('fingerprints_count', 0),
+                    'message': result.get('message', '')
+                }
+            else:
+                print(f"❌ {entry['song_name']}: Error {response.status_code}: {response.text}")
+                results[number] = {
+                    'success': False,
+                    'file': entry['file'],
+                    'song_name': entry['song_name'],
+                    'error': response.text
+                }
+        if len(still_pending) != len(pending):
+            print(f"   {len(submitted) - len(still_pending)}/{len(submitted)} done")
+        pending = still_pending
+    
+    return results
+
+
+def batch_upload(directory: str, song_names: Dict[str, str] = None, mode: str = 'replace',
+                 sync: bool = False) -> Dict:
     """
     Upload tất cả bài hát trong thư mục
     
+    Mặc định tất cả file được gửi vào hàng đợi của server trước, rồi mới chờ
+    kết quả: server xử lý song song bằng các worker của nó. Với sync=True mỗi
+    file được upload và chờ xử lý xong trước khi gửi file tiếp theo.
+    
     Args:
         directory: Đường dẫn thư mục chứa file audio
         song_names: Dict mapping file_name -> song_name (optional)
+        mode: Cách xử lý khi bài hát đã tồn tại (replace / reject / append)
+        sync: Upload từng file một (cho server chưa hỗ trợ /learn?async=true)
         
     Returns:
         Dict chứa kết quả tổng hợp
@@ -173,24 +273,27 @@ def batch_upload(directory: str, song_names: Dict[str, str] = None) -> Dict:
         'songs': []
     }
     
+    submitted = []
     for i, file_path in enumerate(audio_files, 1):
-        print(f"\n[{i}/{len(audio_files)}] Processing...")
-        
         # Get song name from mapping or extract from filename
         song_name = None
         if song_names and file_path.name in song_names:
             song_name = song_names[file_path.name]
         
-        result = upload_song(file_path, song_name)
-        results['songs'].append(result)
-        
-        if result['success']:
-            results['success'] += 1
+        if sync:
+            print(f"\n[{i}/{len(audio_files)}] Processing...")
+            results['songs'].append(upload_song(file_path, song_name, mode))
+            # Small delay to avoid overwhelming server
+            time.sleep(0.5)
         else:
-            results['failed'] += 1
-        
-        # Small delay to avoid overwhelming server
-        time.sleep(0.5)
+            submitted.append(submit_song(file_path, song_name, mode))
+    
+    if not sync:
+        print(f"\n⏳ Waiting for the server to process {len(submitted)} uploads...")
+        results['songs'] = wait_for_jobs(submitted)
+    
+    results['success'] = sum(1 for song in results['songs'] if song['success'])
+    results['failed'] = len(results['songs']) - results['success']
     
     # Summary
     print("\n" + "="*60)
@@ -266,6 +369,17 @@ def main():
         default='http://localhost:8000',
         help='API base URL (default: http://localhost:8000)'
     )
+    parser.add_argument(
+        '--mode',
+        choices=['replace', 'reject', 'append'],
+        default='replace',
+        help='Cách xử lý bài hát đã tồn tại (default: replace - upload lại không nhân đôi fingerprints)'
+    )
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Upload từng file và chờ xử lý xong (mặc định: gửi tất cả vào hàng đợi của server rồi chờ kết quả)'
+    )
     
     args = parser.parse_args()
     
@@ -279,7 +393,7 @@ def main():
         print(f"📋 Loaded {len(song_names)} song name mappings")
     
     # Run batch upload
-    results = batch_upload(args.directory, song_names)
+    results = batch_upload(args.directory, song_names, args.mode, args.sync)
     
     # Save results to file
     output_file = Path(args.directory) / 'upload_results.json'
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Script to clear all songs and fingerprints from the database
+Script to clear all songs and fingerprints from the database, or delete songs
+by name or pattern
 """
 
 import sys
@@ -53,9 +54,10 @@ def clear_database(db_path: str = "music_recognition.db", confirm: bool = False)
     
     # Clear database
     try:
-        db.clear()
+        bytes_freed = db.clear()
         print("\n✅ Database cleared successfully!")
         print(f"   Deleted: {song_count} songs, {fingerprint_count} fingerprints")
+        print(f"   Freed: {bytes_freed / (1024 * 1024):.1f} MB")
         return True
     except Exception as e:
         print(f"\n❌ Error clearing database: {e}")
@@ -114,6 +116,58 @@ def delete_song(db_path: str, song_name: str, confirm: bool = False):
         db.close()
 
 
+def delete_songs(db_path: str, names: list = None, pattern: str = None,
+                 confirm: bool = False, vacuum: bool = True):
+    """
+    Delete several songs from the database in one transaction
+    
+    Args:
+        db_path: Path to database file
+        names: Exact song names to delete
+        pattern: Shell-style GLOB pattern on the song name (e.g. "Demo_*")
+        confirm: If True, skip confirmation prompt
+        vacuum: Run a full VACUUM if the database has no incremental vacuum
+    """
+    # Check if database exists
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return False
+    
+    # Initialize database
+    db = PersistentDB(db_path=db_path)
+    
+    try:
+        matches = db.match_songs(names, pattern)
+        if not matches:
+            print("❌ No matching songs found in database")
+            return False
+        
+        print("=" * 60)
+        print(f"📝 {len(matches)} song(s) will be deleted:")
+        for i, song in enumerate(matches, 1):
+            print(f"   {i}. {song}")
+        print("=" * 60)
+        
+        # Confirmation
+        if not confirm:
+            response = input(f"\n⚠️  Are you sure you want to delete these {len(matches)} songs? (yes/no): ")
+            if response.lower() not in ['yes', 'y']:
+                print("❌ Operation cancelled")
+                return False
+        
+        result = db.delete_songs(names, pattern, vacuum=vacuum)
+        print(f"\n✅ Deleted {result['songs_deleted']} songs, {result['fingerprints_deleted']} fingerprints")
+        print(f"   Freed: {result['bytes_freed'] / (1024 * 1024):.1f} MB")
+        if result['not_found']:
+            print(f"   Not found: {', '.join(result['not_found'])}")
+        return True
+    except Exception as e:
+        print(f"\n❌ Error deleting songs: {e}")
+        return False
+    finally:
+        db.close()
+
+
 def list_songs(db_path: str):
     """
     List all songs in the database
@@ -166,6 +220,12 @@ Examples:
   # Delete a specific song
   python3 clear_database.py --delete "Song_Name"
   
+  # Delete several songs in one transaction
+  python3 clear_database.py --names "Song_A" "Song_B"
+  
+  # Delete every song matching a pattern
+  python3 clear_database.py --pattern "Demo_*"
+  
   # List all songs
   python3 clear_database.py --list
   
@@ -187,6 +247,20 @@ Examples:
         help='Delete a specific song by name'
     )
     
+    parser.add_argument(
+        '--names',
+        type=str,
+        nargs='+',
+        metavar='SONG_NAME',
+        help='Delete several songs by name in one transaction'
+    )
+    
+    parser.add_argument(
+        '--pattern',
+        type=str,
+        help='Delete every song whose name matches a shell-style pattern (e.g. "Demo_*")'
+    )
+    
     parser.add_argument(
         '--list',
         action='store_true',
@@ -221,6 +295,8 @@ Examples:
         clear_database(db_path, confirm=args.yes)
     elif args.delete:
         delete_song(db_path, args.delete, confirm=args.yes)
+    elif args.names or args.pattern:
+        delete_songs(db_path, args.names, args.pattern, confirm=args.yes)
     elif args.list:
         list_songs(db_path)
     else:
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Script to fingerprint a catalog offline and ingest the result without
+re-analysing the audio
+
+    fingerprint  audio directory -> fingerprint bundles (one process per CPU)
+    upload       bundles -> POST /learn/fingerprints on a running server
+    load         bundles -> bulk load straight into a database file
+
+Fingerprinting can run on any number of machines (split the audio between
+them); the bundles are small and are validated by the server against its own
+fingerprinter settings.
+"""
+
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import requests
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import BULK_SONGS_PER_TRANSACTION, PersistentDB
+from app.core.dsp_engine import AudioFingerprinter
+from app.core.fingerprint_codec import (
+    BUNDLE_CONTENT_TYPE, FingerprintPayloadError, decode_fingerprints, encode_fingerprints,
+    pack_song_bundle, split_song_bundle
+)
+from batch_upload_songs import extract_song_name, get_audio_files
+
+# API Configuration
+BASE_URL = "http://localhost:8000"
+TIMEOUT = 300  # seconds per bundle
+
+SONGS_PER_BUNDLE = 20
+BUNDLE_SUFFIX = ".fpb"
+
+_fingerprinter: Optional[AudioFingerprinter] = None
+
+
+def _init_worker():
+    global _fingerprinter
+    _fingerprinter = AudioFingerprinter()
+
+
+def _fingerprint_file(file_path: Path) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """Worker: (song_name, payload, error) for one audio file"""
+    song_name = extract_song_name(file_path)
+    try:
+        fingerprints = _fingerprinter.process_file(str(file_path))
+        if not fingerprints:
+            return song_name, None, "no fingerprints"
+        return song_name, encode_fingerprints(fingerprints, _fingerprinter), None
+    except Exception as e:
+        return song_name, None, str(e)
+
+
+def fingerprint_directory(directory: str, output_dir: str,
+                          workers: int = os.cpu_count() or 1,
+                          songs_per_bundle: int = SONGS_PER_BUNDLE) -> bool:
+    """
+    Fingerprint every audio file of a directory into bundle files
+
+    Args:
+        directory: Directory containing audio files
+        output_dir: Directory receiving catalog-NNNNN.fpb bundles
+        workers: Fingerprinting processes
+        songs_per_bundle: Songs per bundle file (one upload request each)
+    """
+    audio_files = get_audio_files(directory)
+    if not audio_files:
+        print(f"❌ No audio files found in {directory}")
+        return False
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"🎵 Fingerprinting {len(audio_files)} files with {workers} processes...")
+    started = time.perf_counter()
+    pending: List[Tuple[str, bytes]] = []
+    bundles, failed = 0, 0
+
+    def write_bundle():
+        nonlocal bundles, pending
+        bundles += 1
+        path = os.path.join(output_dir, f"catalog-{bundles:05d}{BUNDLE_SUFFIX}")
+        with open(path, "wb") as f:
+            f.write(pack_song_bundle(pending))
+        pending = []
+
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for done, (song_name, payload, error) in enumerate(pool.imap_unordered(_fingerprint_file, audio_files), 1):
+            if error is not None:
+                failed += 1
+                print(f"   ❌ {song_name}: {error}")
+                continue
+            pending.append((song_name, payload))
+            if len(pending) >= songs_per_bundle:
+                write_bundle()
+            if done % 10 == 0:
+                print(f"   {done}/{len(audio_files)} files ({time.perf_counter() - started:.0f}s)")
+    if pending:
+        write_bundle()
+
+    size = sum(path.stat().st_size for path in Path(output_dir).glob(f"*{BUNDLE_SUFFIX}"))
+    print(f"✅ {len(audio_files) - failed} songs in {bundles} bundles ({size / (1024 * 1024):.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s, {failed} failed")
+    return failed == 0
+
+
+def _bundle_paths(paths: List[str]) -> List[Path]:
+    """Bundle files, with directories expanded to the bundles they contain"""
+    bundle_paths = []
+    for path in map(Path, paths):
+        bundle_paths.extend(sorted(path.glob(f"*{BUNDLE_SUFFIX}")) if path.is_dir() else [path])
+    return bundle_paths
+
+
+def _error_detail(response: requests.Response) -> str:
+    """The API's error detail, or the raw body when it is not JSON (e.g. a proxy error page)"""
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    return body.get("detail") if isinstance(body, dict) else response.text[:200]
+
+
+def upload_bundles(paths: List[str], base_url: str = BASE_URL) -> bool:
+    """
+    Send bundles to a running server (songs already there are skipped)
+
+    Args:
+        paths: Bundle files or directories of bundles
+        base_url: Server URL
+    """
+    totals = {"songs_added": 0, "songs_skipped": 0, "fingerprints_added": 0}
+    failed = 0
+    for path in _bundle_paths(paths):
+        try:
+            with open(path, "rb") as f:
+                response = requests.post(f"{base_url}/learn/fingerprints", data=f.read(),
+                                         headers={"Content-Type": BUNDLE_CONTENT_TYPE}, timeout=TIMEOUT)
+            if not response.ok:
+                failed += 1
+                print(f"❌ {path.name}: {response.status_code} {_error_detail(response)}")
+                continue
+            result = response.json()
+            for key in totals:
+                totals[key] += result[key]
+            print(f"✅ {path.name}: {result['message']}")
+        except (OSError, requests.RequestException) as e:
+            failed += 1
+            print(f"❌ {path.name}: {e}")
+
+    print(f"📊 {totals['songs_added']} songs added, {totals['songs_skipped']} skipped, "
+          f"{totals['fingerprints_added']} fingerprints, {failed} bundles failed")
+    return failed == 0
+
+
+def load_bundles(paths: List[str], db_path: str, batch_size: int = BULK_SONGS_PER_TRANSACTION) -> bool:
+    """
+    Bulk-load bundles straight into a database file (the server must not be running on it)
+
+    Args:
+        paths: Bundle files or directories of bundles
+        db_path: Path to database file
+        batch_size: Songs per transaction
+    """
+    fingerprinter = AudioFingerprinter()
+    db = PersistentDB(db_path=db_path)
+    started = time.perf_counter()
+    try:
+        with db.bulk_load(songs_per_transaction=batch_size) as loader:
+            for path in _bundle_paths(paths):
+                with open(path, "rb") as f:
+                    for song_name, payload in split_song_bundle(f.read(), fingerprinter):
+                        loader.add(song_name, decode_fingerprints(payload, fingerprinter))
+        progress = loader.progress
+        print(f"✅ {progress['songs_added']} songs, {progress['fingerprints_added']} fingerprints loaded "
+              f"in {time.perf_counter() - started:.1f}s ({progress['songs_skipped']} already present)")
+        return True
+    except (OSError, FingerprintPayloadError) as e:
+        print(f"❌ Error loading bundles: {e}")
+        print("   Songs committed so far are kept; run the same load again to resume.")
+        return False
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint a catalog offline and ingest the bundles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fingerprint_parser = subparsers.add_parser("fingerprint", help="Fingerprint audio files into bundles")
+    fingerprint_parser.add_argument("directory", help="Directory containing audio files")
+    fingerprint_parser.add_argument("output_dir", help="Directory receiving the bundles")
+    fingerprint_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                                    help="Fingerprinting processes (default: number of CPUs)")
+    fingerprint_parser.add_argument("--songs-per-bundle", type=int, default=SONGS_PER_BUNDLE,
+                                    help=f"Songs per bundle file (default: {SONGS_PER_BUNDLE})")
+
+    upload_parser = subparsers.add_parser("upload", help="Send bundles to POST /learn/fingerprints")
+    upload_parser.add_argument("bundles", nargs="+", help="Bundle files or directories")
+    upload_parser.add_argument("--url", default=BASE_URL, help=f"Server URL (default: {BASE_URL})")
+
+    load_parser = subparsers.add_parser("load", help="Bulk-load bundles into a database file")
+    load_parser.add_argument("bundles", nargs="+", help="Bundle files or directories")
+    load_parser.add_argument("--db-path", default="music_recognition.db", help="Path to database file")
+    load_parser.add_argument("--batch-size", type=int, default=BULK_SONGS_PER_TRANSACTION,
+                             help=f"Songs per transaction (default: {BULK_SONGS_PER_TRANSACTION})")
+
+    args = parser.parse_args()
+    if args.command == "fingerprint":
+        success = fingerprint_directory(args.directory, args.output_dir, args.workers, args.songs_per_bundle)
+    elif args.command == "upload":
+        success = upload_bundles(args.bundles, args.url.rstrip("/"))
+    else:
+        success = load_bundles(args.bundles, args.db_path, args.batch_size)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
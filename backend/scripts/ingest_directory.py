@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Script to load the audio files of a server directory into the catalog
+without uploading them
+
+    python scripts/ingest_directory.py ../data/songs                    # straight into the database file
+    python scripts/ingest_directory.py /srv/audio --url http://host:8000  # ask a running server (POST /admin/ingest)
+
+Files already loaded (same content hash or same song name) are skipped, so
+running it again only adds the new files.
+"""
+
+import sys
+import os
+import time
+import argparse
+from contextlib import nullcontext
+
+import requests
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import PersistentDB
+from app.core.directory_ingest import DirectoryIngestJob
+from app.core.dsp_engine import AudioFingerprinter
+from app.core.fingerprint_pool import DEFAULT_FINGERPRINT_WORKERS, FingerprintPool
+
+POLL_INTERVAL = 2.0  # seconds between progress polls
+
+
+def _print_summary(progress: dict) -> bool:
+    print(f"{'✅' if progress['status'] == 'done' else '❌'} {progress['status']}: "
+          f"{progress['songs_added']} songs, {progress['fingerprints_added']} fingerprints added; "
+          f"{progress['files_skipped']} of {progress['files_found']} files already indexed, "
+          f"{progress['files_failed']} failed")
+    for error in progress["errors"]:
+        print(f"   ❌ {error['file']}: {error['error']}")
+    if progress["error"]:
+        print(f"   {progress['error']}")
+    return progress["status"] == "done" and progress["files_failed"] == 0
+
+
+def ingest_local(directory: str, db_path: str, workers: int, recursive: bool = True) -> bool:
+    """
+    Ingest into a database file (the server must not be running on it)
+
+    Args:
+        directory: Directory (or file) with the audio
+        db_path: Path to database file
+        workers: Fingerprinting processes
+        recursive: Include subdirectories
+    """
+    db = PersistentDB(db_path=db_path)
+    pool = FingerprintPool(AudioFingerprinter(), workers=workers)
+    started = time.perf_counter()
+    try:
+        job = DirectoryIngestJob(pool, lambda: nullcontext(db), roots=[directory])
+        progress = job.run(directory, recursive=recursive)
+        print(f"⏱️  {time.perf_counter() - started:.1f}s")
+        return _print_summary(progress)
+    finally:
+        pool.close()
+        db.close()
+
+
+def ingest_remote(directory: str, base_url: str, recursive: bool = True) -> bool:
+    """
+    Ask a running server to ingest one of its directories
+
+    Args:
+        directory: Path as seen by the server (must be inside its INGEST_ROOTS)
+        base_url: Server URL
+        recursive: Include subdirectories
+    """
+    response = requests.post(f"{base_url}/admin/ingest",
+                             params={"path": directory, "recursive": str(recursive).lower()}, timeout=30)
+    if response.status_code != 202:
+        print(f"❌ {response.status_code}: {response.json().get('detail') or response.json().get('message')}")
+        return False
+
+    print(f"📂 Server is ingesting {directory}...")
+    while True:
+        time.sleep(POLL_INTERVAL)
+        progress = requests.get(f"{base_url}/admin/ingest", timeout=30).json()
+        if progress["status"] != "running":
+            return _print_summary(progress)
+        print(f"   {progress['phase']}: {progress['files_done']}/"
+              f"{progress['files_found'] - progress['files_skipped']} files, "
+              f"{progress['songs_added']} songs added")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the audio files of a server directory into the catalog")
+    parser.add_argument("directory", help="Directory (or single file) with the audio")
+    parser.add_argument("--url", help="Ask the server at this URL instead of writing the database file")
+    parser.add_argument("--db-path", default="music_recognition.db", help="Path to database file (local mode)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_FINGERPRINT_WORKERS,
+                        help="Fingerprinting processes in local mode (default: number of CPUs)")
+    parser.add_argument("--no-recursive", action="store_true", help="Skip subdirectories")
+
+    args = parser.parse_args()
+    directory = os.path.abspath(args.directory)
+    if args.url:
+        success = ingest_remote(directory, args.url.rstrip("/"), not args.no_recursive)
+    else:
+        success = ingest_local(directory, args.db_path, args.workers, not args.no_recursive)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
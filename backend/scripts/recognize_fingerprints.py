@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Script to recognize an audio file by sending only its fingerprints: the audio
+is fingerprinted locally and a compact payload is posted to
+/recognize/fingerprints
+"""
+
+import sys
+import os
+import time
+import argparse
+
+import requests
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.dsp_engine import AudioFingerprinter
+from app.core.fingerprint_codec import PAYLOAD_CONTENT_TYPE, encode_fingerprints, fingerprinter_signature
+
+# API Configuration
+BASE_URL = "http://localhost:8000"
+TIMEOUT = 30  # seconds
+
+
+def check_fingerprinter(base_url: str, fingerprinter: AudioFingerprinter) -> bool:
+    """
+    Check that the server expects fingerprints made with our settings
+
+    Args:
+        base_url: Server URL
+        fingerprinter: Local fingerprinter
+    """
+    response = requests.get(f"{base_url}/fingerprinter", timeout=TIMEOUT)
+    response.raise_for_status()
+    server = response.json()
+    if server["signature"] != f"{fingerprinter_signature(fingerprinter):016x}":
+        print("❌ The server uses other fingerprinter settings:")
+        print(f"   Server: {server['params']}")
+        print(f"   Local:  {fingerprinter.params()}")
+        return False
+    return True
+
+
+def recognize_file(file_path: str, base_url: str = BASE_URL, top_k: int = 1):
+    """
+    Fingerprint an audio file locally and recognize it on the server
+
+    Args:
+        file_path: Audio file
+        base_url: Server URL
+        top_k: Number of candidates to ask for
+    """
+    if not os.path.exists(file_path):
+        print(f"❌ File not found: {file_path}")
+        return False
+
+    fingerprinter = AudioFingerprinter()
+    try:
+        if not check_fingerprinter(base_url, fingerprinter):
+            return False
+
+        started = time.perf_counter()
+        fingerprints = fingerprinter.process_file(file_path)
+        payload = encode_fingerprints(fingerprints, fingerprinter)
+        print(f"🎵 {len(fingerprints)} fingerprints in {time.perf_counter() - started:.2f}s, "
+              f"payload {len(payload) / 1024:.1f} KB (audio {os.path.getsize(file_path) / 1024:.1f} KB)")
+
+        response = requests.post(f"{base_url}/recognize/fingerprints", params={"top_k": top_k},
+                                 data=payload, headers={"Content-Type": PAYLOAD_CONTENT_TYPE},
+                                 timeout=TIMEOUT)
+        response.raise_for_status()
+        result = response.json()
+    except requests.RequestException as e:
+        print(f"❌ Request failed: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Error processing {file_path}: {e}")
+        return False
+
+    if result["success"]:
+        print(f"✅ {result['message']}")
+        for candidate in result.get("candidates", [])[1:]:
+            print(f"   {candidate['song']}: score {candidate['score']}, confidence {candidate['confidence']}%")
+    else:
+        print(f"⚠️  {result['message']}")
+    return result["success"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize an audio file by uploading its fingerprints")
+    parser.add_argument("file", help="Audio file (WAV, MP3, ...)")
+    parser.add_argument("--url", default=BASE_URL, help=f"Server URL (default: {BASE_URL})")
+    parser.add_argument("--top-k", type=int, default=1, help="Number of candidates to return")
+    args = parser.parse_args()
+
+    success = recognize_file(args.file, args.url.rstrip("/"), args.top_k)
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
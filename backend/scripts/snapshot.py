@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Script to export the catalog to a binary snapshot, import a snapshot into a
+database, or inspect a snapshot
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import BULK_SONGS_PER_TRANSACTION, PersistentDB
+from app.core.snapshot import SnapshotError, export_snapshot, import_snapshot, read_manifest
+
+
+def export_catalog(db_path: str, snapshot_path: str):
+    """
+    Export a database to a snapshot file
+
+    Args:
+        db_path: Path to database file
+        snapshot_path: Output snapshot file
+    """
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return False
+
+    db = PersistentDB(db_path=db_path)
+    try:
+        started = time.perf_counter()
+        manifest = export_snapshot(db, snapshot_path)
+        print(f"✅ Snapshot written to {snapshot_path}")
+        print(f"   Songs: {manifest['song_count']}, fingerprints: {manifest['fingerprint_count']}")
+        print(f"   Size: {os.path.getsize(snapshot_path) / (1024 * 1024):.1f} MB "
+              f"in {time.perf_counter() - started:.1f}s")
+        return True
+    except Exception as e:
+        print(f"❌ Error exporting snapshot: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def import_catalog(snapshot_path: str, db_path: str, batch_size: int = BULK_SONGS_PER_TRANSACTION):
+    """
+    Bulk-load a snapshot into a database (songs already present are skipped)
+
+    Args:
+        snapshot_path: Snapshot file
+        db_path: Path to database file (created if missing)
+        batch_size: Songs per transaction
+    """
+    if not os.path.exists(snapshot_path):
+        print(f"❌ Snapshot file not found: {snapshot_path}")
+        return False
+
+    db = PersistentDB(db_path=db_path)
+    try:
+        started = time.perf_counter()
+        summary = import_snapshot(snapshot_path, db, songs_per_transaction=batch_size)
+        print(f"✅ Imported {summary['songs_added']} songs, {summary['fingerprints_added']} fingerprints "
+              f"in {time.perf_counter() - started:.1f}s")
+        if summary['songs_skipped']:
+            print(f"   Skipped (already in database): {summary['songs_skipped']}")
+        return True
+    except (SnapshotError, OSError) as e:
+        print(f"❌ Error importing snapshot: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def show_info(snapshot_path: str):
+    """
+    Print the manifest of a snapshot
+
+    Args:
+        snapshot_path: Snapshot file
+    """
+    try:
+        manifest = read_manifest(snapshot_path)
+    except (SnapshotError, OSError) as e:
+        print(f"❌ {e}")
+        return False
+
+    print("=" * 60)
+    print(f"📸 Snapshot: {snapshot_path}")
+    print(f"   Format version: {manifest['format_version']}")
+    print(f"   Created: {manifest['created_at']}")
+    print(f"   Songs: {manifest['song_count']}")
+    print(f"   Fingerprints: {manifest['fingerprint_count']}")
+    print("=" * 60)
+    for name, section in manifest['sections'].items():
+        print(f"   {name:<10} {section['length'] / (1024 * 1024):8.1f} MB  crc32={section['crc32']:08x}")
+    return True
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Export, import or inspect catalog snapshots",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Export the catalog
+  python3 snapshot.py export catalog.snapshot
+
+  # Rebuild a database from a snapshot
+  python3 snapshot.py import catalog.snapshot --db-path new_node.db
+
+  # Show what a snapshot contains
+  python3 snapshot.py info catalog.snapshot
+
+  # Serve a snapshot directly (read-only, memory-mapped)
+  INDEX_BACKEND=snapshot SNAPSHOT_PATH=catalog.snapshot python3 -m app.main
+        """
+    )
+
+    parser.add_argument(
+        'command',
+        choices=['export', 'import', 'info'],
+        help='export: database -> snapshot, import: snapshot -> database, info: show the manifest'
+    )
+
+    parser.add_argument(
+        'snapshot',
+        type=str,
+        help='Path to the snapshot file'
+    )
+
+    parser.add_argument(
+        '--db-path',
+        type=str,
+        default='music_recognition.db',
+        help='Path to database file (default: music_recognition.db)'
+    )
+
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=BULK_SONGS_PER_TRANSACTION,
+        help=f'Songs per transaction when importing (default: {BULK_SONGS_PER_TRANSACTION})'
+    )
+
+    args = parser.parse_args()
+
+    # Change to backend directory to use relative path
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    backend_dir = os.path.dirname(script_dir)
+    os.chdir(backend_dir)
+
+    # Resolve paths
+    db_path = os.path.abspath(args.db_path)
+    snapshot_path = os.path.abspath(args.snapshot)
+
+    # Execute command
+    if args.command == 'export':
+        ok = export_catalog(db_path, snapshot_path)
+    elif args.command == 'import':
+        ok = import_catalog(snapshot_path, db_path, batch_size=args.batch_size)
+    else:
+        ok = show_info(snapshot_path)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
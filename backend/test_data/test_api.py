@@ -99,7 +99,9 @@ def get_stats():
             print(f"\nDatabase Stats:")
             print(f"  Songs: {stats['song_count']}")
             print(f"  Fingerprints: {stats['fingerprint_count']}")
-            print(f"  Song list: {stats['songs']}")
+            songs_response = requests.get(f"{BASE_URL}/songs")
+            if songs_response.status_code == 200:
+                print(f"  Song list: {songs_response.json()['songs']}")
             return stats
     except Exception as e:
         print(f"✗ Error getting stats: {e}")
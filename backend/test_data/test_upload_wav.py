@@ -105,7 +105,9 @@ def test_stats():
             print(f"\n✅ Database Stats:")
             print(f"  Songs: {stats.get('song_count')}")
             print(f"  Fingerprints: {stats.get('fingerprint_count')}")
-            print(f"  Song List: {stats.get('songs')}")
+            songs_response = requests.get(f"{BASE_URL}/songs", timeout=10)
+            if songs_response.status_code == 200:
+                print(f"  Song List: {songs_response.json().get('songs')}")
             return stats
         else:
             print(f"❌ Error: {response.status_code}")
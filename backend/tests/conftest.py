@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the app package importable when pytest runs from any directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
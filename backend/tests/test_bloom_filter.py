@@ -0,0 +1,83 @@
+"""
+Persisted Bloom filter: a filter saved before another process changed the
+catalog must never hide hashes that are in it
+"""
+
+from app.core.database import PersistentDB
+from app.core.hashing import pack_hashes
+
+
+def _song(base: int, count: int = 200):
+    """Fingerprints with hashes no other test song shares"""
+    return [((base + i, base + i + 1, i % 50 + 1), i * 0.05) for i in range(count)]
+
+
+def _best(db: PersistentDB, fingerprints):
+    results = db.query_top_k(fingerprints, top_k=1)
+    return (results[0]["song"], results[0]["score"]) if results else None
+
+
+def test_filter_saved_before_offline_clear_is_not_reused(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    song_a, song_b, song_c = _song(1000), _song(5000), _song(9000)
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    db.add_song("a", song_a)
+    db.close()
+
+    # Offline tools (clear_database.py, the CLI loaders) open the database without the filter
+    offline = PersistentDB(db_path)
+    offline.clear()
+    offline.add_song("b", song_b)
+    offline.add_song("c", song_c)
+    offline.close()
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    try:
+        assert _best(db, song_b) == ("b", 200)
+        assert _best(db, song_c) == ("c", 200)
+        assert _best(db, song_a) is None
+    finally:
+        db.close()
+
+
+def test_filter_survives_deletes_and_catches_up_with_offline_adds(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    song_a, song_b, song_c = _song(1000), _song(5000), _song(9000)
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    db.add_song("a", song_a)
+    db.add_song("b", song_b)
+    db.delete_song("a")
+    db.close()
+
+    offline = PersistentDB(db_path)
+    offline.add_song("c", song_c)
+    offline.close()
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    try:
+        assert _best(db, song_b) == ("b", 200)
+        assert _best(db, song_c) == ("c", 200)
+    finally:
+        db.close()
+
+
+def test_offline_delete_rebuilds_the_saved_filter(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    song_a = _song(1000)
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    db.add_song("a", song_a)
+    db.add_song("b", _song(5000))
+    db.close()
+
+    offline = PersistentDB(db_path)
+    offline.delete_song("a")
+    offline.close()
+
+    db = PersistentDB(db_path, bloom_filter=True)
+    try:
+        assert not db.bloom.contains(pack_hashes([hash_token for hash_token, _ in song_a])).any()
+    finally:
+        db.close()